@@ -112,3 +112,26 @@ class supers(SampleSuperDatasetBenchmarks):
 
     def time_status_recursive(self):
         self.ds.status(recursive=True)
+
+
+class saverecursive(SampleSuperDatasetBenchmarks):
+    """
+    Benchmarks of a recursive save of modifications in all datasets
+    """
+
+    params = [0, 4]
+    param_names = ['jobs']
+
+    def setup(self, jobs):
+        super().setup()
+        for subds in self.ds.subdatasets(recursive=True,
+                                         result_xfm='datasets',
+                                         result_renderer='disabled'):
+            with open(opj(subds.path, 'modified.txt'), 'w') as f:
+                f.write(subds.path)
+
+    def teardown(self, jobs):
+        super().teardown()
+
+    def time_save_recursive(self, jobs):
+        self.ds.save(recursive=True, jobs=jobs, result_renderer='disabled')
@@ -13,11 +13,15 @@ import os.path as osp
 
 from subprocess import call
 
+from datalad.cmd import BatchedCommand
 from datalad.runner import (
+    MultiRunner,
     Runner,
     GitRunner,
     StdOutErrCapture,
 )
+from datalad.runner.runner import WitlessRunner
+from datalad.support.parallel import ProducerConsumer
 
 
 # Some tracking example -- may be we should track # of datasets.datalad.org
@@ -68,3 +72,108 @@ class witlessrunner(SuprocBenchmarks):
 
     def time_echo_gitrunner_fullcapture(self):
         self.git_runner.run(["echo"], protocol=StdOutErrCapture)
+
+
+class runnerbackends(SuprocBenchmarks):
+    """Compare the thread based and the selector based runner implementation
+    """
+
+    params = ['threads', 'selector']
+    param_names = ['backend']
+
+    def setup(self, backend):
+        WitlessRunner._CFG_RUNNER_BACKEND = backend
+        self.runner = Runner()
+        self.git_runner = GitRunner()
+
+    def teardown(self, backend):
+        WitlessRunner._CFG_RUNNER_BACKEND = None
+        super().teardown()
+
+    def time_echo(self, backend):
+        self.runner.run(["echo"])
+
+    def time_echo_fullcapture(self, backend):
+        self.runner.run(["echo"], protocol=StdOutErrCapture)
+
+    def time_git_version_x100(self, backend):
+        # many short-lived processes, as in operations on many datasets
+        for _ in range(100):
+            self.git_runner.run(["git", "version"], protocol=StdOutErrCapture)
+
+    def time_heavyout(self, backend):
+        self.runner.run(heavyout_cmd, protocol=StdOutErrCapture)
+
+    def time_stdin_10mb(self, backend):
+        self.runner.run(["cat"], protocol=StdOutErrCapture,
+                        stdin=b"x" * 10 * 1024 ** 2)
+
+    def time_batched_x1000(self, backend):
+        # request-response communication via a queue and a generator
+        bc = BatchedCommand(["cat"])
+        try:
+            for i in range(1000):
+                bc(str(i))
+        finally:
+            bc.close()
+
+
+class multirunner(SuprocBenchmarks):
+    """Run many short commands concurrently
+
+    Compare a MultiRunner with running one Runner per command in the
+    threads of a ProducerConsumer.
+    """
+
+    params = [['producerconsumer', 'multirunner'], [1, 4, 16]]
+    param_names = ['implementation', 'jobs']
+
+    ncmds = 200
+
+    def time_git_version(self, implementation, jobs):
+        if implementation == 'multirunner':
+            runner = MultiRunner(jobs=jobs)
+            for _ in range(self.ncmds):
+                runner.submit(["git", "version"], protocol=StdOutErrCapture)
+            for job in runner.as_completed():
+                job.result()
+        else:
+            runner = Runner()
+            list(ProducerConsumer(
+                range(self.ncmds),
+                lambda i: runner.run(["git", "version"],
+                                     protocol=StdOutErrCapture),
+                jobs=jobs,
+            ))
+
+
+class spawnlatency(SuprocBenchmarks):
+    """Latency of a single git call for different sizes of the calling process
+
+    Resident memory of the calling process should not affect the time it
+    takes to start a subprocess.
+    """
+
+    params = [0, 128, 512]
+    param_names = ['parent_mb']
+
+    def setup(self, parent_mb):
+        # filled, i.e. resident memory
+        self.ballast = [b'x' * 1024 ** 2 for _ in range(parent_mb)]
+        self.git_runner = GitRunner()
+        self.cwd = os.getcwd()
+
+    def teardown(self, parent_mb):
+        del self.ballast
+        super().teardown()
+
+    def time_git_version(self, parent_mb):
+        self.git_runner.run(["git", "version"], protocol=StdOutErrCapture)
+
+    def time_git_version_cwd(self, parent_mb):
+        self.git_runner.run(["git", "version"], protocol=StdOutErrCapture,
+                            cwd=self.cwd)
+
+    def time_git_env_x1000(self, parent_mb):
+        for _ in range(1000):
+            self.git_runner._get_adjusted_env(cwd=self.cwd)
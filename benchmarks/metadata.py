@@ -0,0 +1,238 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks of metadata aggregation, query and search
+
+All benchmarks operate on a synthetic superdataset with `nsubds` subdatasets
+of `nfiles` annexed files each. Files carry xmp/exif-like git-annex metadata,
+which is reported by the `annex` extractor, hence no extractor dependencies
+(exempi, exifread, ...) are needed.
+"""
+
+import os.path as op
+import tarfile
+import tempfile
+
+import datalad.api as dl
+from datalad.utils import (
+    get_tempfile_kwargs,
+    rmtree,
+    rotree,
+)
+
+from .common import SuprocBenchmarks
+
+try:
+    from datalad.metadata.metadata import get_metadata_objcache
+except ImportError:
+    # older versions had no process-wide metadata object cache
+    get_metadata_objcache = None
+
+
+_cameras = [
+    {'exif_Make': 'Canon', 'exif_Model': 'EOS 5D',
+     'xmp_dc_creator': 'Ansel Adams'},
+    {'exif_Make': 'Nikon', 'exif_Model': 'D850',
+     'xmp_dc_creator': 'Dorothea Lange'},
+    {'exif_Make': 'Sony', 'exif_Model': 'A7 III',
+     'xmp_dc_creator': 'Vivian Maier'},
+    {'exif_Make': 'Fujifilm', 'exif_Model': 'X-T4',
+     'xmp_dc_creator': 'Robert Capa'},
+]
+
+
+def make_metadata_hierarchy(path, nsubds, nfiles):
+    """Create a superdataset with subdatasets with annex metadata on files"""
+    ds = dl.create(path, result_renderer='disabled')
+    for i in range(nsubds):
+        sub = ds.create('sub{:03d}'.format(i), result_renderer='disabled')
+        fnames = ['img{:04d}.jpg'.format(j) for j in range(nfiles)]
+        for fname in fnames:
+            (sub.pathobj / fname).write_text(
+                'image {} in {}'.format(fname, sub.path))
+        sub.save(result_renderer='disabled')
+        # one metadata call per camera to keep the setup fast
+        for c, camera in enumerate(_cameras):
+            sub.repo.set_metadata(
+                fnames[c::len(_cameras)],
+                reset=dict(
+                    camera,
+                    exif_DateTimeOriginal='2020:0{}:1{} 12:00:00'.format(c + 1, i % 10),
+                    xmp_dc_subject=['sub{}'.format(i), 'benchmark'],
+                ))
+    ds.save(recursive=True, result_renderer='disabled')
+    return ds
+
+
+def _store_tarball(ds_path, tarball):
+    # make it all writeable, or tarfile could not extract it later on
+    rotree(ds_path, ro=False, chmod_files=False)
+    with tarfile.open(tarball, "w") as tar:
+        tar.add(ds_path, arcname='ds', recursive=True)
+
+
+class _MetadataHierarchyBenchmarks(SuprocBenchmarks):
+    """Common setup: a (non-)aggregated dataset hierarchy from a tarball"""
+
+    timeout = 3600
+    nsubds = 10
+    nfiles = 100
+    # whether the extracted hierarchy should have aggregated metadata
+    aggregated = True
+
+    def setup_cache(self):
+        tmp = tempfile.mkdtemp(**get_tempfile_kwargs({}, prefix='bm_meta'))
+        ds = make_metadata_hierarchy(
+            op.join(tmp, 'ds'), self.nsubds, self.nfiles)
+        tarballs = {}
+        tarballs[False] = op.realpath('metadata_plain.tar')
+        _store_tarball(ds.path, tarballs[False])
+        ds.aggregate_metadata(recursive=True, result_renderer='disabled')
+        tarballs[True] = op.realpath('metadata_aggregated.tar')
+        _store_tarball(ds.path, tarballs[True])
+        rmtree(tmp)
+        return tarballs
+
+    def _setup_ds(self, tarballs):
+        tempdir = tempfile.mkdtemp(
+            **get_tempfile_kwargs({}, prefix='bm_meta'))
+        self.remove_paths.append(tempdir)
+        with tarfile.open(tarballs[self.aggregated]) as tar:
+            tar.extractall(tempdir)
+        self.ds = dl.Dataset(op.join(tempdir, 'ds'))
+        if get_metadata_objcache is not None:
+            # start without anything loaded
+            get_metadata_objcache().clear()
+
+    def setup(self, tarballs, *args):
+        self._setup_ds(tarballs)
+
+
+class aggregate(_MetadataHierarchyBenchmarks):
+    """Benchmarks for aggregate_metadata"""
+
+    aggregated = False
+
+    def _aggregate_full(self):
+        self.ds.aggregate_metadata(
+            recursive=True, result_renderer='disabled')
+
+    def _aggregate_incremental(self):
+        # aggregate a single modified subdataset into the top-level dataset
+        self.ds.aggregate_metadata(
+            path='sub000', incremental=True, result_renderer='disabled')
+
+    def time_aggregate_full(self, tarballs):
+        self._aggregate_full()
+
+    def peakmem_aggregate_full(self, tarballs):
+        self._aggregate_full()
+
+    def time_aggregate_incremental(self, tarballs):
+        self._aggregate_incremental()
+
+    def peakmem_aggregate_incremental(self, tarballs):
+        self._aggregate_incremental()
+
+
+class aggregate_update(_MetadataHierarchyBenchmarks):
+    """Benchmarks for re-aggregation after a change in a single subdataset"""
+
+    def setup(self, tarballs):
+        self._setup_ds(tarballs)
+        sub = dl.Dataset(op.join(self.ds.path, 'sub000'))
+        sub.repo.set_metadata('img0000.jpg', add={'tag': 'modified'})
+        (sub.pathobj / 'new.jpg').write_text('new image')
+        sub.save(result_renderer='disabled')
+
+    def time_reaggregate_full(self, tarballs):
+        self.ds.aggregate_metadata(
+            recursive=True, result_renderer='disabled')
+
+    def time_reaggregate_incremental(self, tarballs):
+        self.ds.aggregate_metadata(
+            path='sub000', incremental=True, result_renderer='disabled')
+
+
+class query(_MetadataHierarchyBenchmarks):
+    """Benchmarks for metadata queries on aggregated metadata"""
+
+    def _query_files(self):
+        # a handful of individual files spread across subdatasets
+        res = self.ds.metadata(
+            path=[op.join(self.ds.path, 'sub{:03d}'.format(i), 'img0001.jpg')
+                  for i in range(0, self.nsubds, 3)],
+            reporton='files',
+            result_renderer='disabled',
+            return_type='list')
+        assert res
+
+    def _query_all(self):
+        res = self.ds.metadata(
+            recursive=True,
+            reporton='all',
+            result_renderer='disabled',
+            return_type='list')
+        assert len(res) >= self.nsubds * self.nfiles
+
+    def time_metadata_files(self, tarballs):
+        self._query_files()
+
+    def time_metadata_files_warm(self, tarballs):
+        # repeated query within the same process
+        self._query_files()
+        self._query_files()
+
+    def time_metadata_recursive(self, tarballs):
+        self._query_all()
+
+    def peakmem_metadata_recursive(self, tarballs):
+        self._query_all()
+
+    def time_get_aggregates(self, tarballs):
+        self.ds.metadata(
+            get_aggregates=True,
+            result_renderer='disabled',
+            return_type='list')
+
+
+class search(_MetadataHierarchyBenchmarks):
+    """Benchmarks for all search modes on a cold and a warm index
+
+    A cold index means no search index (for modes that have one) and no
+    loaded metadata objects in the process. A warm index is set up by
+    an initial search in the same process.
+    """
+
+    params = [
+        ['egrep', 'egrepcs', 'textblob', 'autofield'],
+        ['cold', 'warm'],
+    ]
+    param_names = ['mode', 'index']
+
+    def setup(self, tarballs, mode, index):
+        self._setup_ds(tarballs)
+        # search across datasets and files
+        self.ds.config.set(
+            'datalad.search.index-{}-documenttype'.format(mode), 'all',
+            scope='local')
+        if index == 'warm':
+            self._search(mode)
+
+    def _search(self, mode):
+        res = self.ds.search(
+            'Canon',
+            mode=mode,
+            result_renderer='disabled',
+            return_type='list')
+        assert res
+
+    def time_search(self, tarballs, mode, index):
+        self._search(mode)
+
+    def peakmem_search(self, tarballs, mode, index):
+        self._search(mode)
@@ -0,0 +1,315 @@
+# ex: set sts=4 ts=4 sw=4 noet:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Benchmarks of the throughput of DataLad's special remotes
+
+Datasets with annexed files of different size distributions have their
+content available from
+
+- ``ora-loose``: an ORA remote with a local store of loose keys
+- ``ora-archive``: an ORA remote with a local store with a 7z archive only
+- ``ora-http``: an ORA remote with the loose store served via HTTP from a
+  local server
+- ``datalad-archives``: the ArchiveAnnexCustomRemote, with the content
+  in a tarball in the dataset itself
+
+Besides timings, `track_*` benchmarks report files/s and MB/s of
+``git annex get``, ``copy --to`` and ``fsck --from``, and the protocol
+overhead per key, i.e. the time for a ``CHECKPRESENT`` round trip.
+"""
+
+import os
+import os.path as op
+import tarfile
+import tempfile
+import threading
+from functools import partial
+from http.server import (
+    SimpleHTTPRequestHandler,
+    ThreadingHTTPServer,
+)
+
+import datalad.api as dl
+from datalad.customremotes.ria_utils import (
+    create_ds_in_store,
+    create_store,
+    get_layout_locations,
+)
+from datalad.distributed.ora_remote import LocalIO
+from datalad.utils import (
+    Path,
+    get_tempfile_kwargs,
+    rmtree,
+    rotree,
+)
+
+from .common import SuprocBenchmarks
+
+
+# name -> list of (file size, number of files)
+DISTRIBUTIONS = {
+    'small': [(1024, 500)],
+    'mixed': [(1024, 200), (256 * 1024, 20), (8 * 1024 ** 2, 2)],
+    'large': [(8 * 1024 ** 2, 8)],
+}
+
+ORA_INIT_OPTS = ['encryption=none', 'type=external', 'externaltype=ora',
+                 'autoenable=true']
+
+
+def _get_totals(distribution):
+    """Return number of files and their total size in MB"""
+    return (
+        sum(n for _, n in DISTRIBUTIONS[distribution]),
+        sum(s * n for s, n in DISTRIBUTIONS[distribution]) / 1024 ** 2,
+    )
+
+
+def _write_files(path, distribution):
+    path.mkdir(parents=True)
+    for size, n in DISTRIBUTIONS[distribution]:
+        for i in range(n):
+            # incompressible, and unique
+            (path / 'f{}_{:04d}.dat'.format(size, i)).write_bytes(
+                os.urandom(size))
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def _serve(path):
+    """Serve a directory via HTTP from a local server in a thread"""
+    server = ThreadingHTTPServer(
+        ('127.0.0.1', 0), partial(_QuietHandler, directory=str(path)))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+
+def _make_ora_dataset(path, stores, distribution):
+    """Create a dataset with ORA remotes that have all its content"""
+    ds = dl.create(path, result_renderer='disabled')
+    _write_files(ds.pathobj / 'files', distribution)
+    ds.save(result_renderer='disabled')
+
+    io = LocalIO()
+    loose = stores / 'loose'
+    create_store(io, loose, '1')
+    create_ds_in_store(io, loose, ds.id, '2', '1')
+    ds.repo.init_remote(
+        'ora-loose',
+        options=ORA_INIT_OPTS + ['url=ria+{}'.format(loose.as_uri())])
+    ds.repo.copy_to(['.'], 'ora-loose')
+
+    archived = stores / 'archived'
+    create_store(io, archived, '1')
+    create_ds_in_store(io, archived, ds.id, '2', '1')
+    _, archive_dir, _ = get_layout_locations(1, archived, ds.id)
+    ds.export_archive_ora(archive_dir / 'archive.7z',
+                          result_renderer='disabled')
+    ds.repo.init_remote(
+        'ora-archive',
+        options=ORA_INIT_OPTS + ['url=ria+{}'.format(archived.as_uri())])
+
+    server, url = _serve(loose)
+    try:
+        ds.repo.init_remote(
+            'ora-http', options=ORA_INIT_OPTS + ['url=ria+{}'.format(url)])
+        # make the location log aware of the content
+        for remote in ('ora-archive', 'ora-http'):
+            ds.repo.fsck(remote=remote, fast=True)
+    finally:
+        server.shutdown()
+        server.server_close()
+    ds.repo.call_annex(['drop', '--force', '.'])
+    return ds
+
+
+def _make_archives_dataset(path, distribution):
+    """Create a dataset with content from the datalad-archives remote"""
+    ds = dl.create(path, result_renderer='disabled')
+    staging = Path(tempfile.mkdtemp(**get_tempfile_kwargs({}, prefix='bm')))
+    _write_files(staging / 'files', distribution)
+    with tarfile.open(ds.pathobj / 'files.tar', 'w') as tar:
+        tar.add(staging / 'files', arcname='files')
+    rmtree(str(staging))
+    ds.save('files.tar', result_renderer='disabled')
+    ds.add_archive_content('files.tar', drop_after=True,
+                           result_renderer='disabled')
+    # no extraction leftovers in the tarball of the dataset
+    rmtree(str(ds.pathobj / '.git' / 'datalad' / 'tmp'))
+    return ds
+
+
+def _store_tarball(ds_path, tarball):
+    # make it all writeable, or tarfile could not extract it later on
+    rotree(ds_path, ro=False, chmod_files=False)
+    with tarfile.open(tarball, "w") as tar:
+        tar.add(ds_path, arcname='ds', recursive=True)
+
+
+class _RemoteBenchmarks(SuprocBenchmarks):
+    """Common setup: a dataset from a tarball, and its remote(s)
+
+    The ORA stores are created once in the cache directory, and only read
+    from, the datasets are extracted from a tarball for each benchmark.
+    """
+
+    timeout = 3600
+    params = [
+        ['ora-loose', 'ora-archive', 'ora-http', 'datalad-archives'],
+        list(DISTRIBUTIONS),
+        [1, 4],
+    ]
+    param_names = ['remote', 'distribution', 'jobs']
+
+    def setup_cache(self):
+        tarballs = {}
+        for distribution in DISTRIBUTIONS:
+            stores = Path(op.realpath('stores_{}'.format(distribution)))
+            tarballs['stores', distribution] = stores
+            tmp = tempfile.mkdtemp(**get_tempfile_kwargs({}, prefix='bm_rem'))
+            ds = _make_ora_dataset(
+                op.join(tmp, 'ora'), stores, distribution)
+            tarballs['ora', distribution] = op.realpath(
+                'ora_{}.tar'.format(distribution))
+            _store_tarball(ds.path, tarballs['ora', distribution])
+            ds = _make_archives_dataset(op.join(tmp, 'archives'), distribution)
+            tarballs['archives', distribution] = op.realpath(
+                'archives_{}.tar'.format(distribution))
+            _store_tarball(ds.path, tarballs['archives', distribution])
+            rmtree(tmp)
+        return tarballs
+
+    def setup(self, tarballs, remote, distribution, jobs):
+        tempdir = tempfile.mkdtemp(
+            **get_tempfile_kwargs({}, prefix='bm_rem'))
+        self.remove_paths.append(tempdir)
+        kind = 'archives' if remote == 'datalad-archives' else 'ora'
+        with tarfile.open(tarballs[kind, distribution]) as tar:
+            tar.extractall(tempdir)
+        self.ds = dl.Dataset(op.join(tempdir, 'ds'))
+        self.repo = self.ds.repo
+        self.server = None
+        if remote == 'ora-http':
+            # the port changes with every server
+            self.server, url = _serve(
+                tarballs['stores', distribution] / 'loose')
+            self.repo.call_annex(
+                ['enableremote', 'ora-http', 'url=ria+{}'.format(url)])
+
+    def teardown(self, *args):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+        super().teardown()
+
+    def _timed(self, func, *args):
+        start = self.timer()
+        func(*args)
+        return self.timer() - start
+
+
+class get(_RemoteBenchmarks):
+    """Benchmarks for `git annex get --from`"""
+
+    def _get(self, remote, jobs):
+        self.repo.call_annex(
+            ['get', '-J', str(jobs), '--from', remote, 'files'])
+
+    def time_get(self, tarballs, remote, distribution, jobs):
+        self._get(remote, jobs)
+
+    def track_get_files_per_sec(self, tarballs, remote, distribution, jobs):
+        nfiles, _ = _get_totals(distribution)
+        return nfiles / self._timed(self._get, remote, jobs)
+
+    track_get_files_per_sec.unit = 'files/s'
+
+    def track_get_mb_per_sec(self, tarballs, remote, distribution, jobs):
+        _, mbytes = _get_totals(distribution)
+        return mbytes / self._timed(self._get, remote, jobs)
+
+    track_get_mb_per_sec.unit = 'MB/s'
+
+
+class fsck(_RemoteBenchmarks):
+    """Benchmarks for `git annex fsck --from`
+
+    A full fsck retrieves and verifies all content, a fast one only checks
+    for the presence of each key, which amounts to the overhead of the
+    special remote protocol per key.
+    """
+
+    def _fsck(self, remote, jobs, fast=False):
+        self.repo.call_annex(
+            ['fsck', '-J', str(jobs), '--from', remote]
+            + (['--fast'] if fast else [])
+            + ['files'])
+
+    def time_fsck(self, tarballs, remote, distribution, jobs):
+        self._fsck(remote, jobs)
+
+    def track_fsck_files_per_sec(self, tarballs, remote, distribution, jobs):
+        nfiles, _ = _get_totals(distribution)
+        return nfiles / self._timed(self._fsck, remote, jobs)
+
+    track_fsck_files_per_sec.unit = 'files/s'
+
+    def track_fsck_mb_per_sec(self, tarballs, remote, distribution, jobs):
+        _, mbytes = _get_totals(distribution)
+        return mbytes / self._timed(self._fsck, remote, jobs)
+
+    track_fsck_mb_per_sec.unit = 'MB/s'
+
+    def track_overhead_per_key(self, tarballs, remote, distribution, jobs):
+        nfiles, _ = _get_totals(distribution)
+        return 1000 * self._timed(self._fsck, remote, jobs, True) / nfiles
+
+    track_overhead_per_key.unit = 'ms'
+
+
+class copy_to(_RemoteBenchmarks):
+    """Benchmarks for `git annex copy --to` into a new ORA store"""
+
+    params = [
+        ['ora-loose'],
+        list(DISTRIBUTIONS),
+        [1, 4],
+    ]
+
+    def setup(self, tarballs, remote, distribution, jobs):
+        super().setup(tarballs, remote, distribution, jobs)
+        self.repo.call_annex(['get', '-J', '4', '--from', remote, 'files'])
+        store = Path(self.ds.path).parent / 'store'
+        io = LocalIO()
+        create_store(io, store, '1')
+        create_ds_in_store(io, store, self.ds.id, '2', '1')
+        self.repo.init_remote(
+            'target',
+            options=ORA_INIT_OPTS + ['url=ria+{}'.format(store.as_uri())])
+
+    def _copy(self, jobs):
+        self.repo.call_annex(
+            ['copy', '-J', str(jobs), '--to', 'target', 'files'])
+
+    def time_copy_to(self, tarballs, remote, distribution, jobs):
+        self._copy(jobs)
+
+    def track_copy_to_files_per_sec(self, tarballs, remote, distribution,
+                                    jobs):
+        nfiles, _ = _get_totals(distribution)
+        return nfiles / self._timed(self._copy, jobs)
+
+    track_copy_to_files_per_sec.unit = 'files/s'
+
+    def track_copy_to_mb_per_sec(self, tarballs, remote, distribution, jobs):
+        _, mbytes = _get_totals(distribution)
+        return mbytes / self._timed(self._copy, jobs)
+
+    track_copy_to_mb_per_sec.unit = 'MB/s'
@@ -388,6 +388,9 @@ class Save(Interface):
         # and more "dynamic" feedback than jumpy datasets count.
         # See addurls where it is implemented that way by providing agg and another
         # log_filter
+        # Subdatasets sort before their superdatasets. A superdataset is
+        # deferred until all its subdatasets are saved, while independent
+        # datasets are saved in parallel.
         yield from ProducerConsumerProgressLog(
             sorted(paths_by_ds.items(), key=lambda v: v[0], reverse=True),
             partial(save_ds, version_tag=version_tag),
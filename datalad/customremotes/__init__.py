@@ -52,6 +52,10 @@ class RemoteError(_RemoteError):
 class SpecialRemote(_SpecialRemote):
     """Common base class for all of DataLad's special remote implementations"""
 
+    # whether concurrent requests can be processed by a single instance,
+    # see datalad.customremotes.master
+    supports_async = False
+
     def message(self, msg, type='debug'):
         handler = dict(
             debug=self.annex.debug,
@@ -398,25 +398,41 @@ class ArchiveAnnexCustomRemote(AnnexCustomRemote):
                 assert op.exists(akey_path), \
                        "Key file %s is not present" % akey_path
 
-                # Extract that bloody file from the bloody archive
-                # TODO: implement/use caching, for now a simple one
-                #  actually patool doesn't support extraction of a single file
-                #  https://github.com/wummel/patool/issues/20
-                # so
                 pwd = getpwd()
                 lgr.debug(
                     "Getting file {afile} from {akey_path} "
                     "while PWD={pwd}".format(**locals()))
-                was_extracted = self.cache[akey_path].is_extracted
-                apath = self.cache[akey_path].get_extracted_file(afile)
-                link_file_load(apath, file)
-                if not was_extracted and self.cache[akey_path].is_extracted:
+                earchive = self.cache[akey_path]
+                was_extracted = earchive.is_extracted
+                # read just the file from the archive, unless the archive
+                # is extracted already anyway
+                if not was_extracted:
+                    try:
+                        if earchive.copy_member(afile, file):
+                            return
+                    except Exception as exc:
+                        # extraction might still work
+                        lgr.debug(
+                            "Failed to read %s from %s directly, "
+                            "extracting it instead: %s",
+                            afile, akey_path, CapturedException(exc))
+                # Extract that bloody file from the bloody archive
+                #  patool doesn't support extraction of a single file
+                #  https://github.com/wummel/patool/issues/20
+                # so, while making sure the extraction is not evicted from
+                # the cache by another process in the meantime
+                with earchive.in_use():
+                    apath = earchive.get_extracted_file(afile)
+                    link_file_load(apath, file)
+                if not was_extracted and earchive.is_extracted \
+                        and not self.cache.max_size:
                     self.message(
                         "%s special remote is using an extraction cache "
                         "under %s. Remove it with DataLad's 'clean' "
-                        "command to save disk space." %
-                        (ARCHIVES_SPECIAL_REMOTE,
-                         self.cache[akey_path].path),
+                        "command, or limit its size with the "
+                        "'datalad.archives.cachesize' configuration to "
+                        "save disk space." %
+                        (ARCHIVES_SPECIAL_REMOTE, earchive.path),
                         type='info',
                     )
                 return
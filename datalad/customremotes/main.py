@@ -46,8 +46,8 @@ def setup_parser(remote_name, description):
 def _main(args, cls):
     """Unprotected portion"""
     assert(cls is not None)
-    from annexremote import Master
-    master = Master()
+    from datalad.customremotes.master import get_master
+    master = get_master()
     remote = cls(master)
     master.LinkRemote(remote)
     master.Listen()
@@ -0,0 +1,219 @@
+# emacs: -*- mode: python; py-indent-offset: 4; indent-tabs-mode: nil -*-
+# vi: set ft=python sts=4 ts=4 sw=4 et:
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Special remote protocol handling with support for concurrent requests
+
+git-annex can run several jobs (``-J``) with a single special remote
+process, if the special remote replies to the EXTENSIONS request with
+``ASYNC``. From then on, each message is prefixed with ``J <n>``, where
+``<n>`` identifies a job. Requests of different jobs are processed
+concurrently, each job in a dedicated thread, and replies and requests sent
+from within a job are prefixed with its job number.
+"""
+
+__docformat__ = 'restructuredtext'
+
+import logging
+import queue
+import sys
+import threading
+import traceback
+
+from annexremote import (
+    Master as _Master,
+    NotLinkedError,
+    Protocol as _Protocol,
+    UnexpectedMessage,
+    UnsupportedRequest,
+)
+
+from datalad.support.external_versions import external_versions
+
+lgr = logging.getLogger('datalad.customremotes.master')
+
+# The implementation below relies on internals of annexremote (the
+# `_send`/`_ask`/`_askvalues` methods of `Master` and the `extensions` of
+# `Protocol`), which are known to work with this range of versions
+# (minimum inclusive, maximum exclusive)
+ANNEXREMOTE_VERSIONS = ('1.6', '2.0')
+
+
+def is_annexremote_compatible():
+    """Whether the installed annexremote can be extended by `Master`"""
+    ver = external_versions['annexremote']
+    if not ver:
+        return False
+    min_ver, max_ver = ANNEXREMOTE_VERSIONS
+    return min_ver <= ver < max_ver \
+        and all(hasattr(_Master, m) for m in ('_send', '_ask', '_askvalues'))
+
+
+def get_master(output=sys.stdout):
+    """Return a `Master` instance for the installed annexremote
+
+    This is an ASYNC-capable `Master` if annexremote is compatible, and the
+    stock `annexremote.Master` otherwise, which processes requests
+    sequentially.
+    """
+    if is_annexremote_compatible():
+        return Master(output=output)
+    lgr.debug(
+        "annexremote %s is not within the supported range %s, "
+        "concurrent requests are not supported",
+        external_versions['annexremote'], ANNEXREMOTE_VERSIONS)
+    return _Master(output=output)
+
+
+class Protocol(_Protocol):
+    """Protocol that announces the ASYNC extension if the remote supports it
+    """
+    def __init__(self, remote):
+        super().__init__(remote)
+        self.async_enabled = False
+
+    def do_EXTENSIONS(self, param):
+        reply = super().do_EXTENSIONS(param)
+        if 'ASYNC' in getattr(self, 'extensions', ()) \
+                and getattr(self.remote, 'supports_async', False):
+            self.async_enabled = True
+            reply += ' ASYNC'
+        return reply
+
+
+class Master(_Master):
+    """Drop-in replacement for `annexremote.Master` with ASYNC support
+
+    Remotes declare to be able to handle concurrent requests by a true
+    `supports_async` attribute. For any other remote, this behaves exactly
+    like `annexremote.Master`.
+    """
+    def __init__(self, output=sys.stdout):
+        super().__init__(output=output)
+        self._output_lock = threading.Lock()
+        # thread-local job number and input queue
+        self._job = threading.local()
+        # job number -> (queue, thread)
+        self._jobs = {}
+        self._failed = False
+
+    def LinkRemote(self, remote):
+        self.remote = remote
+        self.protocol = Protocol(remote)
+
+    def Listen(self, input=sys.stdin):
+        if not (hasattr(self, "remote") and hasattr(self, "protocol")):
+            raise NotLinkedError("Please execute LinkRemote(remote) first.")
+
+        self.input = input
+        self._send(self.protocol.version)
+        try:
+            while True:
+                line = self.input.readline()
+                if not line:
+                    break
+                line = line.rstrip()
+                if self.protocol.async_enabled and line.startswith('J '):
+                    _, job, line = line.split(' ', 2)
+                    self._dispatch(job, line)
+                else:
+                    self._handle(line)
+        finally:
+            for q, thread in self._jobs.values():
+                q.put(None)
+            for q, thread in self._jobs.values():
+                thread.join()
+        if self._failed:
+            raise SystemExit
+
+    def _handle(self, line):
+        try:
+            reply = self.protocol.command(line)
+            if reply:
+                self._send(reply)
+        except UnsupportedRequest:
+            self._send("UNSUPPORTED-REQUEST")
+        except Exception as e:
+            for line in traceback.format_exc().splitlines():
+                self.debug(line)
+            self.error(e)
+            raise SystemExit
+
+    def _dispatch(self, job, line):
+        # messages of a job are processed in order, either as a new request,
+        # or as a reply to a request the job sent to git-annex
+        if job not in self._jobs:
+            q = queue.Queue()
+            thread = threading.Thread(
+                target=self._run_job,
+                args=(job, q),
+                name='annex-job-{}'.format(job),
+                daemon=True,
+            )
+            self._jobs[job] = (q, thread)
+            thread.start()
+        self._jobs[job][0].put(line)
+
+    def _run_job(self, job, q):
+        self._job.id = job
+        self._job.queue = q
+        while True:
+            line = q.get()
+            if line is None:
+                return
+            try:
+                self._handle(line)
+            except SystemExit:
+                # git-annex was informed about the error and will stop
+                # this process
+                self._failed = True
+                return
+
+    def _readline(self):
+        q = getattr(self._job, 'queue', None)
+        if q is None:
+            return self.input.readline()
+        line = q.get()
+        if line is None:
+            # git-annex is gone, let the job fail
+            raise UnexpectedMessage("Input closed while waiting for a reply")
+        return line
+
+    def _ask(self, request, reply_keyword, reply_count):
+        self._send(request)
+        line = self._readline().rstrip().split(" ", reply_count)
+        if line and line[0] == reply_keyword:
+            line.extend([""] * (reply_count + 1 - len(line)))
+            return line[1:]
+        else:
+            raise UnexpectedMessage(
+                "Expected {reply_keyword} and {reply_count} values. "
+                "Got {line}".format(reply_keyword=reply_keyword,
+                                    reply_count=reply_count,
+                                    line=line))
+
+    def _askvalues(self, request):
+        self._send(request)
+        reply = []
+        while True:
+            line = self._readline().rstrip().split(" ", 1)
+            if len(line) == 2 and line[0] == "VALUE":
+                reply.append(line[1])
+            elif len(line) == 1 and line[0] == "VALUE":
+                return reply
+            else:
+                raise UnexpectedMessage("Expected VALUE {value}")
+
+    def _send(self, *args, **kwargs):
+        job = getattr(self._job, 'id', None)
+        if job is not None:
+            # every line of a (multi-line) message needs the prefix
+            msg = kwargs.pop('sep', ' ').join(str(a) for a in args)
+            args = ('\n'.join('J {} {}'.format(job, line)
+                              for line in msg.split('\n')),)
+        with self._output_lock:
+            super()._send(*args, **kwargs)
@@ -23,8 +23,9 @@ class UnknownLayoutVersion(Exception):
 
 # TODO: Make versions a tuple of (label, description)?
 # Object tree versions we introduced so far. This is about the layout within a
-# dataset in a RIA store
-known_versions_objt = ['1', '2']
+# dataset in a RIA store. Version 3 has the layout of version 2, but annex keys
+# are stored only once per store (see get_store_object_dir())
+known_versions_objt = ['1', '2', '3']
 # Dataset tree versions we introduced so far. This is about the layout of
 # datasets in a RIA store
 known_versions_dst = ['1']
@@ -60,6 +61,68 @@ def get_layout_locations(version, base_path, dsid):
                          "".format(version, known_versions_dst))
 
 
+def get_store_object_dir(base_path):
+    """Return the store-wide directory of annex keys
+
+    Datasets with object tree version 3 do not own the annex keys in their
+    object tree. Instead, any key is placed into this directory only once
+    per store, with the same layout as a dataset object tree, and the object
+    trees of all datasets referencing it hold hardlinks to it. The number of
+    links of a key, minus one, is thereby the number of datasets referencing
+    it (see `remove_unreferenced_keys()`).
+
+    Parameters
+    ----------
+    base_path : Path
+      Base path of the store.
+
+    Returns
+    -------
+    Path
+    """
+    return base_path / 'objects'
+
+
+def remove_unreferenced_keys(io, base_path, dry_run=False):
+    """Remove keys from the store-wide object directory no dataset refers to
+
+    Keys are no longer referenced, if they were dropped from all datasets
+    (with object tree version 3) in the store, or if the respective datasets
+    were removed from the store.
+
+    Parameters
+    ----------
+    io: SSHRemoteIO or LocalIO
+      Respective execution instance.
+    base_path: Path
+      root path of the store
+    dry_run: bool, optional
+      If True, only report unreferenced keys.
+
+    Returns
+    -------
+    list of Path
+      Paths of the unreferenced keys.
+    """
+    obj_dir = get_store_object_dir(base_path)
+    if not io.exists(obj_dir):
+        return []
+    unreferenced = io.find_single_link_files(obj_dir)
+    if dry_run:
+        return unreferenced
+    for path in unreferenced:
+        io.remove(path)
+        # remove the key directory and empty hash directories
+        key_dir = path
+        for level in range(3):
+            key_dir = key_dir.parent
+            try:
+                io.remove_dir(key_dir)
+            except Exception:
+                break
+    return unreferenced
+
+
 def verify_ria_url(url, cfg):
     """Verify and decode ria url
 
@@ -231,6 +294,8 @@ def create_ds_in_store(io, base_path, dsid, obj_version, store_version,
     io.mkdir(archive_dir)
     if init_obj_tree:
         io.mkdir(dsobj_dir)
+    if obj_version == '3':
+        io.mkdir(get_store_object_dir(base_path))
     if alias:
         alias_dir = base_path / "alias"
         io.mkdir(alias_dir)
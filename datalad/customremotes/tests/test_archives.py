@@ -9,10 +9,12 @@
 """Tests for customremotes archives providing dl+archive URLs handling"""
 
 import glob
+import json
 import logging
 import os
 import os.path as op
 import sys
+import tarfile
 from time import sleep
 from unittest.mock import patch
 
@@ -50,7 +52,10 @@ from ...tests.utils_pytest import (
     with_tempfile,
     with_tree,
 )
-from ...utils import unlink
+from ...utils import (
+    rmtree,
+    unlink,
+)
 from ..archives import (
     ArchiveAnnexCustomRemote,
     link_file_load,
@@ -294,3 +299,44 @@ def test_link_file_load(tempfile=None):
         assert_equal(f.read(), "LOAD")
     assert_equal(stats(tempfile, times=False), stats(tempfile2, times=False))
     unlink(tempfile2)  # TODO: next two with_tempfile
+
+
+@known_failure_githubci_win
+@with_tree(
+    tree={'a': {'d': {'file.dat': '123'}}, 'file.dat': '123'}
+)
+def test_get_fallback_to_extraction(topdir=None):
+    with tarfile.open(op.join(topdir, 'a.tar'), 'w') as tar:
+        tar.add(op.join(topdir, 'a'), arcname='a')
+    rmtree(op.join(topdir, 'a'))
+    annex = AnnexRepo(topdir, backend='MD5E')
+    annex.init_remote(
+        ARCHIVES_SPECIAL_REMOTE,
+        ['encryption=none', 'type=external',
+         'externaltype=%s' % ARCHIVES_SPECIAL_REMOTE, 'autoenable=true'])
+    annex.add(['a.tar', 'file.dat'])
+    annex.commit(msg="Added tarball and its member")
+    annexcr = ArchiveAnnexCustomRemote(annex=None, path=topdir)
+    annex.add_url_to_file(
+        'file.dat',
+        annexcr.get_file_url(archive_file='a.tar', file='a/d/file.dat'))
+    earchive = annexcr.cache[op.join(
+        topdir,
+        annex.get_contentlocation(annex.get_file_annexinfo('a.tar')['key']))]
+
+    # the member is read from the uncompressed tarball directly
+    annex.drop('file.dat')
+    annex.get('file.dat')
+    assert_true(annex.file_has_content('file.dat'))
+    assert_false(earchive.is_extracted)
+
+    # a member index that does not match the archive makes reading the
+    # member directly fail, the archive is extracted instead
+    annex.drop('file.dat')
+    stat = os.stat(earchive._archive)
+    with open(earchive.index_path, 'w') as f:
+        json.dump(dict(signature=[stat.st_size, stat.st_mtime_ns],
+                       members={'a/d/file.dat': [stat.st_size, 3, None]}), f)
+    annex.get('file.dat')
+    assert_true(annex.file_has_content('file.dat'))
+    assert_true(earchive.is_extracted)
@@ -0,0 +1,148 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Tests for the special remote protocol handling"""
+
+import threading
+from io import StringIO
+from unittest.mock import patch
+
+from annexremote import Master as StockMaster
+from looseversion import LooseVersion
+
+from datalad.customremotes import (
+    RemoteError,
+    SpecialRemote,
+)
+from datalad.customremotes.master import (
+    Master,
+    get_master,
+    is_annexremote_compatible,
+)
+from datalad.support.external_versions import external_versions
+from datalad.tests.utils_pytest import (
+    assert_equal,
+    assert_in,
+    assert_not_in,
+    assert_raises,
+)
+
+
+class _TestRemote(SpecialRemote):
+    supports_async = True
+
+    def __init__(self, annex):
+        super().__init__(annex)
+        # both checks must run at the same time to pass
+        self.barrier = threading.Barrier(2, timeout=10)
+
+    def initremote(self):
+        pass
+
+    def prepare(self):
+        pass
+
+    def transfer_store(self, key, filename):
+        raise RemoteError('read-only')
+
+    def transfer_retrieve(self, key, filename):
+        if self.annex.getconfig('mode') != 'ok':
+            raise RemoteError('not ok')
+
+    def checkpresent(self, key):
+        self.barrier.wait()
+        return key == 'present'
+
+    def remove(self, key):
+        raise RemoteError('read-only')
+
+
+def _run_master(remote_cls, lines):
+    out = StringIO()
+    master = Master(output=out)
+    master.LinkRemote(remote_cls(master))
+    master.Listen(input=StringIO(''.join(l + '\n' for l in lines)))
+    return out.getvalue().splitlines()
+
+
+def test_master_async():
+    out = _run_master(_TestRemote, [
+        'EXTENSIONS INFO ASYNC',
+        'J 1 PREPARE',
+        'J 1 CHECKPRESENT present',
+        'J 2 CHECKPRESENT absent',
+        'J 2 TRANSFER RETRIEVE key file',
+        'J 2 VALUE ok',
+        'J 1 TRANSFER RETRIEVE key2 file2',
+        'J 1 VALUE bad',
+        'J 3 NOSUCHREQUEST',
+    ])
+    assert_equal(out[:2], ['VERSION 1', 'EXTENSIONS ASYNC'])
+    # order across jobs is undefined, but within a job it is not
+    for job, expected in (
+            ('1', ['PREPARE-SUCCESS',
+                   'CHECKPRESENT-SUCCESS present',
+                   'GETCONFIG mode',
+                   'TRANSFER-FAILURE RETRIEVE key2 not ok']),
+            ('2', ['CHECKPRESENT-FAILURE absent',
+                   'GETCONFIG mode',
+                   'TRANSFER-SUCCESS RETRIEVE key']),
+            ('3', ['UNSUPPORTED-REQUEST'])):
+        prefix = 'J {} '.format(job)
+        assert_equal(
+            [l[len(prefix):] for l in out if l.startswith(prefix)],
+            expected)
+    assert_equal(len(out), 10)
+
+
+def test_master_sync():
+    class _SyncRemote(_TestRemote):
+        supports_async = False
+
+        def checkpresent(self, key):
+            return key == 'present'
+
+    out = _run_master(_SyncRemote, [
+        'EXTENSIONS INFO ASYNC',
+        'PREPARE',
+        'CHECKPRESENT present',
+        'TRANSFER RETRIEVE key file',
+        'VALUE ok',
+    ])
+    assert_equal(out, [
+        'VERSION 1',
+        'EXTENSIONS',
+        'PREPARE-SUCCESS',
+        'CHECKPRESENT-SUCCESS present',
+        'GETCONFIG mode',
+        'TRANSFER-SUCCESS RETRIEVE key',
+    ])
+
+
+def test_master_async_error():
+    class _FailingRemote(_TestRemote):
+        def prepare(self):
+            raise ValueError('unexpected')
+
+    out = StringIO()
+    master = Master(output=out)
+    master.LinkRemote(_FailingRemote(master))
+    assert_raises(SystemExit, master.Listen,
+                  input=StringIO('EXTENSIONS ASYNC\nJ 1 PREPARE\n'))
+    out = out.getvalue().splitlines()
+    assert_in('J 1 ERROR unexpected', out)
+    assert_not_in('J 1 PREPARE-SUCCESS', out)
+
+
+def test_get_master():
+    if is_annexremote_compatible():
+        assert_equal(type(get_master(output=StringIO())), Master)
+    # unknown versions of annexremote fall back to sequential processing
+    for ver in ('1.5', '2.0', '10.1'):
+        with patch.dict(external_versions._versions, {'annexremote': LooseVersion(ver)}):
+            assert_equal(type(get_master(output=StringIO())), StockMaster)
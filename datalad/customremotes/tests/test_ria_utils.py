@@ -114,6 +114,14 @@ def _test_setup_ds_in_store(io_cls, io_args, store=None):
         assert_true(p.is_file(), msg="Not a file: %s" % str(p))
     assert_equal(version_file.read_text(), "2\n")
 
+    # version 3 comes with a store-wide object directory
+    rmtree(str(store))
+    create_store(io, store, '1')
+    create_ds_in_store(io, store, dsid, '3', '1')
+    for p in [ds_path, archives, objects, store / 'objects']:
+        assert_true(p.is_dir(), msg="Not a directory: %s" % str(p))
+    assert_equal(version_file.read_text(), "3\n")
+
 
 def test_setup_ds_in_store():
 
@@ -51,6 +51,7 @@ from datalad.runner.protocol import GeneratorMixIn
 from datalad.runner.utils import (
     AssemblingDecoderMixIn,
     LineSplitter,
+    RecordSplitter,
 )
 from datalad.support.exceptions import (
     CommandError,
@@ -275,8 +276,9 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
                             *,
                             files=None,
                             env=None,
-                            pathspec_from_file: Optional[bool]=False,
-                            sep=None):
+                            pathspec_from_file: Optional[bool] = None,
+                            sep=None,
+                            stdin=None):
         """
         Call git, yield stdout and stderr lines when available. Output lines
         are split at line ends or `sep` if `sep` is not None.
@@ -286,6 +288,8 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
         sep : str, optional
           Use `sep` as line separator. Does not create an empty last line if
           the input ends on sep. The lines contain the separator, if it exists.
+        stdin : bytes, optional
+          Input for git. Cannot be combined with `files`.
 
         All other parameters match those described for `call_git`.
 
@@ -310,24 +314,43 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
                                         StdOutErrCapture):
             """
             Generator-runner protocol that captures and yields stdout and stderr.
+
+            If `sep` is given, output is split into lines before it is
+            decoded, and complete lines are yielded.
             """
             def __init__(self):
                 GeneratorMixIn.__init__(self)
                 AssemblingDecoderMixIn.__init__(self)
                 StdOutErrCapture.__init__(self)
+                if sep is not None:
+                    self.record_splitter = {
+                        fd: RecordSplitter(
+                            sep.encode(self.encoding), keep_ends=True)
+                        for fd in (1, 2)
+                    }
 
             def pipe_data_received(self, fd, data):
-                if fd in (1, 2):
+                if fd not in (1, 2):
+                    StdOutErrCapture.pipe_data_received(self, fd, data)
+                elif sep is None:
                     self.send_result((fd, self.decode(fd, data, self.encoding)))
                 else:
-                    StdOutErrCapture.pipe_data_received(self, fd, data)
+                    for record in self.record_splitter[fd].process(data):
+                        self.send_result((fd, record.decode(self.encoding)))
+
+            def pipe_connection_lost(self, fd, exc):
+                if sep is not None and fd in (1, 2):
+                    remaining = self.record_splitter[fd].finish_processing()
+                    if remaining is not None:
+                        self.send_result((fd, remaining.decode(self.encoding)))
 
         cmd = self._git_cmd_prefix + args
 
         if files:
+            if stdin is not None:
+                raise ValueError("stdin cannot be used with files")
             # only call the wrapper if needed (adds distraction logs
-            # otherwise, and also maintains the possibility to connect
-            # stdin in the future)
+            # otherwise)
             generator = self._git_runner.run_on_filelist_chunks_items_(
                 cmd,
                 files,
@@ -345,8 +368,17 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
             generator = self._git_runner.run(
                 cmd,
                 protocol=GeneratorStdOutErrCapture,
+                stdin=stdin,
                 env=env)
 
+        if sep is not None:
+            # the protocol yields lines already
+            for file_no, line in generator:
+                if file_no not in (STDOUT_FILENO, STDERR_FILENO):
+                    raise ValueError(f"unknown file number: {file_no}")
+                yield file_no, line
+            return
+
         line_splitter = {
             STDOUT_FILENO: LineSplitter(sep, keep_ends=True),
             STDERR_FILENO: LineSplitter(sep, keep_ends=True)
@@ -370,15 +402,17 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
                   expect_stderr=False,
                   expect_fail=False,
                   env=None,
-                  pathspec_from_file: Optional[bool] = False,
-                  read_only=False):
+                  pathspec_from_file: Optional[bool] = None,
+                  read_only=False,
+                  stdin=None):
         """Allows for calling arbitrary commands.
 
         Internal helper to the call_git*() methods.
         Unlike call_git, _call_git returns both stdout and stderr.
         The parameters, return value, and raised exceptions match those
         documented for `call_git`, with the exception of env, which allows to
-        specify the custom environment (variables) to be used.
+        specify the custom environment (variables) to be used, and stdin,
+        which is passed on to `_generator_call_git`.
         """
         runner = self._git_runner
         stderr_log_level = {True: 5, False: 11}[expect_stderr]
@@ -399,6 +433,7 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
                                                           files=files,
                                                           env=env,
                                                           pathspec_from_file=pathspec_from_file,
+                                                          stdin=stdin,
                                                           ):
                 output[file_no].append(line)
 
@@ -412,7 +447,7 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
     def call_git(self, args, files=None,
                  expect_stderr=False, expect_fail=False,
                  env=None,
-                 pathspec_from_file: Optional[bool] = False,
+                 pathspec_from_file: Optional[bool] = None,
                  read_only=False):
         """Call git and return standard output.
 
@@ -433,7 +468,8 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
         pathspec_from_file : bool, optional
           Could be set to True for a `git` command which supports
           --pathspec-from-file and --pathspec-file-nul options. Then pathspecs
-          would be passed through a temporary file.
+          would be passed through a temporary file. If None (default), this
+          is done for git commands known to support these options.
         read_only : bool, optional
           By setting this to True, the caller indicates that the command does
           not write to the repository, which lets this function skip some
@@ -466,7 +502,7 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
                         expect_stderr=False,
                         expect_fail=False,
                         env=None,
-                        pathspec_from_file: Optional[bool] = False,
+                        pathspec_from_file: Optional[bool] = None,
                         read_only=False,
                         sep=None,
                         keep_ends=False):
@@ -536,7 +572,7 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
             lgr.log(stderr_log_level, "stderr| " + line.strip("\n"))
 
     def call_git_oneline(self, args, files=None, expect_stderr=False,
-                         pathspec_from_file: Optional[bool] = False,
+                         pathspec_from_file: Optional[bool] = None,
                          read_only=False):
         """Call git for a single line of output.
 
@@ -558,7 +594,7 @@ class GitRepo(RepoInterface, metaclass=PathBasedFlyweight):
         return lines[0]
 
     def call_git_success(self, args, files=None, expect_stderr=False,
-                         pathspec_from_file: Optional[bool] = False,
+                         pathspec_from_file: Optional[bool] = None,
                          read_only=False):
         """Call git and return true if the call exit code of 0.
 
@@ -0,0 +1,122 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Remove annex keys from a RIA store that no dataset refers to"""
+
+__docformat__ = 'restructuredtext'
+
+
+import logging
+
+from datalad import cfg as dlcfg
+from datalad.customremotes.ria_utils import (
+    remove_unreferenced_keys,
+    verify_ria_url,
+)
+from datalad.distributed.ora_remote import (
+    LocalIO,
+    RemoteCommandFailedError,
+    RIARemoteError,
+    SSHRemoteIO,
+)
+from datalad.interface.base import (
+    Interface,
+    build_doc,
+)
+from datalad.interface.results import get_status_dict
+from datalad.interface.utils import eval_results
+from datalad.support.constraints import EnsureStr
+from datalad.support.exceptions import CapturedException
+from datalad.support.param import Parameter
+from datalad.utils import Path
+
+lgr = logging.getLogger('datalad.distributed.clean_ria_store')
+
+
+@build_doc
+class CleanRIAStore(Interface):
+    """Remove annex keys from a RIA store that no dataset refers to
+
+    In a RIA store with datasets that were set up with the
+    ``deduplicate||--deduplicate`` option of ``create_sibling_ria||create-sibling-ria``,
+    annex keys are stored only once, in an 'objects/' directory at the root
+    of the store, and the object trees of the datasets hold hardlinks to
+    them. Dropping a key from a dataset, or removing a
+    dataset from the store, only removes the links of that dataset. This
+    command removes all keys in the store's 'objects/' directory that are
+    not linked into any dataset anymore.
+
+    Only stores that are accessible via the file system or SSH are
+    supported.
+    """
+    _params_ = dict(
+        url=Parameter(
+            args=("url",),
+            metavar="ria+<ssh|file>://<host>[/path]",
+            doc="""URL of the RIA store""",
+            constraints=EnsureStr()),
+        dry_run=Parameter(
+            args=("--dry-run",),
+            action="store_true",
+            doc="""if set, unreferenced keys are only reported, but not
+            removed"""),
+    )
+
+    @staticmethod
+    @eval_results
+    def __call__(url, *, dry_run=False):
+        res_kwargs = dict(
+            action='clean-ria-store',
+            logger=lgr,
+        )
+        try:
+            ssh_host, base_path, url = verify_ria_url(url, dlcfg)
+        except ValueError as e:
+            yield get_status_dict(
+                status='error',
+                message=str(e),
+                **res_kwargs)
+            return
+        if url.startswith(('ria+http://', 'ria+https://')):
+            yield get_status_dict(
+                status='impossible',
+                message=("cannot remove keys from a RIA store via HTTP: %s",
+                         url),
+                **res_kwargs)
+            return
+
+        base_path = Path(base_path)
+        io = SSHRemoteIO(ssh_host) if ssh_host else LocalIO()
+        try:
+            io.read_file(base_path / 'ria-layout-version')
+            keys = remove_unreferenced_keys(io, base_path, dry_run=dry_run)
+        except (FileNotFoundError, RIARemoteError,
+                RemoteCommandFailedError) as e:
+            ce = CapturedException(e)
+            yield get_status_dict(
+                status='error',
+                message=("failed to clean RIA store at %s: %s", url, ce),
+                exception=ce,
+                **res_kwargs)
+            return
+        finally:
+            io.close()
+
+        if not keys:
+            yield get_status_dict(
+                status='notneeded',
+                message=("no unreferenced keys in RIA store at %s", url),
+                **res_kwargs)
+        for key_path in keys:
+            yield get_status_dict(
+                status='ok',
+                key=key_path.name,
+                message=("unreferenced key %s %s", key_path.name,
+                         'found' if dry_run else 'removed'),
+                **res_kwargs)
+
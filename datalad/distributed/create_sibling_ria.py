@@ -148,6 +148,13 @@ class CreateSiblingRia(Interface):
     in the root of the store. This enables dataset access via URLs of format:
     'ria+<protocol>://<storelocation>#~<aliasname>'.
 
+    With ``deduplicate||--deduplicate``, a dataset's 'annex/' subdirectory
+    holds hardlinks to annex objects in an 'objects/' directory at the root
+    of the store (with the same layout), such that an annex object is stored
+    only once, regardless of the number of datasets it is part of. Objects
+    that are no longer part of any dataset can be removed with
+    ``clean_ria_store()||clean-ria-store``.
+
     Compared to standard git-annex object stores, the 'annex/' subdirectories
     used as storage siblings follow a different layout naming scheme
     ('dirhashmixed' instead of 'dirhashlower').
@@ -282,6 +289,14 @@ class CreateSiblingRia(Interface):
             doc="""specify a trust level for the storage sibling. If not
             specified, the default git-annex trust level is used. 'trust'
             should be used with care (see the git-annex-trust man page).""",),
+        deduplicate=Parameter(
+            args=("--deduplicate",),
+            action='store_true',
+            doc="""store annex keys only once in the RIA store, even if
+            they are part of multiple datasets in it. Keys are placed into a
+            store-wide 'objects/' directory, and the storage sibling of a
+            dataset only holds hardlinks to them. This requires a file system
+            with support for hardlinks at the store location."""),
         disable_storage__=Parameter(
             args=("--no-storage-sibling",),
             dest='disable_storage__',
@@ -309,7 +324,8 @@ class CreateSiblingRia(Interface):
                  recursive=False,
                  recursion_limit=None,
                  disable_storage__=None,
-                 push_url=None
+                 push_url=None,
+                 deduplicate=False,
                  ):
         if disable_storage__ is not None:
             import warnings
@@ -442,6 +458,7 @@ class CreateSiblingRia(Interface):
             group,
             post_update_hook,
             trust_level,
+            deduplicate,
             res_kwargs)
 
         if recursive:
@@ -468,6 +485,7 @@ class CreateSiblingRia(Interface):
                     group,
                     post_update_hook,
                     trust_level,
+                    deduplicate,
                     res_kwargs)
 
 
@@ -484,6 +502,7 @@ def _create_sibling_ria(
         group,
         post_update_hook,
         trust_level,
+        deduplicate,
         res_kwargs):
     # be safe across datasets
     res_kwargs = res_kwargs.copy()
@@ -597,7 +616,8 @@ def _create_sibling_ria(
             " and '{}'".format(storage_name) if storage_name else '',
         ))
     create_ds_in_store(SSHRemoteIO(ssh_host) if ssh_host else LocalIO(),
-                       base_path, ds.id, '2', '1', alias,
+                       base_path, ds.id, '3' if deduplicate else '2', '1',
+                       alias,
                        init_obj_tree=storage_sibling is not False)
     if storage_sibling:
         # we are using the main `name`, if the only thing we are creating
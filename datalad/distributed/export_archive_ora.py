@@ -26,17 +26,26 @@ from datalad.interface.base import (
     Interface,
     build_doc,
 )
+from datalad.interface.common_opts import jobs_opt
 from datalad.interface.results import (
     get_status_dict,
 )
 from datalad.interface.utils import eval_results
 from datalad.support.param import Parameter
+from datalad.support.archive_writer_7z import (
+    SevenZipWriter,
+    deflate_file,
+    read_index,
+)
 from datalad.support.constraints import (
     EnsureChoice,
+    EnsureInt,
     EnsureNone,
+    EnsureRange,
     EnsureStr,
 )
 from datalad.support.exceptions import CapturedException
+from datalad.support.parallel import ProducerConsumer
 from datalad.distribution.dataset import (
     EnsureDataset,
     datasetmethod,
@@ -52,17 +61,25 @@ lgr = logging.getLogger('datalad.customremotes.export_archive_ora')
 class ExportArchiveORA(Interface):
     """Export an archive of a local annex object store for the ORA remote.
 
-    Keys in the local annex object store are reorganized in a temporary
-    directory (using links to avoid storage duplication) to use the
-    'hashdirlower' setup used by git-annex for bare repositories and
-    the directory-type special remote. This alternative object store is
-    then moved into a 7zip archive that is suitable for use in a
-    ORA remote dataset store. Placing such an archive into::
+    Keys in the local annex object store are written into a 7zip archive
+    that is suitable for use in a ORA remote dataset store. Placing such an
+    archive into::
 
       <dataset location>/archives/archive.7z
 
     Enables the ORA special remote to locate and retrieve all keys contained
     in the archive.
+
+    The archive is written directly, without the need for the 7z tool.
+    Along with the archive, an index of its content is written to
+    '<archive>.toc', which enables the ORA special remote to look up keys
+    without listing the archive. If the target archive exists and has an
+    index, only keys that are not yet in the archive are appended to it.
+
+    If any options for 7z are given, or the target archive exists but has
+    no index, keys are instead reorganized in a temporary directory (using
+    links to avoid storage duplication), which is then moved into the
+    archive with 7z.
     """
     _params_ = dict(
         dataset=Parameter(
@@ -101,7 +118,18 @@ class ExportArchiveORA(Interface):
             nargs=REMAINDER,
             metavar="...",
             doc="""list of options for 7z to replace the default '-mx0' to
-            generate an uncompressed archive"""),
+            generate an uncompressed archive. If given, the archive is
+            created with 7z"""),
+        compression_level=Parameter(
+            args=("--compression-level",),
+            metavar="LEVEL",
+            doc="""compression level (0-9) for compressing keys with the
+            Deflate method. With 0, the default, keys are stored
+            uncompressed, which enables the ORA special remote to read them
+            without extracting them from the archive. Levels 1-9 trade
+            speed for size, as with zlib""",
+            constraints=EnsureInt() & EnsureRange(min=0, max=9)),
+        jobs=jobs_opt,
         missing_content=Parameter(
             args=("--missing-content",),
             doc="""By default, any discovered file with missing content will
@@ -125,7 +153,9 @@ class ExportArchiveORA(Interface):
             remote=None,
             annex_wanted=None,
             froms=None,
-            missing_content='error',):
+            missing_content='error',
+            compression_level=0,
+            jobs='auto'):
         # only non-bare repos have hashdirmixed, so require one
         ds = require_dataset(
             dataset, check_installed=True, purpose='export to ORA archive')
@@ -141,6 +171,10 @@ class ExportArchiveORA(Interface):
 
         froms = ensure_list(froms)
 
+        # 7z is only needed for custom options, or to add to archives
+        # that were not created by us
+        use_7z = bool(opts) or (
+            archive.exists() and read_index(archive) is None)
         if not opts:
             # uncompressed by default
             opts = ['-mx0']
@@ -210,64 +244,152 @@ class ExportArchiveORA(Interface):
             unit=' Keys',
         )
 
+        missing_file_lgr_func = None
         if missing_content == 'continue':
             missing_file_lgr_func = lgr.warning
         elif missing_content == 'ignore':
             missing_file_lgr_func = lgr.debug
 
-        link_fx = os.link
-        for keypath in keypaths:
-            key = keypath.name
-            hashdir = op.join(keypath.parts[-4], keypath.parts[-3])
-            log_progress(
-                lgr.info,
-                'oraarchiveexport',
-                'Export key %s to %s', key, hashdir,
-                update=1,
-                increment=True)
-            keydir = exportdir / hashdir / key
-            keydir.mkdir(parents=True, exist_ok=True)
+        if use_7z:
+            res = _export_with_7z(
+                keypaths, exportdir, archive, opts, missing_content,
+                missing_file_lgr_func)
+        else:
+            res = _export_direct(
+                keypaths, exportdir, archive, compression_level, jobs,
+                missing_content, missing_file_lgr_func)
+        for r in res:
+            yield dict(r, **res_kwargs)
+
+
+def _get_member_name(keypath):
+    # <hashdir1>/<hashdir2>/<key>/<key>, as in the annex object store
+    return '/'.join(keypath.parts[-4:])
+
+
+def _export_direct(keypaths, exportdir, archive, compression_level, jobs,
+                   missing_content, missing_file_lgr_func):
+    """Write keys into the archive without 7z
+
+    Keys that are already in an existing archive are skipped. With
+    compression, keys are compressed in parallel into temporary files in
+    `exportdir`, and appended to the archive in the order of completion.
+    """
+    existing = read_index(archive) or {}
+    todo = []
+    nexisting = 0
+    for keypath in sorted(keypaths):
+        if _get_member_name(keypath) in existing:
+            nexisting += 1
+        elif keypath.exists():
+            todo.append(keypath)
+        elif missing_content == 'error':
+            raise IOError('Key %s has no content available' % keypath)
+        else:
+            missing_file_lgr_func(
+                'Key %s has no content available',
+                str(keypath))
+    if nexisting:
+        lgr.info('%i keys are already in %s', nexisting, archive)
+
+    def _progress(keypath):
+        log_progress(
+            lgr.info,
+            'oraarchiveexport',
+            'Export key %s', keypath.name,
+            update=1,
+            increment=True)
+
+    with SevenZipWriter(archive) as writer:
+        if not compression_level:
+            for keypath in todo:
+                _progress(keypath)
+                writer.add(_get_member_name(keypath), keypath)
+        else:
+            exportdir.mkdir(parents=True)
             try:
-                link_fx(str(keypath), str(keydir / key))
-            except FileNotFoundError as e:
-                if missing_content == 'error':
-                    raise IOError('Key %s has no content available' % keypath)
-                missing_file_lgr_func(
-                    'Key %s has no content available',
-                    str(keypath))
-            except OSError:
-                lgr.warning(
-                    'No hard links supported at %s, will copy files instead',
-                    str(keypath))
-                # no hard links supported
-                # switch function after first error
-                link_fx = shutil.copyfile
-                link_fx(str(keypath), str(keydir / key))
+                def _deflate(keypath):
+                    packed = exportdir / _get_member_name(keypath).replace(
+                        '/', '_')
+                    size, crc = deflate_file(
+                        keypath, packed, level=compression_level)
+                    return keypath, packed, size, crc
+
+                for keypath, packed, size, crc in ProducerConsumer(
+                        todo, _deflate, jobs=jobs, reraise_immediately=True):
+                    _progress(keypath)
+                    writer.add_packed(
+                        _get_member_name(keypath), packed, size, crc,
+                        'Deflate')
+                    packed.unlink()
+            finally:
+                rmtree(str(exportdir))
+
+    log_progress(
+        lgr.info,
+        'oraarchiveexport',
+        'Finished RIA archive export to %s', archive
+    )
+    yield get_status_dict(
+        path=str(archive),
+        type='file',
+        status='ok')
+
 
+def _export_with_7z(keypaths, exportdir, archive, opts, missing_content,
+                    missing_file_lgr_func):
+    """Stage keys in `exportdir`, and move them into the archive with 7z"""
+    link_fx = os.link
+    for keypath in keypaths:
+        key = keypath.name
+        hashdir = op.join(keypath.parts[-4], keypath.parts[-3])
         log_progress(
             lgr.info,
             'oraarchiveexport',
-            'Finished RIA archive export from %s', ds
-        )
+            'Export key %s to %s', key, hashdir,
+            update=1,
+            increment=True)
+        keydir = exportdir / hashdir / key
+        keydir.mkdir(parents=True, exist_ok=True)
         try:
-            subprocess.run(
-                ['7z', 'u', str(archive), '.'] + opts,
-                cwd=str(exportdir),
-            )
-            yield get_status_dict(
-                path=str(archive),
-                type='file',
-                status='ok',
-                **res_kwargs)
-        except Exception as e:
-            ce = CapturedException(e)
-            yield get_status_dict(
-                path=str(archive),
-                type='file',
-                status='error',
-                message=('7z failed: %s', ce),
-                exception=ce,
-                **res_kwargs)
-            return
-        finally:
-            rmtree(str(exportdir))
+            link_fx(str(keypath), str(keydir / key))
+        except FileNotFoundError as e:
+            if missing_content == 'error':
+                raise IOError('Key %s has no content available' % keypath)
+            missing_file_lgr_func(
+                'Key %s has no content available',
+                str(keypath))
+        except OSError:
+            lgr.warning(
+                'No hard links supported at %s, will copy files instead',
+                str(keypath))
+            # no hard links supported
+            # switch function after first error
+            link_fx = shutil.copyfile
+            link_fx(str(keypath), str(keydir / key))
+
+    log_progress(
+        lgr.info,
+        'oraarchiveexport',
+        'Finished RIA archive export to %s', archive
+    )
+    try:
+        subprocess.run(
+            ['7z', 'u', str(archive), '.'] + opts,
+            cwd=str(exportdir),
+        )
+        yield get_status_dict(
+            path=str(archive),
+            type='file',
+            status='ok')
+    except Exception as e:
+        ce = CapturedException(e)
+        yield get_status_dict(
+            path=str(archive),
+            type='file',
+            status='error',
+            message=('7z failed: %s', ce),
+            exception=ce)
+        return
+    finally:
+        rmtree(str(exportdir))
@@ -1,7 +1,12 @@
+import base64
 import functools
+import hashlib
+import json
 import os
 import stat
 import sys
+import threading
+import time
 from pathlib import (
     Path,
     PurePosixPath
@@ -12,6 +17,7 @@ import shutil
 from shlex import quote as sh_quote
 import subprocess
 import logging
+import zlib
 from functools import wraps
 
 from datalad import ssh_manager
@@ -29,6 +35,7 @@ from datalad.support.exceptions import (
 )
 from datalad.customremotes.ria_utils import (
     get_layout_locations,
+    get_store_object_dir,
     UnknownLayoutVersion,
     verify_ria_url,
 )
@@ -41,6 +48,13 @@ from datalad.utils import (
 lgr = logging.getLogger('datalad.customremotes.ria_remote')
 
 DEFAULT_BUFFER_SIZE = 65536
+# size of the chunks of file content sent through the remote shell
+DEFAULT_PUT_CHUNK_SIZE = 1024 * 1024
+# files up to this size are sent through the remote shell, larger files
+# are copied with scp, which has no encoding overhead
+SHELL_PUT_MAX_SIZE = 1024 * 1024
+# size of the connection pool of a HTTP store
+HTTP_MAX_CONNECTIONS = 8
 
 # TODO
 # - make archive check optional
@@ -102,9 +116,81 @@ class RIARemoteError(RemoteError):
     pass
 
 
+# size of the signature header that precedes all packed streams in a 7z file
+_7Z_SIGNATURE_HEADER_SIZE = 32
+
+
+def _parse_7z_listing(out):
+    """Parse the technical listing of an archive (`7z l -slt`)
+
+    Parameters
+    ----------
+    out : str
+      Output of `7z l -slt <archive>`
+
+    Returns
+    -------
+    dict
+      Mapping of member paths (as reported by 7z) to (size, offset, crc)
+      tuples. Offset and CRC are only known (otherwise None) for members
+      that are stored uncompressed and unencrypted in a 7z archive, so that
+      their content can be read from the archive file directly.
+      Directories are not reported.
+    """
+    header, sep, listing = out.partition('\n----------\n')
+    if not sep:
+        return {}
+    archive_type = None
+    for line in header.splitlines():
+        if line.startswith('Type = '):
+            archive_type = line[7:].strip()
+    # offsets are only computed for 7z archives, whose packed streams
+    # directly follow the signature header, in the order of their blocks
+    direct = archive_type == '7z'
+    next_block_offset = _7Z_SIGNATURE_HEADER_SIZE
+    # block -> offset of the next member in this block
+    block_offsets = {}
+
+    members = {}
+    for entry in listing.split('\n\n'):
+        props = {}
+        for line in entry.splitlines():
+            key, sep, value = line.partition(' = ')
+            if not sep and line.endswith(' ='):
+                key, value = line[:-2], ''
+            props[key] = value
+        path = props.get('Path')
+        if not path or props.get('Folder') == '+' \
+                or props.get('Attributes', '').startswith('D'):
+            continue
+        size = int(props.get('Size') or 0)
+        offset = crc = None
+        block = props.get('Block')
+        if direct and block:
+            if block not in block_offsets:
+                if block != str(len(block_offsets)) \
+                        or not props.get('Packed Size'):
+                    # unexpected block order, no idea where the rest is
+                    direct = False
+                else:
+                    block_offsets[block] = next_block_offset
+                    next_block_offset += int(props['Packed Size'])
+            if direct:
+                if props.get('Method') == 'Copy' \
+                        and props.get('Encrypted', '-') == '-':
+                    offset = block_offsets[block]
+                    crc = props.get('CRC') or None
+                block_offsets[block] += size
+        members[path] = (size, offset, crc)
+    return members
+
+
 class IOBase(object):
     """Abstract class with the desired API for local/remote operations"""
 
+    # archive path -> (archive signature, TOC), see get_archive_toc()
+    _archive_tocs = None
+
     def get_7z(self):
         raise NotImplementedError
 
@@ -123,6 +209,19 @@ class IOBase(object):
     def rename(self, src, dst):
         raise NotImplementedError
 
+    def link(self, src, dst):
+        """Create a hardlink `dst` to the file `src`"""
+        raise NotImplementedError
+
+    def find_single_link_files(self, path):
+        """Report all files underneath `path` that have no other hardlink
+
+        Returns
+        -------
+        list of Path
+        """
+        raise NotImplementedError
+
     def remove(self, path):
         raise NotImplementedError
 
@@ -132,6 +231,11 @@ class IOBase(object):
     def get_from_archive(self, archive, src, dst, progress_cb):
         """Get a file from an archive
 
+        Members that are stored uncompressed in a 7z archive are read
+        directly from the archive file, at the location given by the
+        archive's table of contents (see `get_archive_toc()`), and verified
+        by their CRC. Anything else is extracted by 7z.
+
         Parameters
         ----------
         archive_path : Path or str
@@ -140,6 +244,53 @@ class IOBase(object):
           Must be a relative Path (relative to the root
           of the archive)
         """
+        try:
+            toc = self.get_archive_toc(archive)
+        except RIARemoteError as e:
+            # leave it to 7z to report on the archive
+            lgr.debug("Failed to list %s: %s", archive, e)
+            toc = None
+        size, offset, crc = (toc or {}).get(str(src), (None, None, None))
+        if offset is not None:
+            try:
+                with open(dst, 'wb') as target_file:
+                    checksum = 0
+                    for chunk in self._read_archive_range(
+                            archive, offset, size, progress_cb):
+                        checksum = zlib.crc32(chunk, checksum)
+                        target_file.write(chunk)
+                if crc is None or int(crc, 16) == checksum:
+                    return
+                lgr.debug("CRC mismatch for %s read from %s", src, archive)
+            except Exception as e:
+                lgr.debug("Failed to read %s from %s directly: %s",
+                          src, archive, e)
+        self._extract_from_archive(archive, src, dst, progress_cb)
+
+    def _extract_from_archive(self, archive, src, dst, progress_cb):
+        """Extract a file from an archive with 7z
+
+        Parameters are identical to `get_from_archive()`.
+        """
+        raise NotImplementedError
+
+    def _read_archive_range(self, archive, offset, size, progress_cb):
+        """Read a byte range from an archive file
+
+        Parameters
+        ----------
+        archive : Path or str
+        offset : int
+          Start of the range in the archive file.
+        size : int
+          Number of bytes to read.
+        progress_cb : callable
+          Called with the number of bytes read so far.
+
+        Returns
+        -------
+        generator(bytes)
+        """
         raise NotImplementedError
 
     def in_archive(self, archive_path, file_path):
@@ -152,6 +303,143 @@ class IOBase(object):
         file_path : Path or str
           Must be a relative Path (relative to the root
           of the archive)
+
+        Raises
+        ------
+        RIARemoteError
+          If the archive exists, but cannot be listed.
+        """
+        toc = self.get_archive_toc(archive_path)
+        return toc is not None and str(file_path) in toc
+
+    def get_archive_toc(self, archive_path):
+        """Get the table of contents (TOC) of an archive
+
+        The TOC is taken from the archive's index, if there is one (see
+        `_read_archive_index()`). Otherwise the archive is listed only once.
+        The TOC is kept in memory, and in a local cache (in
+        `datalad.locations.cache`). Any TOC is only used as long as size and
+        modification time of the archive are unchanged.
+
+        Parameters
+        ----------
+        archive_path : Path or str
+          Must be an absolute path
+
+        Returns
+        -------
+        dict or None
+          See `_parse_7z_listing()` for the content. None if there is no
+          archive.
+
+        Raises
+        ------
+        RIARemoteError
+          If the archive exists, but cannot be listed.
+        """
+        signature = self._get_archive_signature(archive_path)
+        if signature is None:
+            return None
+        if self._archive_tocs is None:
+            self._archive_tocs = {}
+        key = str(archive_path)
+        cached = self._archive_tocs.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+
+        cache_file = self._get_archive_toc_cache_file(archive_path)
+        toc = None
+        try:
+            with open(cache_file) as f:
+                cached = json.load(f)
+            if cached['signature'] == list(signature):
+                toc = {p: tuple(m) for p, m in cached['members'].items()}
+        except (OSError, ValueError, KeyError) as e:
+            lgr.debug("No cached TOC for %s: %s", archive_path, e)
+
+        if toc is None:
+            toc = self._read_archive_index(archive_path, signature[0])
+        if toc is None:
+            toc = _parse_7z_listing(self._list_archive(archive_path))
+            try:
+                cache_file.parent.mkdir(parents=True, exist_ok=True)
+                tmp_file = cache_file.with_suffix('.tmp{}'.format(os.getpid()))
+                with open(tmp_file, 'w') as f:
+                    json.dump(dict(
+                        archive=self._get_archive_id(archive_path),
+                        signature=list(signature),
+                        members=toc), f)
+                tmp_file.replace(cache_file)
+            except OSError as e:
+                lgr.debug("Could not cache TOC of %s: %s", archive_path, e)
+
+        self._archive_tocs[key] = (signature, toc)
+        return toc
+
+    def _read_archive_index(self, archive_path, archive_size):
+        """Read the TOC from the index written along with an archive
+
+        Archives created by `export-archive-ora` come with an index (see
+        `datalad.support.archive_writer_7z`), which spares listing the
+        archive with 7z.
+
+        Returns
+        -------
+        dict or None
+          See `_parse_7z_listing()` for the content. None if there is no
+          index that matches the archive.
+        """
+        from datalad.support.archive_writer_7z import (
+            get_index_path,
+            parse_index,
+        )
+        index_path = get_index_path(Path(archive_path))
+        try:
+            if not self.exists(index_path):
+                return None
+            members = parse_index(self.read_file(index_path), archive_size)
+        except (OSError, RIARemoteError) as e:
+            lgr.debug("Could not read index of %s: %s", archive_path, e)
+            return None
+        if members is None:
+            return None
+        # only uncompressed members can be read directly
+        return {
+            p: (m[0], m[1], m[2]) if m[4] == 'Copy' else (m[0], None, None)
+            for p, m in members.items()
+        }
+
+    def _get_archive_id(self, archive_path):
+        """Return a string that identifies an archive across IO instances"""
+        return str(archive_path)
+
+    def _get_archive_toc_cache_file(self, archive_path):
+        from datalad import cfg
+        return Path(cfg.obtain('datalad.locations.cache')) / 'ora-archive-tocs' \
+            / '{}.json'.format(hashlib.md5(
+                self._get_archive_id(archive_path).encode()).hexdigest())
+
+    def _get_archive_signature(self, archive_path):
+        """Return size and modification time of an archive
+
+        Returns
+        -------
+        tuple or None
+          None if the archive does not exist.
+        """
+        raise NotImplementedError
+
+    def _list_archive(self, archive_path):
+        """Return the technical listing of an archive (`7z l -slt`)
+
+        Returns
+        -------
+        str
+
+        Raises
+        ------
+        RIARemoteError
+          If the archive could not be listed.
         """
         raise NotImplementedError
 
@@ -188,6 +476,17 @@ class LocalIO(IOBase):
 
     ensure_writeable = staticmethod(ensure_write_permission)
 
+    def __init__(self, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.buffer_size = buffer_size if buffer_size else DEFAULT_BUFFER_SIZE
+        # archive path -> (archive signature, open file), archives are
+        # kept open to serve any number of members from them
+        self._archive_files = {}
+
+    def close(self):
+        for _, f in self._archive_files.values():
+            f.close()
+        self._archive_files = {}
+
     def mkdir(self, path):
         path.mkdir(
             parents=True,
@@ -209,7 +508,28 @@ class LocalIO(IOBase):
             str(dst),
         )
 
-    def get_from_archive(self, archive, src, dst, progress_cb):
+    def _read_archive_range(self, archive, offset, size, progress_cb):
+        signature = self._get_archive_signature(archive)
+        key = str(archive)
+        cached = self._archive_files.get(key)
+        if not cached or cached[0] != signature:
+            if cached:
+                cached[1].close()
+            cached = (signature, open(archive, 'rb'))
+            self._archive_files[key] = cached
+        f = cached[1]
+        f.seek(offset)
+        bytes_received = 0
+        while bytes_received < size:
+            chunk = f.read(min(self.buffer_size, size - bytes_received))
+            if not chunk:
+                raise RIARemoteError(
+                    "unexpected end of archive {}".format(archive))
+            bytes_received += len(chunk)
+            yield chunk
+            progress_cb(bytes_received)
+
+    def _extract_from_archive(self, archive, src, dst, progress_cb):
         # Upfront check to avoid cryptic error output
         # https://github.com/datalad/datalad/issues/4336
         if not self.exists(archive):
@@ -233,6 +553,23 @@ class LocalIO(IOBase):
         with self.ensure_writeable(dst.parent):
             src.rename(dst)
 
+    def link(self, src, dst):
+        with self.ensure_writeable(dst.parent):
+            os.link(str(src), str(dst))
+
+    def find_single_link_files(self, path):
+        found = []
+        dirs = [str(path)]
+        while dirs:
+            with os.scandir(dirs.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False) \
+                            and entry.stat(follow_symlinks=False).st_nlink == 1:
+                        found.append(Path(entry.path))
+        return found
+
     def remove(self, path):
         try:
             with self.ensure_writeable(path.parent):
@@ -249,24 +586,30 @@ class LocalIO(IOBase):
     def exists(self, path):
         return path.exists()
 
-    def in_archive(self, archive_path, file_path):
-        if not archive_path.exists():
-            # no archive, not file
-            return False
-        loc = str(file_path)
+    def _get_archive_signature(self, archive_path):
+        try:
+            st = Path(archive_path).stat()
+        except OSError:
+            # no archive, no file
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _list_archive(self, archive_path):
         from datalad.cmd import (
+            CommandError,
             StdOutErrCapture,
             WitlessRunner,
         )
         runner = WitlessRunner()
-        # query 7z for the specific object location, keeps the output
-        # lean, even for big archives
-        out = runner.run(
-            ['7z', 'l', str(archive_path),
-             loc],
-            protocol=StdOutErrCapture,
-        )
-        return loc in out['stdout']
+        try:
+            out = runner.run(
+                ['7z', 'l', '-slt', str(archive_path)],
+                protocol=StdOutErrCapture,
+            )
+        except (FileNotFoundError, CommandError) as e:
+            raise RIARemoteError(
+                "Failed to list archive {}: {}".format(archive_path, e)) from e
+        return out['stdout']
 
     def read_file(self, file_path):
 
@@ -509,63 +852,93 @@ class SSHRemoteIO(IOBase):
     def symlink(self, target, link_name):
         self._run('ln -s {} {}'.format(sh_quote(str(target)), sh_quote(str(link_name))))
 
-    def put(self, src, dst, progress_cb):
-        self.ssh.put(str(src), str(dst))
-
-    def get(self, src, dst, progress_cb):
+    # delimiter of the here-documents used to send file content, must not
+    # be part of the base64 alphabet
+    PUT_DATA_DELIMITER = "ORA-REMOTE-DATA-END"
 
-        # Note, that as we are in blocking mode, we can't easily fail on the
-        # actual get (that is 'cat').
-        # Therefore check beforehand.
-        if not self.exists(src):
-            raise RIARemoteError("annex object {src} does not exist."
-                                 "".format(src=src))
-
-        # TODO: see get_from_archive()
-
-        # TODO: Currently we will hang forever if the file isn't readable and
-        #       it's supposed size is bigger than whatever cat spits out on
-        #       stdout. This is because we don't notice that cat has exited
-        #       non-zero. We could have end marker on stderr instead, but then
-        #       we need to empty stderr beforehand to not act upon output from
-        #       earlier calls. This is a problem with blocking reading, since we
-        #       need to make sure there's actually something to read in any
-        #       case.
-        cmd = 'cat {}'.format(sh_quote(str(src)))
-        self.shell.stdin.write(cmd.encode())
-        self.shell.stdin.write(b"\n")
+    def put(self, src, dst, progress_cb):
+        if os.stat(src).st_size > SHELL_PUT_MAX_SIZE:
+            # the per-call overhead of scp does not matter for large files
+            self.ssh.put(str(src), str(dst))
+            progress_cb(os.stat(src).st_size)
+            return
+        # Instead of an scp call per file (a new SSH channel and handshake
+        # each time), small files are sent through the existing shell.
+        # Any shell may read ahead on its input, hence the content can only
+        # be passed as part of a command, as base64-encoded here-documents,
+        # one per chunk. Chunks are sent back-to-back, and the result is
+        # verified by size and checksum at the end.
+        dst = sh_quote(str(dst))
+        size = 0
+        md5 = hashlib.md5()
+        with open(src, 'rb') as f:
+            # not ':', a failing redirection of a special builtin would
+            # make a POSIX shell exit
+            self.shell.stdin.write('cat /dev/null > {}\n'.format(dst).encode())
+            while True:
+                chunk = f.read(DEFAULT_PUT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                md5.update(chunk)
+                self.shell.stdin.write(
+                    "base64 -d >> {} <<'{delim}'\n".format(
+                        dst, delim=self.PUT_DATA_DELIMITER).encode())
+                self.shell.stdin.write(base64.encodebytes(chunk))
+                self.shell.stdin.write(
+                    '{}\n'.format(self.PUT_DATA_DELIMITER).encode())
+                progress_cb(size)
         self.shell.stdin.flush()
-
-        from os.path import basename
-        key = basename(str(src))
         try:
-            size = self._get_download_size_from_key(key)
-        except RemoteError as e:
-            raise RemoteError(f"src: {src}") from e
-
-        if size is None:
-            # rely on SCP for now
-            self.ssh.get(str(src), str(dst))
-            return
+            out = self._run(
+                'test "$(wc -c < {dst})" -eq {size} && '
+                '{{ md5sum < {dst} || md5 -q < {dst}; }} 2>/dev/null'.format(
+                    dst=dst, size=size),
+                no_output=False, check=True)
+        except RemoteCommandFailedError as e:
+            raise RIARemoteError(
+                "Failed to write {} ({} bytes)".format(dst, size)) from e
+        if out.split()[:1] != [md5.hexdigest()]:
+            raise RIARemoteError(
+                "Checksum mismatch after writing {}".format(dst))
 
+    def get(self, src, dst, progress_cb):
+        # A single request reports the size of the file, followed by its
+        # content, or the failure marker if the file cannot be read. This
+        # does not rely on the key to tell the size of the file.
+        src = sh_quote(str(src))
+        content = self._read_framed(
+            'test -f {src} && test -r {src} && '
+            'n=$(($(wc -c < {src})))'.format(src=src),
+            'cat {}'.format(src),
+            'test "$(($(wc -c < {})))" -eq "$n"'.format(src),
+            'annex object {}'.format(src))
         with open(dst, 'wb') as target_file:
             bytes_received = 0
-            while bytes_received < size:
-                # TODO: some additional abortion criteria? check stderr in
-                #       addition?
-                c = self.shell.stdout.read1(self.buffer_size)
-                # no idea yet, whether or not there's sth to gain by a
-                # sophisticated determination of how many bytes to read at once
-                # (like size - bytes_received)
-                if c:
-                    bytes_received += len(c)
-                    target_file.write(c)
-                    progress_cb(bytes_received)
+            for c in content:
+                bytes_received += len(c)
+                target_file.write(c)
+                progress_cb(bytes_received)
 
     def rename(self, src, dst):
         with self.ensure_writeable(dst.parent):
             self._run('mv {} {}'.format(sh_quote(str(src)), sh_quote(str(dst))))
 
+    def link(self, src, dst):
+        with self.ensure_writeable(dst.parent):
+            try:
+                self._run('ln {} {}'.format(sh_quote(str(src)),
+                                            sh_quote(str(dst))),
+                          check=True)
+            except RemoteCommandFailedError as e:
+                raise RIARemoteError(
+                    f"Unable to link {src} to {dst}") from e
+
+    def find_single_link_files(self, path):
+        out = self._run('find {} -type f -links 1'.format(sh_quote(str(path))),
+                        no_output=False, check=True)
+        return [Path(p) for p in out.splitlines() if p]
+
     def remove(self, path):
         try:
             with self.ensure_writeable(path.parent):
@@ -579,32 +952,138 @@ class SSHRemoteIO(IOBase):
             self._run('rmdir {}'.format(sh_quote(str(path))))
 
     def exists(self, path):
+        # one blocking request per path; with ASYNC, concurrent checks of
+        # several jobs run on separate per-thread IO instances (see RIARemote)
         try:
             self._run('test -e {}'.format(sh_quote(str(path))), check=True)
             return True
         except RemoteCommandFailedError:
             return False
 
-    def in_archive(self, archive_path, file_path):
+    def _get_archive_id(self, archive_path):
+        return '{}:{}'.format(self.ssh.sshri.as_str(), archive_path)
 
-        if not self.exists(archive_path):
-            return False
+    def _get_archive_signature(self, archive_path):
+        # same reasoning on the stat format as in ensure_writeable()
+        format_option = "-f'%z %m'" if on_osx else "--format='%s %Y'"
+        try:
+            out = self._run(
+                'stat {} {}'.format(format_option,
+                                    sh_quote(str(archive_path))),
+                no_output=False, check=True)
+        except RemoteCommandFailedError:
+            # no archive, no file
+            return None
+        return tuple(int(i) for i in out.split())
+
+    def _list_archive(self, archive_path):
+        try:
+            return self._run(
+                '7z l -slt {}'.format(sh_quote(str(archive_path))),
+                no_output=False, check=True)
+        except RemoteCommandFailedError as e:
+            raise RIARemoteError(
+                "Failed to list archive {}: {}".format(archive_path, e)) from e
+
+    def _read_archive_range(self, archive, offset, size, progress_cb):
+        archive = sh_quote(str(archive))
+        bytes_received = 0
+        # the range must be within the archive
+        check = 'test "$(wc -c < {})" -ge {}'.format(archive, offset + size)
+        content = self._read_framed(
+            'n={} && {}'.format(size, check),
+            # tail seeks to the offset, no need to read the archive up
+            # to there
+            'tail -c +{} {}'.format(offset + 1, archive),
+            check,
+            archive)
+        try:
+            for c in content:
+                bytes_received += len(c)
+                yield c
+                progress_cb(bytes_received)
+        finally:
+            # drain the shell output if the caller stopped reading
+            content.close()
 
-        loc = str(file_path)
-        # query 7z for the specific object location, keeps the output
-        # lean, even for big archives
-        cmd = '7z l {} {}'.format(
-            sh_quote(str(archive_path)),
-            sh_quote(loc))
+    def _read_framed(self, prepare, cmd, verify, what):
+        """Read the output of a remote command of a known length
 
-        # Note: Currently relies on file_path not showing up in case of failure
-        # including non-existent archive. If need be could be more sophisticated
-        # and called with check=True + catch RemoteCommandFailedError
-        out = self._run(cmd, no_output=False, check=False)
+        The remote reports the number of bytes it is going to send, followed
+        by exactly this number of bytes, and an end marker. If the command
+        produces less output (e.g. because a file was truncated meanwhile),
+        the output is padded, and the end marker reports a failure.
 
-        return loc in out
+        Parameters
+        ----------
+        prepare : str
+          Shell condition that is tested before running `cmd`. It must
+          assign the number of bytes to read to the shell variable `n`.
+        cmd : str
+          Shell command whose output is read. Only the first `n` bytes of the
+          output are sent.
+        verify : str
+          Shell condition that is tested after running `cmd`, to confirm that
+          its output was complete.
+        what : str
+          Description of the output for error messages.
 
-    def get_from_archive(self, archive, src, dst, progress_cb):
+        Returns
+        -------
+        generator(bytes)
+          The output. The command is run, and its size is read, before this
+          generator is returned.
+
+        Raises
+        ------
+        RIARemoteError
+          If `prepare` fails.
+        """
+        self.shell.stdin.write(
+            "if {prepare}; then printf '%s\\n' \"$n\"; "
+            "{{ {cmd} | head -c \"$n\"; head -c \"$n\" /dev/zero; }} "
+            "| head -c \"$n\"; {verify} && printf '%s\\n' {ok} || "
+            "printf '%s\\n' {fail}; else printf '%s\\n' {fail}; fi\n".format(
+                prepare=prepare, cmd=cmd, verify=verify,
+                ok=sh_quote(self.REMOTE_CMD_OK),
+                fail=sh_quote(self.REMOTE_CMD_FAIL)).encode())
+        self.shell.stdin.flush()
+        header = self.shell.stdout.readline().decode()
+        if not header:
+            raise RIARemoteError(
+                "Connection closed while reading {}".format(what))
+        if header == self.REMOTE_CMD_FAIL + '\n':
+            raise RIARemoteError("Cannot read {}".format(what))
+        return self._read_framed_body(int(header), what)
+
+    def _read_framed_body(self, size, what):
+        """Helper of `_read_framed()` to read the output after its size"""
+        bytes_received = 0
+
+        def _read():
+            c = self.shell.stdout.read1(
+                min(self.buffer_size, size - bytes_received))
+            if not c:
+                raise RIARemoteError(
+                    "Connection closed while reading {}".format(what))
+            return c
+
+        try:
+            while bytes_received < size:
+                c = _read()
+                bytes_received += len(c)
+                yield c
+        finally:
+            # the shell must not be left with unread output, even if the
+            # caller stopped reading
+            while bytes_received < size:
+                bytes_received += len(_read())
+            marker = self.shell.stdout.readline().decode()
+        if marker != self.REMOTE_CMD_OK + '\n':
+            raise RIARemoteError(
+                "{} changed while reading it".format(what))
+
+    def _extract_from_archive(self, archive, src, dst, progress_cb):
 
         # Note, that as we are in blocking mode, we can't easily fail on the
         # actual get (that is 'cat'). Therefore check beforehand.
@@ -711,7 +1190,8 @@ class HTTPRemoteIO(object):
     # NOTE: For now read-only. Not sure yet whether an IO class is the right
     # approach.
 
-    def __init__(self, url, buffer_size=DEFAULT_BUFFER_SIZE):
+    def __init__(self, url, buffer_size=DEFAULT_BUFFER_SIZE,
+                 negative_cache_ttl=None, max_connections=HTTP_MAX_CONNECTIONS):
         from datalad.downloaders.providers import Providers
         if not url.startswith("http"):
             raise RIARemoteError("Expected HTTP URL, but got {}".format(url))
@@ -721,6 +1201,22 @@ class HTTPRemoteIO(object):
         # make sure default is used when None was passed, too.
         self.buffer_size = buffer_size if buffer_size else DEFAULT_BUFFER_SIZE
         self._providers = Providers.from_config_files()
+        # all requests go through a single session, so that connections are
+        # kept alive and reused instead of being set up for every key
+        self.max_connections = max_connections or HTTP_MAX_CONNECTIONS
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.max_connections)
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+        # for how many seconds a path that was not found is reported as
+        # absent without asking the server again
+        self.negative_cache_ttl = negative_cache_ttl or 0
+        # path -> time of the failed lookup
+        self._negative_cache = {}
+
+    def close(self):
+        self._session.close()
 
     def checkpresent(self, key_path):
         # Note, that we need the path with hash dirs, since we don't have access
@@ -733,18 +1229,51 @@ class HTTPRemoteIO(object):
         # to annexremote.dirhash from within IO classes
 
         url = self.store_url + str(key_path)
-        self._providers.download(url, path=filename, overwrite=True)
+        try:
+            response = self._session.get(url, stream=True)
+        except Exception as e:
+            raise RIARemoteError(f"Failed to access {url}") from e
+        with response:
+            if response.status_code in (401, 403):
+                # the store requires authentication, let the downloaders
+                # deal with credentials
+                self._providers.download(url, path=filename, overwrite=True)
+                return
+            if response.status_code == 404:
+                raise RIARemoteError(f"{url} not found.")
+            try:
+                response.raise_for_status()
+            except Exception as e:
+                raise RIARemoteError(f"Failed to access {url}") from e
+            bytes_received = 0
+            with open(filename, 'wb') as f:
+                for chunk in response.iter_content(self.buffer_size):
+                    f.write(chunk)
+                    bytes_received += len(chunk)
+                    progress_cb(bytes_received)
+        self._negative_cache.pop(Path(key_path).as_posix(), None)
 
     def exists(self, path):
         # use same signature as in SSH and Local IO, although validity is
         # limited in case of HTTP.
-        url = self.store_url + path.as_posix()
+        path = path.as_posix()
+        if self.negative_cache_ttl:
+            checked = self._negative_cache.get(path)
+            if checked is not None:
+                if time.monotonic() - checked < self.negative_cache_ttl:
+                    return False
+                del self._negative_cache[path]
+        url = self.store_url + path
         try:
-            response = requests.head(url, allow_redirects=True)
+            response = self._session.head(url, allow_redirects=True)
         except Exception as e:
             raise RIARemoteError from e
 
-        return response.status_code == 200
+        if response.status_code == 200:
+            return True
+        if self.negative_cache_ttl and response.status_code == 404:
+            self._negative_cache[path] = time.monotonic()
+        return False
 
     def read_file(self, file_path):
 
@@ -838,6 +1367,9 @@ def handle_errors(func):
                 if self._push_io:
                     self._push_io.close()
                     unregister(self._push_io.close)
+                # start over with new connections on the next request
+                self._io = None
+                self._push_io = None
             except AttributeError:
                 # seems like things are already being cleaned up -> a good
                 pass
@@ -864,8 +1396,11 @@ class RIARemote(SpecialRemote):
     dataset_tree_version = '1'
     object_tree_version = '2'
     # TODO: Move known versions. Needed by creation routines as well.
-    known_versions_objt = ['1', '2']
+    known_versions_objt = ['1', '2', '3']
     known_versions_dst = ['1']
+    # concurrent jobs of git-annex are processed by a single instance, each
+    # with its own IO
+    supports_async = True
 
     @handle_errors
     def __init__(self, annex):
@@ -899,14 +1434,38 @@ class RIARemote(SpecialRemote):
         self.remote_git_dir = None
         self.remote_archive_dir = None
         self.remote_obj_dir = None
-        # lazy IO:
+        # lazy IO, one per thread, such that concurrent requests use
+        # separate channels:
+        self._ios = threading.local()
         self._io = None
         self._push_io = None
+        # whether the push-url is in use (for all threads)
+        self._switched_to_push = False
+        self._push_switch_lock = threading.Lock()
+        # PREPARE is performed once per process
+        self._prepared = False
+        self._prepare_lock = threading.Lock()
 
         # cache obj_locations:
         self._last_archive_path = None
         self._last_keypath = (None, None)
 
+    @property
+    def _io(self):
+        return getattr(self._ios, 'io', None)
+
+    @_io.setter
+    def _io(self, io):
+        self._ios.io = io
+
+    @property
+    def _push_io(self):
+        return getattr(self._ios, 'push_io', None)
+
+    @_push_io.setter
+    def _push_io(self, io):
+        self._ios.push_io = io
+
     def verify_store(self):
         """Check whether the store exists and reports a layout version we
         know
@@ -972,6 +1531,22 @@ class RIARemote(SpecialRemote):
         if self.buffer_size:
             self.buffer_size = int(self.buffer_size)
 
+        # seconds to remember that a key is not present in a store accessed
+        # via HTTP
+        self.http_negative_cache_ttl = self._repo.config.get(
+            f"remote.{name}.ora-http-negative-cache-ttl")
+
+        if self.http_negative_cache_ttl:
+            try:
+                self.http_negative_cache_ttl = float(
+                    self.http_negative_cache_ttl)
+            except ValueError:
+                lgr.warning(
+                    "Ignoring invalid remote.%s.ora-http-negative-cache-ttl "
+                    "%r, expected a number of seconds",
+                    name, self.http_negative_cache_ttl)
+                self.http_negative_cache_ttl = None
+
     def _verify_config(self, gitdir, fail_noid=True):
         # try loading all needed info from (git) config
         name = self.annex.getconfig('name')
@@ -1208,9 +1783,12 @@ class RIARemote(SpecialRemote):
 
     @property
     def io(self):
+        if self._switched_to_push:
+            # all operations go through the push-url (see push_io)
+            return self.push_io
         if not self._io:
             if self._local_io():
-                self._io = LocalIO()
+                self._io = LocalIO(self.buffer_size)
             elif self.ria_store_url.startswith("ria+http"):
                 # TODO: That construction of "http(s)://host/" should probably
                 #       be moved, so that we get that when we determine
@@ -1222,8 +1800,11 @@ class RIARemote(SpecialRemote):
                 # we expect parts: ("http(s):", "", host:port, path)
                 self._io = HTTPRemoteIO(
                     url_parts[0] + "//" + url_parts[2],
-                    self.buffer_size
+                    self.buffer_size,
+                    negative_cache_ttl=self.http_negative_cache_ttl,
                 )
+                from atexit import register
+                register(self._io.close)
             elif self.storage_host:
                 self._io = SSHRemoteIO(self.storage_host, self.buffer_size)
                 from atexit import register
@@ -1248,54 +1829,68 @@ class RIARemote(SpecialRemote):
 
         if not self._push_io:
             if self.ria_store_pushurl:
-                self.message("switching ORA to push-url")
                 # Not-implemented-push-HTTP is ruled out already when reading
                 # push-url, so either local or SSH:
                 if not self.storage_host_push:
                     # local operation
-                    self._push_io = LocalIO()
+                    self._push_io = LocalIO(self.buffer_size)
                 else:
                     self._push_io = SSHRemoteIO(self.storage_host_push,
                                                 self.buffer_size)
 
                 # We have a new instance. Kill the existing one and replace.
                 from atexit import register, unregister
-                if hasattr(self.io, 'close'):
-                    unregister(self.io.close)
-                    self.io.close()
+                if hasattr(self._io, 'close'):
+                    unregister(self._io.close)
+                    self._io.close()
 
                 # XXX now also READ IO is done with the write IO
                 # this explicitly ignores the remote config
                 # that distinguishes READ from WRITE with different
                 # methods
                 self._io = self._push_io
-                if hasattr(self.io, 'close'):
-                    register(self.io.close)
-
-                self.storage_host = self.storage_host_push
-                self.store_base_path = self.store_base_path_push
-
-                # delete/update cached locations:
-                self._last_archive_path = None
-                self._last_keypath = (None, None)
-
-                store_base_path = Path(self.store_base_path) \
-                    if self._local_io else self.store_base_path
-
-                self.remote_git_dir, \
-                self.remote_archive_dir, \
-                self.remote_obj_dir = \
-                    self.get_layout_locations(store_base_path, self.archive_id)
+                if hasattr(self._io, 'close'):
+                    register(self._io.close)
+
+                # the store locations are shared by all threads, hence
+                # switch them only once
+                with self._push_switch_lock:
+                    if not self._switched_to_push:
+                        self.message("switching ORA to push-url")
+                        self.storage_host = self.storage_host_push
+                        self.store_base_path = self.store_base_path_push
+
+                        # delete/update cached locations:
+                        self._last_archive_path = None
+                        self._last_keypath = (None, None)
+
+                        store_base_path = Path(self.store_base_path) \
+                            if self._local_io else self.store_base_path
+
+                        self.remote_git_dir, \
+                        self.remote_archive_dir, \
+                        self.remote_obj_dir = \
+                            self.get_layout_locations(store_base_path,
+                                                      self.archive_id)
+                        self._switched_to_push = True
 
             else:
                 # no push-url: use existing IO
-                self._push_io = self._io
+                self._push_io = self.io
 
         return self._push_io
 
     @handle_errors
     def prepare(self):
-
+        # with concurrent jobs, PREPARE may be requested by several of them,
+        # but all of them share the results of the first one
+        with self._prepare_lock:
+            if self._prepared:
+                return
+            self._prepare()
+            self._prepared = True
+
+    def _prepare(self):
         gitdir = self.annex.getgitdir()
         self._repo = AnnexRepo(gitdir)
         self._verify_config(gitdir)
@@ -1322,6 +1917,11 @@ class RIARemote(SpecialRemote):
         key = _sanitize_key(key)
 
         dsobj_dir, archive_path, key_path = self._get_obj_location(key)
+        # keys are stored only once per store with object tree version 3,
+        # the dataset's object tree has a link to them
+        store_key_path = \
+            get_store_object_dir(Path(self.store_base_path)) / key_path \
+            if self.remote_object_tree_version == '3' else None
         key_path = dsobj_dir / key_path
 
         if self.push_io.exists(key_path):
@@ -1331,6 +1931,14 @@ class RIARemote(SpecialRemote):
 
         self.push_io.mkdir(key_path.parent)
 
+        if store_key_path and self.push_io.exists(store_key_path):
+            try:
+                self.push_io.link(store_key_path, key_path)
+                return
+            except Exception as e:
+                # it may just have been removed as unreferenced, upload it
+                lgr.debug("Failed to link %s from the store: %s", key, e)
+
         # We need to copy to a temp location to let checkpresent fail while the
         # transfer is still in progress and furthermore not interfere with
         # administrative tasks in annex/objects.
@@ -1351,6 +1959,17 @@ class RIARemote(SpecialRemote):
             self.push_io.remove(tmp_path)
             raise e
 
+        if store_key_path:
+            # share the key with other datasets in the store. It is linked
+            # only after it is referenced by this dataset, such that it is
+            # never considered unreferenced.
+            try:
+                self.push_io.mkdir(store_key_path.parent)
+                self.push_io.link(key_path, store_key_path)
+            except Exception as e:
+                # e.g. stored for another dataset at the same time
+                lgr.debug("Failed to link %s into the store: %s", key, e)
+
     @handle_errors
     def transfer_retrieve(self, key, filename):
         # we need a file-system compatible name for the key
@@ -1392,10 +2011,8 @@ class RIARemote(SpecialRemote):
         if isinstance(self.io, HTTPRemoteIO):
             # no client-side archive access over HTTP
             return False
-        # do not make a careful check whether an archive exists, because at
-        # present this requires an additional SSH call for remote operations
-        # which may be rather slow. Instead just try to run 7z on it and let
-        # it fail if no archive is around
+        # the archive is listed only once, subsequent checks are lookups in
+        # its table of contents
         # TODO honor future 'archive-mode' flag
         return self.io.in_archive(archive_path, key_path)
 
@@ -1461,7 +2078,9 @@ class RIARemote(SpecialRemote):
 
         if not self._last_archive_path:
             self._last_archive_path = self.remote_archive_dir / 'archive.7z'
-        if self._last_keypath[0] != key:
+        # read the cache only once, it may be replaced by another thread
+        last_key, key_path = self._last_keypath
+        if last_key != key:
             if self.remote_object_tree_version == '1':
                 key_dir = self.annex.dirhash_lower(key)
 
@@ -1473,10 +2092,10 @@ class RIARemote(SpecialRemote):
                 key_dir = self.annex.dirhash(key)
             # double 'key' is not a mistake, but needed to achieve the exact
             # same layout as the annex/objects tree
-            self._last_keypath = (key, Path(key_dir) / key / key)
+            key_path = Path(key_dir) / key / key
+            self._last_keypath = (key, key_path)
 
-        return self.remote_obj_dir, self._last_archive_path, \
-            self._last_keypath[1]
+        return self.remote_obj_dir, self._last_archive_path, key_path
 
     # TODO: implement method 'error'
 
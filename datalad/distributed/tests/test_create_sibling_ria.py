@@ -15,6 +15,7 @@ from unittest.mock import patch
 from datalad import cfg as dl_cfg
 from datalad.api import (
     Dataset,
+    clean_ria_store,
     clone,
 )
 from datalad.support.network import get_local_file_url
@@ -338,6 +339,76 @@ def test_storage_only(base_path=None, ds_path=None):
     assert_result_count(res, 1, action='copy')
 
 
+@skip_if_on_windows  # ORA remote is incompatible with windows clients
+@with_tempfile
+@with_tree({'ds1': {'file1.txt': 'some', 'file2.txt': 'other'},
+            'ds2': {'file1.txt': 'some', 'file3.txt': 'more'}})
+def test_deduplicate(base_path=None, path=None):
+    from datalad.customremotes.ria_utils import remove_unreferenced_keys
+    from datalad.distributed.ora_remote import LocalIO
+
+    base_path = Path(base_path)
+    store_url = 'ria+' + get_local_file_url(str(base_path))
+    dss = []
+    for name in ('ds1', 'ds2'):
+        ds = Dataset(op.join(path, name)).create(force=True)
+        ds.save()
+        res = ds.create_sibling_ria(store_url, "datastore", deduplicate=True,
+                                    new_store_ok=True)
+        assert_result_count(res, 1, status='ok', action='create-sibling-ria')
+        eq_((base_path / ds.id[:3] / ds.id[3:] / 'ria-layout-version'
+             ).read_text(), '3\n')
+        assert_status('ok', ds.push(to='datastore'))
+        dss.append(ds)
+
+    # the shared key is stored once, and linked into both datasets
+    store_keys = {p.name: p for p in (base_path / 'objects').glob('*/*/*/*')}
+    eq_(len(store_keys), 3)
+    shared_key = dss[0].repo.get_file_annexinfo('file1.txt')['key']
+    eq_(store_keys[shared_key].stat().st_nlink, 3)
+    eq_(dss[0].repo.get_file_annexinfo('file2.txt')['key'] in store_keys,
+        True)
+
+    # retrieval works as usual
+    dss[1].drop('file1.txt')
+    assert_status('ok', dss[1].get('file1.txt'))
+
+    # nothing to collect
+    io = LocalIO()
+    eq_(remove_unreferenced_keys(io, base_path), [])
+    assert_result_count(
+        clean_ria_store(store_url, result_renderer='disabled'),
+        1, status='notneeded', action='clean-ria-store')
+    # after a key was dropped from all datasets, it is removed, but
+    # nothing else
+    for ds in dss:
+        ds.repo.call_annex(['drop', '--force', '--from', 'datastore-storage',
+                            'file1.txt'])
+    eq_(remove_unreferenced_keys(io, base_path, dry_run=True),
+        [store_keys[shared_key]])
+    res = clean_ria_store(store_url, dry_run=True,
+                          result_renderer='disabled')
+    assert_result_count(res, 1)
+    assert_result_count(res, 1, status='ok', action='clean-ria-store',
+                        key=shared_key)
+    ok_exists(store_keys[shared_key])
+    res = clean_ria_store(store_url, result_renderer='disabled')
+    assert_result_count(res, 1)
+    assert_result_count(res, 1, status='ok', action='clean-ria-store',
+                        key=shared_key)
+    assert_false(store_keys[shared_key].parent.exists())
+    eq_(len(list((base_path / 'objects').glob('*/*/*/*'))), 2)
+    # the remaining keys are still available
+    assert_status('ok', dss[0].drop('file2.txt'))
+    assert_status('ok', dss[0].get('file2.txt'))
+
+    # no store at the URL
+    assert_result_count(
+        clean_ria_store('ria+' + get_local_file_url(path), on_failure='ignore',
+                        result_renderer='disabled'),
+        1, status='error', action='clean-ria-store')
+
+
 @known_failure_githubci_win  # reported in https://github.com/datalad/datalad/issues/5210
 @with_tempfile
 @with_tempfile
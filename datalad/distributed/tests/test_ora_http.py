@@ -1,11 +1,18 @@
+import logging
 import shutil
+from unittest.mock import MagicMock
 
 from datalad.api import Dataset
 from datalad.customremotes.ria_utils import (
     create_ds_in_store,
     create_store,
 )
-from datalad.distributed.ora_remote import LocalIO
+from datalad.distributed.ora_remote import (
+    HTTPRemoteIO,
+    LocalIO,
+    RIARemote,
+    RIARemoteError,
+)
 from datalad.distributed.tests.ria_utils import (
     common_init_opts,
     populate_dataset,
@@ -13,15 +20,18 @@ from datalad.distributed.tests.ria_utils import (
 from datalad.support.exceptions import CommandError
 from datalad.tests.utils_pytest import (
     assert_equal,
+    assert_false,
     assert_in,
     assert_not_in,
     assert_raises,
     assert_repo_status,
     assert_result_count,
     assert_status,
+    assert_true,
     known_failure_windows,
     serve_path_via_http,
     skip_if_adjusted_branch,
+    swallow_logs,
     with_tempfile,
 )
 from datalad.utils import Path
@@ -154,3 +164,59 @@ def test_read_access(store_path=None, store_url=None, ds_path=None):
     one_url = ds.repo.whereis('one.txt', output='full'
         )[store_uuid]['urls'].pop()
     assert_status('ok', ds.download_url(urls=[one_url], path=str(ds.pathobj / 'dummy')))
+
+
+@with_tempfile(mkdir=True)
+@serve_path_via_http
+@with_tempfile(mkdir=True)
+def test_http_io(store_path=None, store_url=None, tmp_path=None):
+    store_path = Path(store_path)
+    tmp_path = Path(tmp_path)
+    (store_path / 'dir').mkdir()
+    content = 'some content' * 10000
+    for i in range(5):
+        (store_path / 'dir' / 'f{}'.format(i)).write_text(content)
+
+    io = HTTPRemoteIO(store_url, buffer_size=1000, negative_cache_ttl=60)
+    assert_true(io.exists(Path('/dir/f0')))
+    assert_false(io.exists(Path('/dir/missing')))
+    for i in range(7):
+        assert_equal(io.exists(Path('/dir/f{}'.format(i))), i < 5)
+
+    # absence is remembered
+    (store_path / 'dir' / 'missing').write_text(content)
+    assert_false(io.exists(Path('/dir/missing')))
+    io._negative_cache.clear()
+    assert_true(io.exists(Path('/dir/missing')))
+    # without a cache, the server is always asked
+    io_nocache = HTTPRemoteIO(store_url)
+    assert_false(io_nocache.exists(Path('/dir/f5')))
+    (store_path / 'dir' / 'f5').write_text(content)
+    assert_true(io_nocache.exists(Path('/dir/f5')))
+    io_nocache.close()
+
+    progress = []
+    io.get(Path('/dir/f1'), tmp_path / 'f1', progress.append)
+    assert_equal((tmp_path / 'f1').read_text(), content)
+    assert_equal(progress[-1], len(content))
+    assert_true(len(progress) > 1)
+    assert_raises(RIARemoteError, io.get, Path('/dir/f6'), tmp_path / 'f6',
+                  progress.append)
+    io.close()
+
+
+def test_http_negative_cache_ttl_config():
+    remote = RIARemote.__new__(RIARemote)
+    remote._repo = MagicMock()
+    for value, expected in (('30', 30.0), ('0.5', 0.5), (None, None)):
+        remote._repo.config.get.side_effect = \
+            lambda var: value if var.endswith('negative-cache-ttl') else None
+        remote._load_cfg(None, 'store')
+        assert_equal(remote.http_negative_cache_ttl, expected)
+    # an invalid value is ignored with a warning
+    remote._repo.config.get.side_effect = \
+        lambda var: 'soon' if var.endswith('negative-cache-ttl') else None
+    with swallow_logs(new_level=logging.WARNING) as cml:
+        remote._load_cfg(None, 'store')
+        assert_in('ora-http-negative-cache-ttl', cml.out)
+    assert_equal(remote.http_negative_cache_ttl, None)
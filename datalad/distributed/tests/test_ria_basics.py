@@ -8,7 +8,14 @@
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
 import logging
+import os
+import shutil
 import stat
+import subprocess
+from unittest.mock import (
+    MagicMock,
+    patch,
+)
 
 from datalad.api import (
     Dataset,
@@ -23,7 +30,9 @@ from datalad.customremotes.ria_utils import (
 )
 from datalad.distributed.ora_remote import (
     LocalIO,
+    RIARemoteError,
     SSHRemoteIO,
+    _parse_7z_listing,
     _sanitize_key,
 )
 from datalad.distributed.tests.ria_utils import (
@@ -354,12 +363,10 @@ def _test_remote_layout(host, dspath, store, archiv_store):
                      sorted([p for p in local_objects])
                      )
 
-        if not io.get_7z():
-            raise SkipTest("No 7z available in RIA store")
-
         # we can simply pack up the content of the remote into a
         # 7z archive and place it in the right location to get a functional
-        # archive remote
+        # archive remote. Neither export nor access of the uncompressed
+        # archive need 7z
 
         create_store(io, archiv_store, '1')
         create_ds_in_store(io, archiv_store, ds.id, '2', '1')
@@ -396,6 +403,34 @@ def test_remote_layout():
     _test_remote_layout(None)
 
 
+@with_tempfile
+@with_tempfile(mkdir=True)
+def test_export_archive_ora_append(dspath=None, archive_dir=None):
+    ds = Dataset(dspath).create()
+    populate_dataset(ds)
+    archive = Path(archive_dir) / 'archive.7z'
+    assert_status('ok', ds.export_archive_ora(archive))
+    toc = LocalIO().get_archive_toc(archive)
+    assert_equal(len(toc), 4)
+
+    # only the new key is added, existing content stays in place
+    (ds.pathobj / 'new.txt').write_text('new content')
+    ds.save()
+    assert_status('ok', ds.export_archive_ora(archive))
+    appended = LocalIO().get_archive_toc(archive)
+    assert_equal(len(appended), 5)
+    for member, props in toc.items():
+        assert_equal(appended[member], props)
+
+    # compressed members are not available for direct reads
+    compressed = Path(archive_dir) / 'compressed.7z'
+    assert_status('ok', ds.export_archive_ora(
+        compressed, compression_level=6, jobs=2))
+    toc = LocalIO().get_archive_toc(compressed)
+    assert_equal(set(toc), set(appended))
+    assert_true(all(offset is None for _, offset, _ in toc.values()))
+
+
 @known_failure_windows  # see gh-4469
 @with_tempfile
 @with_tempfile
@@ -552,6 +587,50 @@ def test_gitannex_local():
     _test_gitannex(None)
 
 
+@skip_if_adjusted_branch
+@known_failure_windows  # see gh-4469
+@with_tempfile
+@with_tempfile
+@with_tempfile(mkdir=True)
+def test_concurrent_transfers(store=None, dspath=None, wrapperdir=None):
+    store = Path(store)
+    ds = Dataset(dspath).create()
+    populate_dataset(ds)
+    for i in range(10):
+        (ds.pathobj / 'file{}'.format(i)).write_text('content{}'.format(i))
+    ds.save()
+
+    io = LocalIO()
+    create_store(io, store, '1')
+    create_ds_in_store(io, store, ds.id, '2', '1')
+    init_opts = common_init_opts + ['url=ria+{}'.format(store.as_uri())]
+    ds.repo.init_remote('store', options=init_opts)
+
+    # record the PID of every started special remote process
+    pidlog = Path(wrapperdir) / 'pids'
+    wrapper = Path(wrapperdir) / 'git-annex-remote-ora'
+    wrapper.write_text('#!/bin/sh\necho $$ >> "{}"\nexec "{}" "$@"\n'.format(
+        pidlog, shutil.which('git-annex-remote-ora')))
+    wrapper.chmod(0o755)
+    env_path = os.pathsep.join([wrapperdir, os.environ.get('PATH', '')])
+
+    # a single ORA process serves all jobs
+    with patch.dict(os.environ, {'PATH': env_path}):
+        for cmd in (['copy', '-J4', '--to', 'store', '.'],
+                    ['drop', '-J4', '.'],
+                    ['get', '-J4', '.']):
+            if pidlog.exists():
+                pidlog.unlink()
+            ds.repo.call_annex(cmd)
+            assert_equal(len(pidlog.read_text().split()), 1)
+    for i in range(10):
+        assert_equal((ds.pathobj / 'file{}'.format(i)).read_text(),
+                     'content{}'.format(i))
+    fsck = ds.repo.fsck(remote='store', fast=True)
+    assert_equal(len(fsck), 14)
+    assert_true(all(r['success'] for r in fsck))
+
+
 @known_failure_windows  # see gh-4469
 @with_tempfile
 @with_tempfile
@@ -711,6 +790,245 @@ def test_url_keys(dspath=None, storepath=None, httppath=None, httpurl=None):
     assert_equal(len(ds.repo.whereis(filename)), 2)
 
 
+_7z_listing = """
+7-Zip [64] 16.02 : Copyright (c) 1999-2016 Igor Pavlov : 2016-05-21
+
+Listing archive: archive.7z
+
+--
+Path = archive.7z
+Type = 7z
+Physical Size = 400
+Headers Size = 300
+Method = Copy LZMA2:12
+Solid = +
+Blocks = 2
+
+----------
+Path = 0a/1b
+Size = 0
+Packed Size = 0
+Modified = 2022-01-01 10:00:00
+Attributes = D_ drwxr-xr-x
+CRC =
+Encrypted = -
+Method =
+Block =
+
+Path = 0a/1b/KEY1/KEY1
+Size = 5
+Packed Size = 12
+Modified = 2022-01-01 10:00:00
+Attributes = A_ -rw-r--r--
+CRC = CBF53A1C
+Encrypted = -
+Method = Copy
+Block = 0
+
+Path = 0a/1b/KEY 2/KEY 2
+Size = 7
+Packed Size =
+Modified = 2022-01-01 10:00:00
+Attributes = A_ -rw-r--r--
+CRC = 312A6AA6
+Encrypted = -
+Method = Copy
+Block = 0
+
+Path = empty
+Size = 0
+Packed Size = 0
+Modified = 2022-01-01 10:00:00
+Attributes = A_ -rw-r--r--
+CRC =
+Encrypted = -
+Method =
+Block =
+
+Path = 0c/1d/KEY3/KEY3
+Size = 100
+Packed Size = 60
+Modified = 2022-01-01 10:00:00
+Attributes = A_ -rw-r--r--
+CRC = 0F0A1B2C
+Encrypted = -
+Method = LZMA2:12
+Block = 1
+"""
+
+
+def test_parse_7z_listing():
+    assert_equal(_parse_7z_listing(''), {})
+    assert_equal(
+        _parse_7z_listing(_7z_listing),
+        {
+            # uncompressed members of a block follow each other
+            '0a/1b/KEY1/KEY1': (5, 32, 'CBF53A1C'),
+            '0a/1b/KEY 2/KEY 2': (7, 37, '312A6AA6'),
+            'empty': (0, None, None),
+            # compressed members cannot be read directly
+            '0c/1d/KEY3/KEY3': (100, None, None),
+        })
+    # no offsets for other archive types
+    assert_equal(
+        _parse_7z_listing(_7z_listing.replace('Type = 7z', 'Type = zip'))[
+            '0a/1b/KEY1/KEY1'],
+        (5, None, None))
+
+
+@with_tempfile
+@with_tempfile(mkdir=True)
+def test_archive_toc(archive=None, cachedir=None):
+    archive = Path(archive)
+    io = LocalIO()
+    assert_false(io.in_archive(archive, '0a/1b/KEY1/KEY1'))
+    archive.write_text('dummy')
+    with patch.object(LocalIO, '_list_archive',
+                      return_value=_7z_listing) as list_archive, \
+            patch.object(LocalIO, '_get_archive_toc_cache_file',
+                         return_value=Path(cachedir) / 'toc.json'):
+        assert_true(io.in_archive(archive, '0a/1b/KEY1/KEY1'))
+        assert_true(io.in_archive(archive, Path('0c', '1d', 'KEY3', 'KEY3')))
+        assert_false(io.in_archive(archive, '0a/1b'))
+        assert_false(io.in_archive(archive, 'unknown'))
+        # listed only once
+        assert_equal(list_archive.call_count, 1)
+        # another IO instance uses the cached TOC
+        assert_equal(LocalIO().get_archive_toc(archive),
+                     io.get_archive_toc(archive))
+        assert_equal(list_archive.call_count, 1)
+        # a modified archive is listed again
+        archive.write_text('modified')
+        assert_true(io.in_archive(archive, '0a/1b/KEY1/KEY1'))
+        assert_equal(list_archive.call_count, 2)
+    # an archive that cannot be listed is not reported as lacking the key
+    archive.write_text('unlistable')
+    with patch.object(LocalIO, '_list_archive',
+                      side_effect=RIARemoteError('no 7z')), \
+            patch.object(LocalIO, '_get_archive_toc_cache_file',
+                         return_value=Path(cachedir) / 'toc.json'):
+        assert_raises(RIARemoteError, io.in_archive, archive,
+                      '0a/1b/KEY1/KEY1')
+
+
+@with_tempfile
+@with_tempfile(mkdir=True)
+def test_get_from_archive_direct(archive=None, workdir=None):
+    archive = Path(archive)
+    workdir = Path(workdir)
+    # uncompressed members follow the signature header
+    archive.write_bytes(b'7z' + b'\0' * 30 + b'12345' + b'abcdefg')
+    io = LocalIO(buffer_size=3)
+    listing = _7z_listing.replace('312A6AA6', 'A0A1A2A3')
+    progress = []
+    with patch.object(LocalIO, '_list_archive', return_value=listing), \
+            patch.object(LocalIO, '_get_archive_toc_cache_file',
+                         return_value=workdir / 'toc.json'), \
+            patch.object(LocalIO, '_extract_from_archive') as extract:
+        io.get_from_archive(archive, '0a/1b/KEY1/KEY1', workdir / 'k1',
+                            progress.append)
+        assert_equal((workdir / 'k1').read_bytes(), b'12345')
+        assert_equal(progress, [3, 5])
+        extract.assert_not_called()
+        # CRC mismatch falls back on extraction
+        io.get_from_archive(archive, '0a/1b/KEY 2/KEY 2', workdir / 'k2',
+                            progress.append)
+        extract.assert_called_once()
+        # compressed members are extracted
+        io.get_from_archive(archive, '0c/1d/KEY3/KEY3', workdir / 'k3',
+                            progress.append)
+        assert_equal(extract.call_count, 2)
+    # if the archive cannot be listed, 7z extraction is attempted
+    archive.write_bytes(b'7z' + b'\0' * 30 + b'54321' + b'abcdefg')
+    with patch.object(LocalIO, '_list_archive',
+                      side_effect=RIARemoteError('no 7z')), \
+            patch.object(LocalIO, '_get_archive_toc_cache_file',
+                         return_value=workdir / 'toc.json'), \
+            patch.object(LocalIO, '_extract_from_archive') as extract:
+        io.get_from_archive(archive, '0a/1b/KEY1/KEY1', workdir / 'k1',
+                            progress.append)
+        extract.assert_called_once()
+    io.close()
+
+
+@known_failure_windows
+@with_tempfile(mkdir=True)
+def test_ssh_io_framed_transfer(path=None):
+    path = Path(path)
+    # talk to a local shell the same way as to a remote one
+    io = SSHRemoteIO.__new__(SSHRemoteIO)
+    io.buffer_size = 100
+    io.shell = subprocess.Popen(['sh'],
+                                stderr=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE,
+                                stdin=subprocess.PIPE)
+    content = bytes(range(256)) * 10
+    src = path / 'src'
+    src.write_bytes(content)
+    progress = []
+    with patch('datalad.distributed.ora_remote.DEFAULT_PUT_CHUNK_SIZE', 1000):
+        # no target directory
+        assert_raises(RIARemoteError, io.put, src, path / 'some dir' / 'dst',
+                      progress.append)
+        progress = []
+        io.mkdir(path / 'some dir')
+        # in multiple chunks
+        io.put(src, path / 'some dir' / 'dst', progress.append)
+    assert_equal((path / 'some dir' / 'dst').read_bytes(), content)
+    assert_equal(progress, [1000, 2000, 2560])
+    # an empty file
+    (path / 'empty').write_bytes(b'')
+    io.put(path / 'empty', path / 'empty_dst', progress.append)
+    assert_equal((path / 'empty_dst').read_bytes(), b'')
+
+    progress = []
+    io.get(path / 'some dir' / 'dst', path / 'back', progress.append)
+    assert_equal((path / 'back').read_bytes(), content)
+    assert_equal(progress[-1], len(content))
+    assert_raises(RIARemoteError, io.get, path / 'missing', path / 'back2',
+                  progress.append)
+    # large files are copied with scp
+    io.ssh = MagicMock()
+    with patch('datalad.distributed.ora_remote.SHELL_PUT_MAX_SIZE', 1000):
+        io.put(src, path / 'scp_dst', progress.append)
+    io.ssh.put.assert_called_once_with(str(src), str(path / 'scp_dst'))
+    assert_equal(progress[-1], len(content))
+    assert_false(io.exists(path / 'scp_dst'))
+    # the shell is still in sync
+    assert_true(io.exists(path / 'back'))
+    assert_false(io.exists(path / 'back2'))
+
+    # byte ranges of an archive
+    archive = path / 'archive'
+    archive.write_bytes(b'0123456789' * 100000)
+    progress = []
+    assert_equal(
+        b''.join(io._read_archive_range(archive, 5, 250, progress.append)),
+        b'5678901234' * 25)
+    assert_equal(progress[-1], 250)
+    # a range beyond the end of the archive
+    with assert_raises(RIARemoteError):
+        list(io._read_archive_range(archive, 999995, 10, progress.append))
+    # reading stops early
+    reader = io._read_archive_range(archive, 0, 1000, progress.append)
+    assert_equal(next(reader), b'0123456789' * 10)
+    reader.close()
+    # the archive is truncated while reading
+    reader = io._read_archive_range(archive, 0, 1000000, progress.append)
+    next(reader)
+    archive.write_bytes(b'0123456789')
+    with assert_raises(RIARemoteError):
+        list(reader)
+    # a file is truncated while reading
+    archive.write_bytes(b'0123456789' * 100000)
+    assert_raises(RIARemoteError, io.get, archive, path / 'back3',
+                  lambda n: archive.write_bytes(b'0123456789'))
+    # the shell is still in sync
+    assert_true(io.exists(archive))
+    assert_false(io.exists(path / 'back2'))
+    io.close()
+
+
 def test_sanitize_key():
     for i, o in (
                 ('http://example.com/', 'http&c%%example.com%'),
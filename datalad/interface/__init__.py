@@ -82,6 +82,7 @@ _group_3misc = (
         ('datalad.local.configuration', 'Configuration'),
         ('datalad.local.wtf', 'WTF'),
         ('datalad.local.clean', 'Clean'),
+        ('datalad.distributed.clean_ria_store', 'CleanRIAStore'),
         ('datalad.local.add_archive_content', 'AddArchiveContent'),
         ('datalad.local.add_readme', 'AddReadme'),
         ('datalad.local.export_archive', 'ExportArchive'),
@@ -514,6 +514,13 @@ _definitions = {
         'type': EnsureInt(),
         'default': 3,
     },
+    'datalad.archives.cachesize': {
+        'ui': ('question', {
+               'title': 'Archive extraction cache size',
+               'text': 'Maximum total size (in MB) of archives extracted by the datalad-archives special remote into its cache. Least recently used archives that are not in use are removed from the cache first. 0 means no limit'}),
+        'default': 0,
+        'type': EnsureInt(),
+    },
     'datalad.repo.backend': {
         'ui': ('question', {
                'title': 'git-annex backend',
@@ -527,6 +534,18 @@ _definitions = {
         'type': EnsureBool(),
         'default': False,
     },
+    'datalad.repo.fsmonitor': {
+        'ui': ('question', {
+               'title': 'File system monitor for new repositories',
+               'text': "Value of Git's core.fsmonitor setting for repositories "
+                       "created or cloned by DataLad, including subdatasets: "
+                       "'true' for Git's builtin file system monitor daemon "
+                       "(where supported by Git), or the path to a hook, e.g. "
+                       "one based on Watchman. Git's untracked cache is "
+                       "enabled too. In any repository with core.fsmonitor, "
+                       "a status of the entire repository only inspects "
+                       "content that changed since the previous status"}),
+    },
     'datalad.repo.version': {
         'ui': ('question', {
                'title': 'git-annex repository version',
@@ -541,6 +560,13 @@ _definitions = {
         'default': 100000,
         'type': EnsureInt(),
     },
+    'datalad.metadata.objcachesize': {
+        'ui': ('question', {
+               'title': 'Metadata object cache size',
+               'text': 'Maximum amount of loaded aggregated metadata objects (in MB of serialized size) kept in memory for reuse by metadata queries. Least recently used objects are discarded first'}),
+        'default': 256,
+        'type': EnsureInt(),
+    },
     'datalad.metadata.nativetype': {
         'ui': ('question', {
                'title': 'Native dataset metadata scheme',
@@ -632,6 +658,17 @@ _definitions = {
         'type': EnsureChoice('all', 'success', 'failure', 'ok', 'notneeded', 'impossible', 'error'),
         'default': None,
     },
+    'datalad.runtime.runner-backend': {
+        'ui': ('question', {
+            'title': 'Implementation to communicate with subprocesses',
+            'text': "If set to 'threads', DataLad uses helper threads to read from and write to "
+                    "the pipes of every subprocess it runs. If set to 'selector', all pipes are "
+                    "monitored from the calling thread, which avoids the overhead of thread "
+                    "creation. 'selector' is not available on Windows, where 'threads' is "
+                    "always used."}),
+        'type': EnsureChoice('threads', 'selector'),
+        'default': 'threads',
+    },
     'datalad.runtime.stalled-external': {
         'ui': ('question', {
             'title': 'Behavior for handing external processes',
@@ -641,6 +678,24 @@ _definitions = {
         'type': EnsureChoice('wait', 'abandon'),
         'default': 'wait',
     },
+    'datalad.runtime.trace': {
+        'ui': ('question', {
+            'title': 'Subprocess trace file',
+            'text': "If set, DataLad appends a record for every subprocess it runs to this file. "
+                    "A record contains the command, working directory, start time, duration, "
+                    "number of bytes written to and read from the subprocess, and the exit code. "
+                    "'datalad wtf -S subprocesses' summarizes a trace in 'jsonl' format."}),
+        'type': EnsureStr() | EnsureNone(),
+        'default': None,
+    },
+    'datalad.runtime.trace-format': {
+        'ui': ('question', {
+            'title': 'Format of the subprocess trace file',
+            'text': "'jsonl' writes one JSON record per line. 'chrome' writes the Chrome trace "
+                    "event format, which can be loaded into chrome://tracing or Perfetto."}),
+        'type': EnsureChoice('jsonl', 'chrome'),
+        'default': 'jsonl',
+    },
     'datalad.search.indexercachesize': {
         'ui': ('question', {
                'title': 'Maximum cache size for search index (per process)',
@@ -31,10 +31,16 @@ from datalad.tests.utils_pytest import (
     chpwd,
     eq_,
     ok_startswith,
+    patch_config,
     skip_if_no_module,
     swallow_outputs,
+    with_tempfile,
     with_tree,
 )
+from datalad.runner.trace import (
+    CommandTrace,
+    JSONLTraceWriter,
+)
 from datalad.utils import ensure_unicode
 
 from datalad.support.external_versions import external_versions
@@ -158,3 +164,25 @@ def test_wtf(topdir=None):
         assert_not_in('user.name', pyperclip.paste())
         assert_in(_HIDDEN, pyperclip.paste())  # by default no sensitive info
         assert_in("cmd:annex:", pyperclip.paste())  # but the content is there
+
+
+@with_tempfile
+def test_wtf_subprocesses(path=None):
+    with patch_config({'datalad.runtime.trace': None}), \
+            swallow_outputs() as cmo:
+        wtf(sections=['subprocesses'])
+        assert_in('not enabled', cmo.out)
+
+    writer = JSONLTraceWriter(path)
+    for cmd, duration in ((['git', 'status'], 0.5),
+                          (['git', 'annex', 'find'], 2.0),
+                          (['git', 'status', '-uno'], 0.25)):
+        writer(CommandTrace(cmd, None, 1, 0.0, duration, 0, 10, 0))
+    writer.close()
+    with patch_config({'datalad.runtime.trace': path}), \
+            swallow_outputs() as cmo:
+        wtf(sections=['subprocesses'])
+        assert_in('commands: 3', cmo.out)
+        # sorted by total duration
+        assert_greater(cmo.out.index('git status: 0.750s in 2 calls'),
+                       cmo.out.index('git annex find: 2.000s in 1 calls'))
@@ -349,6 +349,37 @@ def _describe_credentials():
     return props
 
 
+def _describe_subprocesses():
+    from datalad import cfg
+    from datalad.runner.trace import (
+        read_trace_file,
+        summarize_traces,
+    )
+    path = cfg.get('datalad.runtime.trace', None)
+    if not path:
+        return {'trace': 'not enabled, set datalad.runtime.trace'}
+    info = {'trace': path}
+    if (cfg.get('datalad.runtime.trace-format', None) or 'jsonl') != 'jsonl':
+        info['summary'] = "only available for the 'jsonl' trace format"
+        return info
+    try:
+        traces = read_trace_file(op.expanduser(path))
+    except (OSError, ValueError) as e:
+        info['summary'] = CapturedException(e).format_short()
+        return info
+    info['commands'] = len(traces)
+    info['duration'] = '{:.3f}s'.format(
+        sum(trace['duration'] for trace in traces))
+    # a list to keep the order by total duration
+    info['top'] = [
+        '{command}: {total:.3f}s in {count} calls (mean {mean:.3f}s, '
+        'max {max:.3f}s, {failed} failed, {bytes_in} bytes in, '
+        '{bytes_out} bytes out)'.format(**entry)
+        for entry in summarize_traces(traces, top=10)
+    ]
+    return info
+
+
 # Actual callables for WTF. If None -- should be bound later since depend on
 # the context
 SECTION_CALLABLES = {
@@ -365,6 +396,7 @@ SECTION_CALLABLES = {
     'dependencies': _describe_dependencies,
     'dataset': None,
     'credentials': _describe_credentials,
+    'subprocesses': _describe_subprocesses,
 }
 
 
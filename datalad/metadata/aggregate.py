@@ -13,10 +13,11 @@ __docformat__ = 'restructuredtext'
 
 import logging
 import os
+import threading
 
 from os import makedirs
-from os import listdir
 import os.path as op
+from pathlib import Path
 
 from hashlib import md5
 import shutil
@@ -38,11 +39,13 @@ from datalad.interface.common_opts import (
     recursion_limit,
     recursion_flag,
     nosave_opt,
+    jobs_opt,
 )
 from datalad.interface.results import get_status_dict
 from datalad.distribution.dataset import Dataset
 from datalad.metadata.metadata import (
     get_ds_aggregate_db_locations,
+    get_metadata_objcache,
     load_ds_aggregate_db,
 )
 from datalad.metadata.metadata import (
@@ -68,9 +71,14 @@ from datalad.support.constraints import EnsureChoice
 from datalad.support.gitrepo import GitRepo
 from datalad.support.annexrepo import AnnexRepo
 from datalad.support.exceptions import CapturedException
+from datalad.support.parallel import (
+    ProducerConsumer,
+    no_subds_in_futures,
+)
 from datalad.support import json_py
 from datalad.support.path import split_ext
 from datalad.utils import (
+    CMD_MAX_ARG,
     path_is_subpath,
     all_same,
     ensure_list,
@@ -233,7 +241,8 @@ def _the_same_across_datasets(relpath, *dss):
     return False
 
 
-def _dump_extracted_metadata(agginto_ds, aggfrom_ds, db, to_save, force_extraction, agg_base_path):
+def _dump_extracted_metadata(agginto_ds, aggfrom_ds, db, to_save, force_extraction,
+                             agg_base_path, write_lock):
     """Dump metadata from a dataset into object in the metadata store of another
 
     Info on the metadata objects is placed into a DB dict under the
@@ -244,6 +253,9 @@ def _dump_extracted_metadata(agginto_ds, aggfrom_ds, db, to_save, force_extracti
     agginto_ds : Dataset
     aggfrom_ds : Dataset
     db : dict
+    write_lock : threading.Lock
+      Held while modifying `agginto_ds`, which is shared by all datasets
+      whose metadata are dumped concurrently.
     """
     subds_relpaths = aggfrom_ds.subdatasets(result_xfm='relpaths', return_type='list')
     # figure out a "state" of the dataset wrt its metadata that we are describing
@@ -266,12 +278,15 @@ def _dump_extracted_metadata(agginto_ds, aggfrom_ds, db, to_save, force_extracti
         # if there is no annex metadata, this will come out empty,
         # hence hash would be same as for a plain GitRepo
         # and no, we cannot use the shasum of the annex branch,
-        # because this will change even when no metadata has changed
-        timestamps, _ = aggfrom_ds.repo.call_annex_oneline([
-            'metadata',
-            '.',
-            '-g', 'lastchanged'])
-        objid += timestamps.strip()
+        # because this will change even when no metadata has changed.
+        # Only keys of files in the worktree are considered, in worktree
+        # order, matching the output of `git annex metadata . -g lastchanged`
+        repo = aggfrom_ds.repo
+        keymeta = repo.get_metadata_by_key(timestamps=True)
+        objid += '\n'.join(
+            keymeta[props['key']]['lastchanged'][0]
+            for props in repo.get_content_annexinfo(init=None).values()
+            if props.get('key') in keymeta)
 
     if not objid:
         lgr.debug('%s has no metadata-relevant content', aggfrom_ds)
@@ -378,7 +393,8 @@ def _dump_extracted_metadata(agginto_ds, aggfrom_ds, db, to_save, force_extracti
             metasources,
             refcommit,
             subds_relpaths,
-            agg_base_path)
+            agg_base_path,
+            write_lock)
 
     # we did not actually run an extraction, so we need to
     # assemble an aggregation record from the existing pieces
@@ -408,19 +424,21 @@ def _dump_extracted_metadata(agginto_ds, aggfrom_ds, db, to_save, force_extracti
         for objrelpath in objrelpaths.values():
             objpath = op.join(agginto_ds.path, objrelpath)
             objdir = op.dirname(objpath)
-            if not op.exists(objdir):
-                makedirs(objdir)
-            if op.lexists(objpath):
-                os.unlink(objpath)  # remove previous version first
-                # was a wild thought as a workaround for 
-                # http://git-annex.branchable.com/bugs/cannot_commit___34__annex_add__34__ed_modified_file_which_switched_its_largefile_status_to_be_committed_to_git_now/#comment-bf70dd0071de1bfdae9fd4f736fd1ec1
-                # agginto_ds.repo.remove(objpath)
-            # XXX TODO once we have a command that can copy/move files
-            # from one dataset to another including file availability
-            # info, this should be used here
-            shutil.copyfile(
-                op.join(aggfrom_ds.path, objrelpath),
-                objpath)
+            with write_lock:
+                if not op.exists(objdir):
+                    makedirs(objdir)
+                if op.lexists(objpath):
+                    os.unlink(objpath)  # remove previous version first
+                    # was a wild thought as a workaround for 
+                    # http://git-annex.branchable.com/bugs/cannot_commit___34__annex_add__34__ed_modified_file_which_switched_its_largefile_status_to_be_committed_to_git_now/#comment-bf70dd0071de1bfdae9fd4f736fd1ec1
+                    # agginto_ds.repo.remove(objpath)
+                # XXX TODO once we have a command that can copy/move files
+                # from one dataset to another including file availability
+                # info, this should be used here
+                shutil.copyfile(
+                    op.join(aggfrom_ds.path, objrelpath),
+                    objpath)
+            get_metadata_objcache().discard(objpath)
             # mark for saving
             to_save.append(dict(
                 path=objpath,
@@ -434,7 +452,7 @@ def _dump_extracted_metadata(agginto_ds, aggfrom_ds, db, to_save, force_extracti
 
 
 def _extract_metadata(agginto_ds, aggfrom_ds, db, to_save, objid, metasources,
-                      refcommit, subds_relpaths, agg_base_path):
+                      refcommit, subds_relpaths, agg_base_path, write_lock):
     lgr.debug('Performing metadata extraction from %s', aggfrom_ds)
     # we will replace any conflicting info on this dataset with fresh stuff
     agginfo = db.get(aggfrom_ds.path, {})
@@ -481,15 +499,19 @@ def _extract_metadata(agginto_ds, aggfrom_ds, db, to_save, objid, metasources,
         objpath = op.join(dest.path, agg_base_path, objrelpath)
 
         # write obj files
-        if op.exists(objpath):
-            dest.unlock(objpath)
-        elif op.lexists(objpath):
-            # if it gets here, we have a symlink that is pointing nowhere
-            # kill it, to be replaced with the newly aggregated content
-            dest.repo.remove(objpath)
-        # TODO actually dump a compressed file when annexing is possible
-        # to speed up on-demand access
-        props['dumper'](meta[label], objpath)
+        # the target dataset is shared with concurrent extractions
+        with write_lock:
+            if op.exists(objpath):
+                dest.unlock(objpath)
+            elif op.lexists(objpath):
+                # if it gets here, we have a symlink that is pointing nowhere
+                # kill it, to be replaced with the newly aggregated content
+                dest.repo.remove(objpath)
+            # TODO actually dump a compressed file when annexing is possible
+            # to speed up on-demand access
+            props['dumper'](meta[label], objpath)
+        # any previously loaded state of this object is outdated now
+        get_metadata_objcache().discard(objpath)
         # stage for dataset.save()
         to_save.append(dict(path=objpath, type='file'))
 
@@ -522,6 +544,10 @@ def _adj2subtrees(base, adj, subs):
     return subtrees
 
 
+# per repository path: (HEAD commit, excludes, refcommit) of the last query
+_refcommit_cache = {}
+
+
 def _get_latest_refcommit(ds, subds_relpaths):
     """Find the latest commit that changed any real content
 
@@ -533,6 +559,10 @@ def _get_latest_refcommit(ds, subds_relpaths):
     - .gitattributes
     - any submodule
 
+    The commit is determined by a single `git log` call with pathspecs
+    that exclude these paths. The result is cached for the HEAD commit
+    of the dataset.
+
     Returns
     -------
     str or None
@@ -540,33 +570,35 @@ def _get_latest_refcommit(ds, subds_relpaths):
       files were found at all. Otherwise the full commit hash if the
       last commit that touch any relevant content is returned.
     """
-
-    def _filterpaths(basepath, paths, exclude):
-        final_paths = []
-        for rp in [op.join(basepath, p) if basepath else p for p in paths]:
-            if rp in exclude:
-                continue
-            elif any(path_is_subpath(ep, rp) for ep in exclude):
-                final_paths.extend(
-                    _filterpaths(rp, listdir(op.join(ds.path, rp)), exclude))
-                pass
-            else:
-                final_paths.append(rp)
-        return final_paths
-
-    relevant_paths = _filterpaths(
-        '',
-        listdir(ds.path),
-        # NOTE: this will also ignore datalad's native dataset-global metadata
-        # rationale: the metadata still describes the dataset content, so
-        # even if it changes, the description changes, but not the content
-        # it is describing -> ref commit should be unaffected
-        list(exclude_from_metadata) + subds_relpaths)
-
-    if not relevant_paths:
+    repo = ds.repo
+    head = repo.get_hexsha()
+    if head is None:
+        # unborn branch, nothing was ever committed
         return None
-
-    return ds.repo.get_last_commit_hexsha(relevant_paths)
+    # NOTE: this will also ignore datalad's native dataset-global metadata
+    # rationale: the metadata still describes the dataset content, so
+    # even if it changes, the description changes, but not the content
+    # it is describing -> ref commit should be unaffected
+    excludes = tuple(sorted(set(exclude_from_metadata).union(subds_relpaths)))
+    cached = _refcommit_cache.get(repo.path)
+    if cached and cached[:2] == (head, excludes):
+        return cached[2]
+
+    pathspecs = [
+        ':(exclude,literal){}'.format(Path(p).as_posix()) for p in excludes]
+    if sum(len(p) + 1 for p in pathspecs) < CMD_MAX_ARG // 2:
+        refcommit = repo.call_git(
+            ['log', '-1', '--format=%H', head, '--', '.'] + pathspecs,
+            read_only=True).strip() or None
+    else:
+        # too many subdatasets to exclude them on the command line,
+        # consider the remaining files instead
+        relevant_paths = list(
+            _get_metadatarelevant_paths(ds, list(subds_relpaths)))
+        refcommit = repo.get_last_commit_hexsha(relevant_paths) \
+            if relevant_paths else None
+    _refcommit_cache[repo.path] = (head, excludes, refcommit)
+    return refcommit
 
 
 def _get_obj_location(hash_str, ref_type, dumper):
@@ -583,7 +615,8 @@ def _get_obj_location(hash_str, ref_type, dumper):
     return objrelpath
 
 
-def _update_ds_agginfo(refds_path, ds_path, subds_paths, incremental, agginfo_db, to_save):
+def _update_ds_agginfo(refds_path, ds_path, subds_paths, incremental, agginfo_db, to_save,
+                       get_lock):
     """Perform metadata aggregation for ds and a given list of subdataset paths
 
     Parameters
@@ -607,6 +640,9 @@ def _update_ds_agginfo(refds_path, ds_path, subds_paths, incremental, agginfo_db
     to_save : list
       List of paths to save eventually. This function will add new paths as
       necessary.
+    get_lock : threading.Lock
+      Held while obtaining object files via the reference dataset, which
+      may be done for several datasets concurrently.
     """
     ds = Dataset(ds_path)
     # load existing aggregate info dict
@@ -686,6 +722,8 @@ def _update_ds_agginfo(refds_path, ds_path, subds_paths, incremental, agginfo_db
     # secretly remove obsolete object files, not really a result from a
     # user's perspective
     if not incremental and objs2remove:
+        for obj in objs2remove:
+            get_metadata_objcache().discard(obj)
         ds.remove(
             objs2remove,
             # Don't use the misleading default commit message of `remove`:
@@ -708,9 +746,10 @@ def _update_ds_agginfo(refds_path, ds_path, subds_paths, incremental, agginfo_db
     # make sure those objects are present
     # use the reference dataset to resolve paths, as they might point to
     # any location in the dataset tree
-    Dataset(refds_path).get(
-        [f for f, t in objs2copy],
-        result_renderer='disabled')
+    with get_lock:
+        Dataset(refds_path).get(
+            [f for f, t in objs2copy],
+            result_renderer='disabled')
     for copy_from, copy_to in objs2copy:
         copy_from = op.join(agg_base_path, copy_from)
         copy_to = op.join(agg_base_path, copy_to)
@@ -723,6 +762,7 @@ def _update_ds_agginfo(refds_path, ds_path, subds_paths, incremental, agginfo_db
             # no need to unlock, just wipe out and replace
             os.remove(copy_to)
         shutil.copy(copy_from, copy_to)
+        get_metadata_objcache().discard(copy_to)
     to_save.append(
         dict(path=agginfo_fpath, type='file', staged=True))
 
@@ -893,6 +933,7 @@ class AggregateMetaData(Interface):
             whether change detection indicates that metadata has already been
             extracted for a given dataset state."""),
         save=nosave_opt,
+        jobs=jobs_opt,
     )
 
     @staticmethod
@@ -907,7 +948,8 @@ class AggregateMetaData(Interface):
             update_mode='target',
             incremental=False,
             force_extraction=False,
-            save=True):
+            save=True,
+            jobs=None):
         refds_path = require_dataset(dataset)
 
         # it really doesn't work without a dataset
@@ -928,6 +970,8 @@ class AggregateMetaData(Interface):
 
         to_save = []
         to_aggregate = set()
+        # present datasets to extract metadata from, in order of discovery
+        to_extract = []
         paths_by_ds, errors = get_paths_by_ds(
             require_dataset(dataset),
             dataset,
@@ -989,25 +1033,39 @@ class AggregateMetaData(Interface):
                     continue
                 # cue for aggregation
                 to_aggregate.update(res)
-            else:
-                # actually aggregate metadata for this dataset, immediately place
-                # generated objects into the aggregated or reference dataset,
-                # and put info into DB to get the distributed to all datasets
-                # that need to be updated
-                errored = _dump_extracted_metadata(
-                    ds,
-                    Dataset(aggsrc),
-                    agginfo_db,
-                    to_save,
-                    force_extraction,
-                    agg_base_path)
-                if errored:
-                    yield get_status_dict(
-                        status='error',
-                        message='Metadata extraction failed (see previous error message, set datalad.runtime.raiseonerror=yes to fail immediately)',
-                        action='aggregate_metadata',
-                        path=aggsrc,
-                        logger=lgr)
+            elif aggsrc not in to_extract:
+                to_extract.append(aggsrc)
+
+        # serializes modifications of datasets that are shared between
+        # concurrently processed datasets
+        lock = threading.Lock()
+
+        def extract_ds(aggsrc):
+            # actually aggregate metadata for this dataset, immediately place
+            # generated objects into the aggregated or reference dataset,
+            # and put info into DB to get the distributed to all datasets
+            # that need to be updated
+            errored = _dump_extracted_metadata(
+                ds,
+                Dataset(aggsrc),
+                agginfo_db,
+                to_save,
+                force_extraction,
+                agg_base_path,
+                lock)
+            if errored:
+                return get_status_dict(
+                    status='error',
+                    message='Metadata extraction failed (see previous error message, set datalad.runtime.raiseonerror=yes to fail immediately)',
+                    action='aggregate_metadata',
+                    path=aggsrc,
+                    logger=lgr)
+
+        # extraction from each dataset is independent of any other,
+        # only failures are reported
+        for res in ProducerConsumer(to_extract, extract_ds, jobs=jobs):
+            if res:
+                yield res
 
         # at this point we have dumped all aggregated metadata into object files
         # somewhere, we know what needs saving, but having saved anything, and
@@ -1037,8 +1095,7 @@ class AggregateMetaData(Interface):
             raise ValueError(
                 "unknown `update_mode` '%s' for metadata aggregation", update_mode)
 
-        # go over datasets in bottom-up fashion
-        for parentds_path in sorted(subtrees, reverse=True):
+        def update_ds(parentds_path):
             lgr.info('Update aggregate metadata in dataset at: %s', parentds_path)
 
             _update_ds_agginfo(
@@ -1047,7 +1104,8 @@ class AggregateMetaData(Interface):
                 subtrees[parentds_path],
                 incremental,
                 agginfo_db,
-                to_save)
+                to_save,
+                lock)
             # update complete
             res = get_status_dict(
                 status='ok',
@@ -1057,17 +1115,30 @@ class AggregateMetaData(Interface):
                 logger=lgr)
             res.update(agginfo_db.get(parentds_path, {}))
             yield res
+
+        # go over datasets in bottom-up fashion, a dataset is only updated
+        # once all of its subdatasets are done
+        yield from ProducerConsumer(
+            sorted(subtrees, reverse=True),
+            update_ds,
+            safe_to_consume=no_subds_in_futures,
+            jobs=jobs,
+        )
         #
         # save potential modifications to dataset global metadata
         #
         if not to_save:
             return
-        lgr.info('Attempting to save %i files/datasets', len(to_save))
+        # the same path may have been queued by multiple datasets
+        save_paths = list(dict.fromkeys(r['path'] for r in to_save))
+        lgr.info('Attempting to save %i files/datasets', len(save_paths))
+        # a single save call that commits each dataset once, bottom-up
         for res in Save.__call__(
                 # save does not need any pre-annotated path hints
-                path=[r['path'] for r in to_save],
+                path=save_paths,
                 dataset=refds_path,
                 message='[DATALAD] Dataset aggregate metadata update',
+                jobs=jobs,
                 return_type='generator',
                 result_renderer='disabled',
                 result_xfm=None,
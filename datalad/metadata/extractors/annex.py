@@ -30,7 +30,7 @@ class MetadataExtractor(BaseMetadataExtractor):
     def _get_content_metadata(self):
         log_progress(
             lgr.info,
-            'extractorannex',
+            'extractorannex-{}'.format(self.ds.path),
             'Start annex metadata extraction from %s', self.ds,
             total=len(self.paths),
             label='Annex metadata extraction',
@@ -40,7 +40,7 @@ class MetadataExtractor(BaseMetadataExtractor):
         if not isinstance(repo, AnnexRepo):
             log_progress(
                 lgr.info,
-                'extractorannex',
+                'extractorannex-{}'.format(self.ds.path),
                 'Finished annex metadata extraction from %s', self.ds
             )
             return
@@ -48,28 +48,35 @@ class MetadataExtractor(BaseMetadataExtractor):
         valid_paths = None
         if self.paths and sum(len(i) for i in self.paths) > 500000:
             valid_paths = set(self.paths)
-        for file, meta in repo.get_metadata(
-                self.paths if self.paths and valid_paths is None else '.'):
+        # a single query for the keys of all annexed files, and a single
+        # bulk read of all metadata from the git-annex branch
+        annexinfo = repo.get_content_annexinfo(
+            paths=self.paths if self.paths and valid_paths is None else None,
+            init=None)
+        keymeta = repo.get_metadata_by_key()
+        for path, props in annexinfo.items():
+            key = props.get('key')
+            if not key:
+                continue
+            file = str(path.relative_to(repo.pathobj))
             if file.startswith('.datalad') or valid_paths and file not in valid_paths:
                 # do not report on our own internal annexed files (e.g. metadata blobs)
                 continue
             log_progress(
                 lgr.info,
-                'extractorannex',
+                'extractorannex-{}'.format(self.ds.path),
                 'Extracted annex metadata from %s', file,
                 update=1,
                 increment=True)
             meta = {k: v[0] if isinstance(v, list) and len(v) == 1 else v
-                    for k, v in meta.items()}
-            key = repo.get_file_annexinfo(file).get('key')
-            if key:
-                meta['key'] = key
+                    for k, v in keymeta.get(key, {}).items()}
+            meta['key'] = key
             yield (file, meta)
         # we need to make sure that batch processes are terminated
         # otherwise they might cause trouble on windows
         repo.precommit()
         log_progress(
             lgr.info,
-            'extractorannex',
+            'extractorannex-{}'.format(self.ds.path),
             'Finished annex metadata extraction from %s', self.ds
         )
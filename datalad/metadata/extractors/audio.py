@@ -42,7 +42,7 @@ class MetadataExtractor(BaseMetadataExtractor):
             return {}, []
         log_progress(
             lgr.info,
-            'extractoraudio',
+            'extractoraudio-{}'.format(self.ds.path),
             'Start audio metadata extraction from %s', self.ds,
             total=len(self.paths),
             label='audio metadata extraction',
@@ -53,7 +53,7 @@ class MetadataExtractor(BaseMetadataExtractor):
             absfp = opj(self.ds.path, f)
             log_progress(
                 lgr.info,
-                'extractoraudio',
+                'extractoraudio-{}'.format(self.ds.path),
                 'Extract audio metadata from %s', absfp,
                 update=1,
                 increment=True)
@@ -76,7 +76,7 @@ class MetadataExtractor(BaseMetadataExtractor):
 
         log_progress(
             lgr.info,
-            'extractoraudio',
+            'extractoraudio-{}'.format(self.ds.path),
             'Finished audio metadata extraction from %s', self.ds
         )
         return {
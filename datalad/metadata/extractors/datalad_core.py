@@ -85,7 +85,7 @@ class MetadataExtractor(BaseMetadataExtractor):
         """
         log_progress(
             lgr.info,
-            'extractordataladcore',
+            'extractordataladcore-{}'.format(self.ds.path),
             'Start core metadata extraction from %s', self.ds,
             total=len(self.paths),
             label='Core metadata extraction',
@@ -100,7 +100,7 @@ class MetadataExtractor(BaseMetadataExtractor):
                 yield (p, dict())
             log_progress(
                 lgr.info,
-                'extractordataladcore',
+                'extractordataladcore-{}'.format(self.ds.path),
                 'Finished core metadata extraction from %s', self.ds
             )
             return
@@ -116,7 +116,7 @@ class MetadataExtractor(BaseMetadataExtractor):
                 continue
             log_progress(
                 lgr.info,
-                'extractordataladcore',
+                'extractordataladcore-{}'.format(self.ds.path),
                 'Extracted core metadata from %s', file,
                 update=1,
                 increment=True)
@@ -130,6 +130,6 @@ class MetadataExtractor(BaseMetadataExtractor):
             yield (file, meta)
         log_progress(
             lgr.info,
-            'extractordataladcore',
+            'extractordataladcore-{}'.format(self.ds.path),
             'Finished core metadata extraction from %s', self.ds
         )
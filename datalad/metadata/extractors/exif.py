@@ -37,7 +37,7 @@ class MetadataExtractor(BaseMetadataExtractor):
             return {}, []
         log_progress(
             lgr.info,
-            'extractorexif',
+            'extractorexif-{}'.format(self.ds.path),
             'Start EXIF metadata extraction from %s', self.ds,
             total=len(self.paths),
             label='EXIF metadata extraction',
@@ -48,7 +48,7 @@ class MetadataExtractor(BaseMetadataExtractor):
             absfp = opj(self.ds.path, f)
             log_progress(
                 lgr.info,
-                'extractorexif',
+                'extractorexif-{}'.format(self.ds.path),
                 'Extract EXIF metadata from %s', absfp,
                 update=1,
                 increment=True)
@@ -64,7 +64,7 @@ class MetadataExtractor(BaseMetadataExtractor):
 
         log_progress(
             lgr.info,
-            'extractorexif',
+            'extractorexif-{}'.format(self.ds.path),
             'Finished EXIF metadata extraction from %s', self.ds
         )
         return {
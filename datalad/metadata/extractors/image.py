@@ -59,7 +59,7 @@ class MetadataExtractor(BaseMetadataExtractor):
         contentmeta = []
         log_progress(
             lgr.info,
-            'extractorimage',
+            'extractorimage-{}'.format(self.ds.path),
             'Start image metadata extraction from %s', self.ds,
             total=len(self.paths),
             label='image metadata extraction',
@@ -69,7 +69,7 @@ class MetadataExtractor(BaseMetadataExtractor):
             absfp = opj(self.ds.path, f)
             log_progress(
                 lgr.info,
-                'extractorimage',
+                'extractorimage-{}'.format(self.ds.path),
                 'Extract image metadata from %s', absfp,
                 update=1,
                 increment=True)
@@ -92,7 +92,7 @@ class MetadataExtractor(BaseMetadataExtractor):
 
         log_progress(
             lgr.info,
-            'extractorimage',
+            'extractorimage-{}'.format(self.ds.path),
             'Finished image metadata extraction from %s', self.ds
         )
         return {
@@ -41,7 +41,7 @@ class MetadataExtractor(BaseMetadataExtractor):
 
         log_progress(
             lgr.info,
-            'extractorxmp',
+            'extractorxmp-{}'.format(self.ds.path),
             'Start XMP metadata extraction from %s', self.ds,
             total=len(self.paths),
             label='XMP metadata extraction',
@@ -50,7 +50,7 @@ class MetadataExtractor(BaseMetadataExtractor):
         for f in self.paths:
             log_progress(
                 lgr.info,
-                'extractorxmp',
+                'extractorxmp-{}'.format(self.ds.path),
                 'Extract XMP metadata from %s', f,
                 update=1,
                 increment=True)
@@ -109,7 +109,7 @@ class MetadataExtractor(BaseMetadataExtractor):
 
         log_progress(
             lgr.info,
-            'extractorxmp',
+            'extractorxmp-{}'.format(self.ds.path),
             'Finished XMP metadata extraction from %s', self.ds
         )
         return {
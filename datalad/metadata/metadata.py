@@ -47,9 +47,11 @@ from datalad.support.annexrepo import AnnexRepo
 from datalad.support.exceptions import CapturedException
 from datalad.support.param import Parameter
 import datalad.support.ansi_colors as ac
+from datalad.support.cache import SizedLRUCache
 from datalad.support.json_py import (
+    LZMAFile,
     load as jsonload,
-    load_xzstream,
+    loads as jsonloads,
 )
 from datalad.interface.common_opts import (
     recursion_flag,
@@ -128,32 +130,136 @@ def get_metadata_type(ds):
     return []
 
 
-def _load_json_object(fpath, cache=None):
+# process-wide cache for loaded metadata objects, see get_metadata_objcache()
+_objcache = None
+
+
+def get_metadata_objcache():
+    """Return the process-wide cache for loaded metadata objects
+
+    The cache is shared by all metadata queries (`metadata`, `search`)
+    and is informed by `aggregate_metadata` about (re)written objects.
+    Its capacity is determined by the `datalad.metadata.objcachesize`
+    configuration (in MB of serialized object size). Least recently used
+    objects are evicted when the capacity is exceeded.
+
+    Returns
+    -------
+    SizedLRUCache
+    """
+    global _objcache
+    if _objcache is None:
+        _objcache = SizedLRUCache(
+            size_limit=cfg.obtain('datalad.metadata.objcachesize') * 1024 ** 2)
+    return _objcache
+
+
+def _get_objsignature(fpath):
+    # identify a particular state of an object file, such that cached
+    # content can be validated against the file on disk
+    try:
+        st = os.stat(fpath)
+    except OSError:
+        # e.g. annexed object without content
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+
+def _get_cached_object(fpath, cache):
     if cache is None:
-        cache = {}
-    obj = cache.get(
-        fpath,
-        jsonload(fpath, fixup=True) if op.lexists(fpath) else {})
-    cache[fpath] = obj
+        return None, None
+    sig = _get_objsignature(fpath)
+    cached = cache.get(fpath)
+    if cached is not None and sig is not None and cached[0] == sig:
+        return sig, cached[1]
+    return sig, None
+
+
+def _load_json_object(fpath, cache=None):
+    if not op.lexists(fpath):
+        return {}
+    sig, obj = _get_cached_object(fpath, cache)
+    if obj is not None:
+        return obj
+    obj = jsonload(fpath, fixup=True)
+    if sig is not None:
+        cache.set(fpath, (sig, obj), sig[1])
     return obj
 
 
+def _iter_xz_json_stream(fpath, cache=None):
+    """Yield (path, metadata) records from a content metadata object
+
+    Records are read one at a time. If the object is not found in the
+    cache, it is streamed from disk and only retained in the cache
+    when its full serialized size fits the cache capacity.
+    """
+    if not op.lexists(fpath):
+        return
+    sig, obj = _get_cached_object(fpath, cache)
+    if obj is not None:
+        yield from obj.items()
+        return
+    collected = {} if sig is not None else None
+    size = 0
+    with LZMAFile(fpath, 'rb') as f:
+        for line in f:
+            size += len(line)
+            s = jsonloads(line.decode('utf-8'))
+            # take out the 'path' from the payload
+            p = s.pop('path')
+            if collected is not None:
+                if size > cache.size_limit:
+                    # too large to be cached, stop collecting
+                    collected = None
+                else:
+                    collected[p] = s
+            yield p, s
+    if collected is not None:
+        cache.set(fpath, (sig, collected), size)
+
+
 def _load_xz_json_stream(fpath, cache=None):
-    if cache is None:
-        cache = {}
-    obj = cache.get(
-        fpath,
-        {s['path']: {k: v for k, v in s.items() if k != 'path'}
-         # take out the 'path' from the payload
-         for s in load_xzstream(fpath)} if op.lexists(fpath) else {})
-    cache[fpath] = obj
-    return obj
+    return dict(_iter_xz_json_stream(fpath, cache=cache))
+
+
+def _get_path_exclusion_test(excludes, sep=op.sep):
+    """Return a function that tests whether a path is at or under an exclude
+
+    Instead of comparing each path against each exclude, the path itself
+    and all its leading directories are looked up in a set of excludes.
+    This makes the cost of a test proportional to the depth of a path,
+    regardless of the number of excludes (e.g. subdatasets).
+
+    Parameters
+    ----------
+    excludes : iterable(str)
+      Relative paths to exclude, including anything underneath them.
+    sep : str, optional
+      Path separator used in excludes and tested paths.
+
+    Returns
+    -------
+    callable
+      Takes a relative path, and returns True if it is excluded.
+    """
+    excludes = frozenset(p.rstrip(sep) for p in excludes)
+
+    def is_excluded(path):
+        idx = path.find(sep)
+        while idx > -1:
+            if path[:idx] in excludes:
+                return True
+            idx = path.find(sep, idx + 1)
+        return path.rstrip(sep) in excludes
+
+    return is_excluded
 
 
 def _get_metadatarelevant_paths(ds, subds_relpaths):
-    return (f for f in ds.repo.get_files()
-            if not any(path_startswith(f, ex)
-                       for ex in list(exclude_from_metadata) + subds_relpaths))
+    is_excluded = _get_path_exclusion_test(
+        list(exclude_from_metadata) + subds_relpaths)
+    return (f for f in ds.repo.get_files() if not is_excluded(f))
 
 
 def _get_containingds_from_agginfo(info, rpath):
@@ -201,8 +307,9 @@ def legacy_query_aggregated_metadata(reporton, ds, aps, recursive=False,
     by the caller of this function, i.e. it should have been decided
     outside which dataset to query for any given path.
 
-    Also this function doesn't cache anything, hence the caller must
-    make sure to only call this once per dataset to avoid waste.
+    Loaded metadata objects are kept in the process-wide object cache
+    (see `get_metadata_objcache()`), file records are reported one
+    subdataset at a time.
 
     Parameters
     ----------
@@ -229,13 +336,7 @@ def legacy_query_aggregated_metadata(reporton, ds, aps, recursive=False,
     agginfos, agg_base_path = load_ds_aggregate_db(ds)
 
     # cache once loaded metadata objects for additional lookups
-    # TODO possibly supply this cache from outside, if objects could
-    # be needed again -- their filename does not change in a superdataset
-    # if done, cache under relpath, not abspath key
-    cache = {
-        'objcache': {},
-        'subds_relpaths': None,
-    }
+    cache = get_metadata_objcache()
     reported = set()
 
     # for all query paths
@@ -327,7 +428,7 @@ def legacy_query_aggregated_metadata(reporton, ds, aps, recursive=False,
             if dsobjloc is not None:
                 dsmeta = _load_json_object(
                     op.join(agg_base_path, dsobjloc),
-                    cache=cache['objcache'])
+                    cache=cache)
 
             for r in _query_aggregated_metadata_singlepath(
                     ds, agginfos, agg_base_path, qap, reporton,
@@ -359,7 +460,8 @@ def _query_aggregated_metadata_singlepath(
         # datasets) -> prep result
         res = get_status_dict(
             status='ok',
-            metadata=dsmeta,
+            # shallow copy, the object could be shared via the object cache
+            metadata=dict(dsmeta),
             # normpath to avoid trailing dot
             path=op.normpath(op.join(ds.path, rpath)),
             type='dataset')
@@ -377,15 +479,18 @@ def _query_aggregated_metadata_singlepath(
     rparentpath = op.relpath(rpath, start=containing_ds)
 
     # so we have some files to query, and we also have some content metadata
-    contentmeta = _load_xz_json_stream(
+    # records are streamed, rather than loading everything upfront
+    contentmeta = _iter_xz_json_stream(
         op.join(agg_base_path, contentinfo_objloc),
-        cache=cache['objcache']) if contentinfo_objloc else {}
+        cache=cache) if contentinfo_objloc else []
 
-    for fpath in [f for f in contentmeta.keys()
-                  if rparentpath == op.curdir or
-                  path_startswith(f, rparentpath)]:
+    for fpath, metadata in contentmeta:
+        if not (rparentpath == op.curdir or
+                path_startswith(fpath, rparentpath)):
+            continue
         # we might be onto something here, prepare result
-        metadata = contentmeta.get(fpath, {})
+        # shallow copy, the record could be shared via the object cache
+        metadata = dict(metadata)
 
         # we have to pull out the context for each extractor from the dataset
         # metadata
@@ -395,7 +500,7 @@ def _query_aggregated_metadata_singlepath(
             context = dsmeta.get(tlk, {}).get('@context', None)
             if context is None:
                 continue
-            metadata[tlk]['@context'] = context
+            metadata[tlk] = dict(metadata[tlk], **{'@context': context})
         if '@context' in dsmeta:
             metadata['@context'] = dsmeta['@context']
 
@@ -512,9 +617,11 @@ def _get_metadata(ds, types, global_meta=None, content_meta=None, paths=None):
              single_or_plural(" is", "s are", len(absent_extractors)),
              ', '.join(absent_extractors)))
 
+    # per-dataset progress, extraction may run for several datasets at once
+    pid = 'metadataextractors-{}'.format(ds.path)
     log_progress(
         lgr.info,
-        'metadataextractors',
+        pid,
         'Start metadata extraction from %s', ds,
         total=len(types),
         label='Metadata extraction',
@@ -524,7 +631,7 @@ def _get_metadata(ds, types, global_meta=None, content_meta=None, paths=None):
         mtype_key = mtype
         log_progress(
             lgr.info,
-            'metadataextractors',
+            pid,
             'Engage %s metadata extractor', mtype_key,
             update=1,
             increment=True)
@@ -536,7 +643,7 @@ def _get_metadata(ds, types, global_meta=None, content_meta=None, paths=None):
         except Exception as e:
             log_progress(
                 lgr.error,
-                'metadataextractors',
+                pid,
                 'Failed %s metadata extraction from %s', mtype_key, ds,
             )
             raise ValueError(
@@ -559,7 +666,7 @@ def _get_metadata(ds, types, global_meta=None, content_meta=None, paths=None):
             if cfg.get('datalad.runtime.raiseonerror'):
                 log_progress(
                     lgr.error,
-                    'metadataextractors',
+                    pid,
                     'Failed %s metadata extraction from %s', mtype_key, ds,
                 )
                 raise
@@ -703,7 +810,7 @@ def _get_metadata(ds, types, global_meta=None, content_meta=None, paths=None):
 
     log_progress(
         lgr.info,
-        'metadataextractors',
+        pid,
         'Finished metadata extraction from %s', ds,
     )
 
@@ -418,3 +418,27 @@ def test_partial_aggregation(path=None):
     #res = ds.metadata(get_aggregates=True)
     #assert_result_count(res, 3)
     #assert_result_count(res, 1, path=sub2.path)
+
+
+@known_failure_githubci_win
+@with_tree(tree=dict(
+    _dataset_hierarchy_template['origin'],
+    sibling={'dataset_description.json': '{"Name": "sibling"}'}))
+def test_parallel_aggregation(path=None):
+    base = Dataset(path).create(force=True)
+    sub = base.create('sub', force=True)
+    sub.create('subsub', force=True)
+    base.create('sibling', force=True)
+    base.save(recursive=True)
+    assert_repo_status(base.path)
+    res = base.aggregate_metadata(recursive=True, update_mode='all', jobs=3)
+    # every dataset receives an update, and all of them are saved
+    assert_result_count(res, 4, action='aggregate_metadata', status='ok')
+    assert_repo_status(base.path)
+    aggs = base.metadata(get_aggregates=True)
+    assert_result_count(aggs, 4)
+    # same result as a serial aggregation
+    base.aggregate_metadata(recursive=True, update_mode='all', jobs=0,
+                            force_extraction=True)
+    assert_repo_status(base.path)
+    eq_(aggs, base.metadata(get_aggregates=True))
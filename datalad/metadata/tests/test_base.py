@@ -13,6 +13,7 @@ import logging
 import os.path as op
 from os.path import join as opj
 from os.path import relpath
+from unittest.mock import patch
 
 from datalad.api import (
     Dataset,
@@ -20,20 +21,27 @@ from datalad.api import (
     install,
     metadata,
 )
+from datalad.metadata.aggregate import _get_latest_refcommit
 from datalad.metadata.metadata import (
     _get_containingds_from_agginfo,
+    _get_path_exclusion_test,
+    _iter_xz_json_stream,
+    _load_xz_json_stream,
     get_metadata_type,
     legacy_query_aggregated_metadata,
 )
 from datalad.support.annexrepo import AnnexRepo
+from datalad.support.cache import SizedLRUCache
 from datalad.support.exceptions import (
     InsufficientArgumentsError,
     NoDatasetFound,
 )
 from datalad.support.gitrepo import GitRepo
+from datalad.support.json_py import dump2xzstream
 from datalad.tests.utils_pytest import (
     assert_dict_equal,
     assert_equal,
+    assert_false,
     assert_in,
     assert_in_results,
     assert_raises,
@@ -279,3 +287,72 @@ def test_get_containingds_from_agginfo():
     # will not tollerate mix'n'match
     assert_raises(ValueError, _get_containingds_from_agginfo, {'match': {}}, op.abspath(down))
     assert_raises(ValueError, _get_containingds_from_agginfo, {op.abspath('match'): {}}, down)
+
+
+def test_get_path_exclusion_test():
+    is_excluded = _get_path_exclusion_test(
+        ['.git', 'sub', op.join('deep', 'er')])
+    for p in ('.git', op.join('.git', 'config'), 'sub', op.join('sub', 'f'),
+              op.join('deep', 'er'), op.join('deep', 'er', 'f')):
+        assert_true(is_excluded(p), msg=p)
+    # only full path components match
+    for p in ('.gitattributes', 'subway', op.join('deep', 'f'),
+              op.join('deep', 'error'), op.join('top', 'sub')):
+        assert_false(is_excluded(p), msg=p)
+
+
+@with_tree(tree={'file': 'content', 'sub': {'f': 'sub'}})
+def test_get_latest_refcommit(path=None):
+    ds = Dataset(path).create(force=True)
+    # only .datalad and .gitattributes, no relevant content
+    eq_(_get_latest_refcommit(ds, []), None)
+    ds.save('file')
+    content_commit = ds.repo.get_hexsha()
+    eq_(_get_latest_refcommit(ds, []), content_commit)
+    # changes to excluded paths do not count
+    ds.save('sub')
+    eq_(_get_latest_refcommit(ds, ['sub']), content_commit)
+    eq_(_get_latest_refcommit(ds, []), ds.repo.get_hexsha())
+    ds.config.set('datalad.metadata.nativetype', 'xmp', scope='branch')
+    ds.save()
+    eq_(_get_latest_refcommit(ds, ['sub']), content_commit)
+    # an unchanged HEAD does not trigger another query
+    with patch.object(ds.repo, 'call_git') as call_git:
+        eq_(_get_latest_refcommit(ds, ['sub']), content_commit)
+        call_git.assert_not_called()
+
+
+@with_tempfile(mkdir=True)
+def test_iter_xz_json_stream(path=None):
+    objpath = opj(path, 'cn-obj.xz')
+    records = [
+        dict(path='a', meta={'x': 1}),
+        dict(path=op.join('sub', 'b'), meta={'x': 2}),
+    ]
+    dump2xzstream(records, objpath)
+    expected = [('a', {'meta': {'x': 1}}),
+                (op.join('sub', 'b'), {'meta': {'x': 2}})]
+    # no cache, no problem
+    eq_(list(_iter_xz_json_stream(objpath)), expected)
+    eq_(list(_iter_xz_json_stream(opj(path, 'absent.xz'))), [])
+
+    cache = SizedLRUCache(size_limit=1024)
+    eq_(list(_iter_xz_json_stream(objpath, cache=cache)), expected)
+    assert_in(objpath, cache)
+    # served from the cache, when the file is unchanged
+    with patch('datalad.metadata.metadata.LZMAFile') as lzma_mock:
+        eq_(list(_iter_xz_json_stream(objpath, cache=cache)), expected)
+        lzma_mock.assert_not_called()
+    # a partially consumed stream does not replace the cached record
+    next(_iter_xz_json_stream(objpath, cache=cache))
+    assert_in(objpath, cache)
+
+    # a modified object is reloaded
+    dump2xzstream(records[:1], objpath)
+    eq_(list(_iter_xz_json_stream(objpath, cache=cache)), expected[:1])
+    eq_(_load_xz_json_stream(objpath, cache=cache), dict(expected[:1]))
+
+    # objects exceeding the cache capacity are streamed, but not kept
+    tiny_cache = SizedLRUCache(size_limit=10)
+    eq_(list(_iter_xz_json_stream(objpath, cache=tiny_cache)), expected[:1])
+    eq_(len(tiny_cache), 0)
@@ -12,11 +12,13 @@
 from .coreprotocols import (
     KillOutput,
     NoCapture,
+    RecordCapture,
     StdErrCapture,
     StdOutCapture,
     StdOutErrCapture,
 )
 from .exception import CommandError
 from .gitrunner import GitWitlessRunner as GitRunner
+from .multirunner import MultiRunner
 from .protocol import WitlessProtocol as Protocol
 from .runner import WitlessRunner as Runner
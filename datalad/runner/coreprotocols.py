@@ -12,6 +12,7 @@
 import logging
 
 from .protocol import WitlessProtocol
+from .utils import RecordSplitter
 
 lgr = logging.getLogger('datalad.runner.coreprotocols')
 
@@ -54,3 +55,56 @@ class KillOutput(WitlessProtocol):
                 5,
                 'Discarded %i bytes from %i[%s]',
                 len(data), self.process.pid, self.fd_infos[fd][0])
+
+
+class RecordCapture(WitlessProtocol):
+    """WitlessProtocol that captures stdout as a list of records, and stderr
+
+    Stdout is split on a separator while it is received, and every record is
+    decoded individually. The records are returned as a list under the
+    'stdout_records' key of the result, 'stdout' is an empty string. This
+    avoids holding the complete output as bytes and as a string at the same
+    time, e.g. for the output of `git ls-files -z`.
+
+    The separator must be a character that cannot be part of the encoding of
+    another character, e.g. NUL or newline with UTF-8.
+    """
+    proc_out = True
+    proc_err = True
+
+    def __init__(self, done_future=None, encoding=None, separator=b'\n'):
+        """
+        Parameters
+        ----------
+        done_future: Any
+          Ignored parameter, kept for backward compatibility (DEPRECATED)
+        encoding : str
+          Encoding to be used for process output bytes decoding. By default,
+          the preferred system encoding is guessed.
+        separator : bytes or str
+          Record separator, without the separator in the records. A
+          terminating separator does not create an empty last record.
+        """
+        super().__init__(done_future=done_future, encoding=encoding)
+        if isinstance(separator, str):
+            separator = separator.encode(self.encoding)
+        self._record_splitter = RecordSplitter(separator)
+        self.records = []
+
+    def pipe_data_received(self, fd, data):
+        if fd != self.stdout_fileno:
+            super().pipe_data_received(fd, data)
+            return
+        self._log(fd, data)
+        encoding = self.encoding
+        self.records.extend(
+            record.decode(encoding)
+            for record in self._record_splitter.process(data))
+
+    def _prepare_result(self):
+        results = super()._prepare_result()
+        remaining = self._record_splitter.finish_processing()
+        if remaining is not None:
+            self.records.append(remaining.decode(self.encoding))
+        results['stdout_records'] = self.records
+        return results
@@ -12,6 +12,10 @@
 import logging
 import os
 import os.path as op
+from itertools import (
+    chain,
+    islice,
+)
 
 from typing import Optional
 
@@ -32,6 +36,29 @@ lgr = logging.getLogger('datalad.runner.gitrunner')
 GIT_SSH_COMMAND = "datalad sshrun"
 
 
+# git commands that accept --pathspec-from-file (git >= 2.26)
+PATHSPEC_FROM_FILE_COMMANDS = frozenset(
+    ('add', 'checkout', 'commit', 'reset', 'restore', 'rm'))
+
+
+def _supports_pathspec_from_file(cmd):
+    """Whether a git command line supports --pathspec-from-file"""
+    args = iter(cmd)
+    for arg in args:
+        if arg == 'git' or op.basename(arg) in ('git', 'git.exe'):
+            break
+    else:
+        return False
+    for arg in args:
+        if arg in ('-c', '-C'):
+            # option with a value
+            next(args, None)
+        elif not arg.startswith('-'):
+            # the git subcommand
+            return arg in PATHSPEC_FROM_FILE_COMMANDS
+    return False
+
+
 class GitRunnerBase(object):
     """
     Mix-in class for Runners to be used to run git and git annex commands
@@ -128,12 +155,50 @@ class GitWitlessRunner(WitlessRunner, GitRunnerBase):
     # Behavior option to load up from config upon demand
     _CFG_PATHSPEC_FROM_FILE = None
 
+    # Adjusted environments by (cwd, whether derived from os.environ), with
+    # a snapshot of the environment they were derived from
+    _ENV_CACHE = {}
+    _ENV_CACHE_SIZE = 64
+
     @borrowdoc(WitlessRunner)
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._check_git_path()
 
     def _get_adjusted_env(self, env=None, cwd=None, copy=True):
+        # Adjusting a copy of the environment takes a noticeable fraction of
+        # the time of a short git call. Reuse the result as long as the
+        # environment it was derived from is unchanged. Comparing the
+        # environments is much faster than copying one. The returned
+        # environment is shared and must not be modified.
+        # For the process environment, which is also used for an empty
+        # environment (see get_git_environ_adjusted()), compare the
+        # (encoded) dictionary that os.environ keeps in sync with it, if
+        # available.
+        use_environ = not env
+        source = os.environ.__dict__.get('_data') if use_environ else env
+        if source is None:
+            return self._get_uncached_adjusted_env(env, cwd)
+
+        cache = GitWitlessRunner._ENV_CACHE
+        key = (cwd, use_environ)
+        cached = cache.get(key)
+        if cached is not None and cached[0] == source:
+            return cached[1]
+
+        adjusted_env = self._get_uncached_adjusted_env(env, cwd)
+        source_env = os.environ if use_environ else env
+        if any(not op.isabs(source_env.get(var) or op.sep)
+               for var in ('GIT_DIR', 'GIT_WORK_TREE')):
+            # relative paths are made absolute based on the current
+            # directory, which is not part of the cache key
+            return adjusted_env
+        if len(cache) >= GitWitlessRunner._ENV_CACHE_SIZE:
+            cache.clear()
+        cache[key] = (source.copy(), adjusted_env)
+        return adjusted_env
+
+    def _get_uncached_adjusted_env(self, env, cwd):
         env = GitRunnerBase.get_git_environ_adjusted(env=env)
         return super()._get_adjusted_env(
             env=env,
@@ -150,7 +215,7 @@ class GitWitlessRunner(WitlessRunner, GitRunnerBase):
                              protocol=None,
                              cwd=None,
                              env=None,
-                             pathspec_from_file: Optional[bool] = False,
+                             pathspec_from_file: Optional[bool] = None,
                              **kwargs):
 
         assert isinstance(cmd, list)
@@ -159,15 +224,28 @@ class GitWitlessRunner(WitlessRunner, GitRunnerBase):
             from datalad import cfg  # avoid circular import
             GitWitlessRunner._CFG_PATHSPEC_FROM_FILE = cfg.obtain('datalad.runtime.pathspec-from-file')
             assert GitWitlessRunner._CFG_PATHSPEC_FROM_FILE in ('multi-chunk', 'always')
-        file_chunks = list(generate_file_chunks(files, cmd))
+        if pathspec_from_file is None:
+            pathspec_from_file = _supports_pathspec_from_file(cmd)
+
+        # chunks are only generated as needed, but we need to know whether
+        # there is more than one
+        file_chunks = generate_file_chunks(files, cmd)
+        first_chunks = list(islice(file_chunks, 2))
+        multi_chunk = len(first_chunks) > 1
+        file_chunks = chain(first_chunks, file_chunks)
 
-        if pathspec_from_file and (len(file_chunks) > 1 or GitWitlessRunner._CFG_PATHSPEC_FROM_FILE == 'always'):
+        if pathspec_from_file and (multi_chunk or GitWitlessRunner._CFG_PATHSPEC_FROM_FILE == 'always'):
             # if git supports pathspec---from-file and we need multiple chunks to do,
             # just use --pathspec-from-file
-            with make_tempfile(content=b'\x00'.join(f.encode() for f in files)) as tf:
-                cmd += ['--pathspec-file-nul', f'--pathspec-from-file={tf}']
+            with make_tempfile() as tf:
+                with open(tf, 'wb') as f:
+                    sep = b''
+                    for file_chunk in file_chunks:
+                        for path in file_chunk:
+                            f.write(sep + os.fsencode(path))
+                            sep = b'\x00'
                 yield self.run(
-                    cmd=cmd,
+                    cmd=cmd + ['--pathspec-file-nul', f'--pathspec-from-file={tf}'],
                     protocol=protocol,
                     cwd=cwd,
                     env=env,
@@ -177,7 +255,7 @@ class GitWitlessRunner(WitlessRunner, GitRunnerBase):
         # "classical" chunking
         for i, file_chunk in enumerate(file_chunks):
             # do not pollute with message when there only ever is a single chunk
-            if len(file_chunk) < len(files):
+            if multi_chunk:
                 lgr.debug(
                     'Process file list chunk %i (length %i)', i, len(file_chunk))
 
@@ -195,7 +273,7 @@ class GitWitlessRunner(WitlessRunner, GitRunnerBase):
                                 protocol=None,
                                 cwd=None,
                                 env=None,
-                                pathspec_from_file: Optional[bool] = False,
+                                pathspec_from_file: Optional[bool] = None,
                                 **kwargs):
         """
         Run a git-style command multiple times if `files` is too long,
@@ -225,7 +303,10 @@ class GitWitlessRunner(WitlessRunner, GitRunnerBase):
         pathspec_from_file : bool, optional
           Could be set to True for a `git` command which supports
           --pathspec-from-file and --pathspec-file-nul options. Then pathspecs
-          would be passed through a temporary file.
+          would be passed through a temporary file, if they do not fit into
+          a single command line (or always, depending on the configuration
+          'datalad.runtime.pathspec-from-file'). If None (default), this is
+          done for git commands known to support these options.
         kwargs :
           Passed to the Protocol class constructor.
 
@@ -274,7 +355,7 @@ class GitWitlessRunner(WitlessRunner, GitRunnerBase):
                                       protocol=None,
                                       cwd=None,
                                       env=None,
-                                      pathspec_from_file: Optional[bool] = False,
+                                      pathspec_from_file: Optional[bool] = None,
                                       **kwargs):
         """
         Run a git-style command multiple times if `files` is too long,
@@ -0,0 +1,259 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Concurrent execution of many commands from a single thread (POSIX only)
+"""
+
+from __future__ import annotations
+
+import logging
+import selectors
+from collections import deque
+from collections.abc import Generator
+from typing import (
+    Any,
+    Optional,
+)
+
+from datalad.utils import on_windows
+
+from .coreprotocols import NoCapture
+from .protocol import (
+    GeneratorMixIn,
+    WitlessProtocol,
+)
+from .runner import (
+    WitlessRunner,
+    _check_results,
+)
+from .selectorrunner import SelectorRunner
+
+lgr = logging.getLogger('datalad.runner.multirunner')
+
+
+class Job(object):
+    """A command submitted to a `MultiRunner`"""
+
+    def __init__(self, cmd, cwd, runner_kwargs: dict):
+        self.cmd = cmd
+        self.cwd = cwd
+        self.runner_kwargs = runner_kwargs
+        self.runner: Optional[SelectorRunner] = None
+        self._done = False
+        self._result: Optional[dict] = None
+        self._exception: Optional[BaseException] = None
+
+    def __repr__(self):
+        return f"Job({self.cmd!r}, done={self._done})"
+
+    def done(self) -> bool:
+        """Whether the command has finished"""
+        return self._done
+
+    def result(self) -> dict:
+        """Return the result of the command
+
+        The result is the same as the one of `WitlessRunner.run()` for the
+        same command and protocol.
+
+        Raises
+        ------
+        CommandError
+          If the command exited with a non-zero exit code.
+        RuntimeError
+          If the command has not finished yet.
+        """
+        if not self._done:
+            raise RuntimeError(f"{self!r} has not finished yet")
+        if self._exception is not None:
+            raise self._exception
+        assert self._result is not None
+        return self._result
+
+    def exception(self) -> Optional[BaseException]:
+        """Return the exception the command failed with, if any"""
+        if not self._done:
+            raise RuntimeError(f"{self!r} has not finished yet")
+        return self._exception
+
+    def _set_result(self,
+                    result: Optional[dict],
+                    exception: Optional[BaseException] = None):
+        self._result = result
+        self._exception = exception
+        self._done = True
+        self.runner = None
+
+
+class MultiRunner(WitlessRunner):
+    """Runner executing many commands concurrently from a single thread
+
+    Commands are submitted with `submit()`, which returns a `Job` object.
+    At most `jobs` of the submitted commands run at the same time, the
+    others are started when running ones finish. All pipes of the running
+    commands are monitored by a single selector, which is driven by
+    iterating over `as_completed()`. No threads are used, i.e. the
+    commands only make progress while `as_completed()` is iterated over,
+    or when their output fits into the pipe buffers.
+
+        runner = MultiRunner(jobs=8)
+        for ds in datasets:
+            runner.submit(['git', 'fetch'], cwd=ds.path,
+                          protocol=StdOutErrCapture)
+        for job in runner.as_completed():
+            try:
+                job.result()
+            except CommandError as e:
+                ...
+
+    Commands can be submitted while iterating over `as_completed()`, they
+    will be reported by the same iteration. Protocols must not be subclasses
+    of `GeneratorMixIn`.
+
+    Because pipes cannot be used with `selectors` on Windows, this class
+    only works on POSIX systems.
+    """
+    __slots__ = ['jobs', '_selector', '_pending', '_running', '_done']
+
+    def __init__(self, jobs=None, cwd=None, env=None):
+        """
+        Parameters
+        ----------
+        jobs : int or "auto", optional
+          Maximum number of commands running at the same time. If None or
+          "auto", the 'datalad.runtime.max-jobs' configuration is consulted.
+        cwd : path-like, optional
+          Default working directory of the commands, see `WitlessRunner`.
+        env : dict, optional
+          Default environment of the commands, see `WitlessRunner`.
+        """
+        if on_windows:
+            raise NotImplementedError(
+                "MultiRunner is not supported on Windows")
+        super().__init__(cwd=cwd, env=env)
+        if jobs in (None, "auto"):
+            from datalad import cfg
+            jobs = cfg.obtain('datalad.runtime.max-jobs')
+        self.jobs = max(1, jobs)
+        # epoll and kqueue scale with the number of monitored file
+        # descriptors
+        self._selector = selectors.DefaultSelector()
+        self._pending: deque[Job] = deque()
+        self._running: dict[SelectorRunner, Job] = {}
+        self._done: deque[Job] = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self,
+               cmd,
+               protocol: Optional[type[WitlessProtocol]] = None,
+               stdin: Any = None,
+               cwd=None,
+               env=None,
+               timeout: Optional[float] = None,
+               **kwargs) -> Job:
+        """Submit a command for execution
+
+        The command is started right away, if less than `jobs` commands
+        are running. Parameters are the same as for `WitlessRunner.run()`.
+
+        Returns
+        -------
+        Job
+        """
+        if protocol is None:
+            # by default let all subprocess stream pass through
+            protocol = NoCapture
+        if issubclass(protocol, GeneratorMixIn):
+            raise ValueError(
+                f"MultiRunner does not support generator protocols, "
+                f"got {protocol.__name__}")
+
+        cwd = cwd or self.cwd
+        env = self._get_adjusted_env(
+            env or self.env,
+            cwd=cwd,
+        )
+        job = Job(cmd, cwd, dict(
+            protocol_class=protocol,
+            stdin=stdin,
+            protocol_kwargs=kwargs,
+            timeout=timeout,
+            cwd=cwd,
+            env=env,
+        ))
+        self._pending.append(job)
+        self._start_pending()
+        return job
+
+    def as_completed(self) -> Generator[Job, None, None]:
+        """Run submitted commands, and yield their jobs as they finish"""
+        while self._done or self._running or self._pending:
+            if self._done:
+                yield self._done.popleft()
+            else:
+                self._start_pending()
+                if self._running:
+                    self._process_events()
+
+    def close(self):
+        """Terminate running commands, and discard pending ones"""
+        self._pending.clear()
+        for runner, job in list(self._running.items()):
+            lgr.debug("Terminating %r", job)
+            runner.ensure_stdin_stdout_stderr_closed()
+            runner.process.terminate()
+            runner.process.wait()
+            runner.wait_for_threads()
+            job._set_result(None, RuntimeError(f"{job!r} was terminated"))
+        self._running.clear()
+        self._selector.close()
+
+    def _start_pending(self):
+        while self._pending and len(self._running) < self.jobs:
+            job = self._pending.popleft()
+            lgr.debug('Run %r (protocol_class=%s) (cwd=%s)',
+                      job.cmd,
+                      job.runner_kwargs['protocol_class'].__name__,
+                      job.cwd)
+            runner = SelectorRunner(
+                cmd=job.cmd,
+                selector=self._selector,
+                **job.runner_kwargs)
+            try:
+                runner._start_process()
+            except Exception as e:
+                job._set_result(None, e)
+                self._done.append(job)
+                continue
+            job.runner = runner
+            self._running[runner] = job
+
+    def _process_events(self):
+        select_timeout = min(
+            runner.prepare_select() for runner in self._running)
+        active = set()
+        for key, mask in self._selector.select(select_timeout):
+            key.data.handle_event(key.fd, mask)
+            active.add(key.data)
+
+        for runner, job in list(self._running.items()):
+            runner.check_process(timed_out=runner not in active)
+            if runner.should_continue():
+                continue
+            del self._running[runner]
+            try:
+                job._set_result(
+                    _check_results(job.cmd, job.cwd, runner._finish_process()))
+            except Exception as e:
+                job._set_result(None, e)
+            self._done.append(job)
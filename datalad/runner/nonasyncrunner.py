@@ -44,6 +44,12 @@ from .runnerthreads import (
     WaitThread,
     WriteThread,
 )
+from .trace import (
+    CommandTrace,
+    configure_tracing,
+    emit_trace,
+)
+from .trace import consumers as trace_consumers
 
 lgr = logging.getLogger("datalad.runner.nonasyncrunner")
 
@@ -105,6 +111,7 @@ class _ResultGenerator(Generator):
             # is processed.
             runner.protocol.process_exited()
             self.return_code = runner.process.poll()
+            runner._trace()
             self._check_result()
             self.state = self.GeneratorState.process_exited
 
@@ -246,6 +253,11 @@ class ThreadedRunner:
         self.active_file_numbers: set[Optional[int]] = set()
         self.stall_check_interval = 10
 
+        # Instrumentation, see `datalad.runner.trace`
+        self.start_time: Optional[float] = None
+        self.bytes_read = 0
+        self.bytes_written = 0
+
         self.initialization_lock = threading.Lock()
 
         # Pure declarations
@@ -323,6 +335,19 @@ class ThreadedRunner:
         if self.generator is not None:
             raise RuntimeError("ThreadedRunner.run() was re-entered")
 
+        self._start_process()
+
+        if isinstance(self.protocol, GeneratorMixIn):
+            self.generator = _ResultGenerator(
+                self,
+                self.protocol.result_queue
+            )
+            return self.generator
+
+        return self.process_loop()
+
+    def _start_process(self):
+        """Start the subprocess, and the transport of data from and to it"""
         if isinstance(self.stdin, (int, IO, type(None))):
             # We will not write anything to stdin. If the caller passed a
             # file-like he can write to it from a different thread.
@@ -362,6 +387,8 @@ class ThreadedRunner:
             )
         }
 
+        configure_tracing()
+        self.start_time = time.time()
         try:
             # The following command is generated internally by datalad
             # and trusted. Security check is therefore skipped.
@@ -418,6 +445,14 @@ class ThreadedRunner:
             ) if f is not None
         }
 
+        self._start_io()
+
+    def _start_io(self):
+        """Set up the transport of data from and to the subprocess
+
+        Start threads that read from stdout and stderr, write to stdin,
+        and wait for the process to exit. They report to `output_queue`.
+        """
         current_time = time.time()
         if self.timeout:
             self.last_touched[None] = current_time
@@ -470,22 +505,15 @@ class ThreadedRunner:
             self.process)
         self.process_waiting_thread.start()
 
-        if isinstance(self.protocol, GeneratorMixIn):
-            self.generator = _ResultGenerator(
-                self,
-                self.protocol.result_queue
-            )
-            return self.generator
-
-        return self.process_loop()
-
     def process_loop(self) -> dict:
         # Process internal messages until no more active file descriptors
         # are present. This works because active file numbers are only
         # removed when an EOF is received in `self.process_queue`.
         while self.should_continue():
             self.process_queue()
+        return self._finish_process()
 
+    def _finish_process(self) -> dict:
         # Let the protocol prepare the result. This has to be done after
         # the loop was left to ensure that all data from stdout and stderr
         # is processed.
@@ -496,8 +524,29 @@ class ThreadedRunner:
         self.ensure_stdin_stdout_stderr_closed()
         self.protocol.connection_lost(None)  # TODO: check exception
         self.wait_for_threads()
+        self._trace()
         return self.result
 
+    def _trace(self):
+        """Report the finished command to all trace consumers"""
+        if not trace_consumers:
+            return
+        bytes_written = self.bytes_written
+        if self.stdin_enqueueing_thread is not None:
+            bytes_written += self.stdin_enqueueing_thread.bytes_written
+        assert self.start_time is not None
+        emit_trace(CommandTrace(
+            cmd=self.cmd,
+            cwd=self.popen_kwargs.get('cwd'),
+            pid=self.process.pid,
+            start=self.start_time,
+            duration=time.time() - self.start_time,
+            bytes_in=bytes_written,
+            bytes_out=self.bytes_read,
+            code=self.process.poll(),
+            thread=threading.get_ident(),
+        ))
+
     def _handle_file_timeout(self, source):
         if self.protocol.timeout(self.fileno_mapping[source]) is True:
             self.remove_file_number(source)
@@ -603,6 +652,7 @@ class ThreadedRunner:
             else:
                 # Call the protocol handler for data
                 assert isinstance(data, bytes)
+                self.bytes_read += len(data)
                 self.last_touched[file_number] = time.time()
                 self.protocol.pipe_data_received(
                     self.fileno_mapping[file_number],
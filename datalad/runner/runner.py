@@ -13,6 +13,8 @@ from __future__ import annotations
 import logging
 from typing import cast
 
+from datalad.utils import on_windows
+
 from .coreprotocols import NoCapture
 from .exception import CommandError
 from .nonasyncrunner import (
@@ -20,6 +22,7 @@ from .nonasyncrunner import (
     _ResultGenerator,
 )
 from .protocol import GeneratorMixIn
+from .selectorrunner import SelectorRunner
 
 
 lgr = logging.getLogger('datalad.runner.runner')
@@ -33,6 +36,8 @@ class WitlessRunner(object):
     """
     __slots__ = ['cwd', 'env', 'threaded_runner']
 
+    _CFG_RUNNER_BACKEND = None
+
     def __init__(self, cwd=None, env=None):
         """
         Parameters
@@ -57,6 +62,9 @@ class WitlessRunner(object):
 
         Or return an unaltered copy of the environment, if no adjustments
         need to be made.
+
+        Subclasses may return an environment that is shared between calls
+        (see `GitWitlessRunner`), so the result must not be modified.
         """
         if copy:
             env = env.copy() if env else None
@@ -66,6 +74,24 @@ class WitlessRunner(object):
             env['PWD'] = cwd
         return env
 
+    @classmethod
+    def _get_runner_class(cls) -> type[ThreadedRunner]:
+        """Return the runner implementation selected by the configuration"""
+        backend = cls._CFG_RUNNER_BACKEND
+        if backend is None:
+            import datalad  # avoid circular import
+            cfg = getattr(datalad, 'cfg', None)
+            if cfg is None:
+                # the configuration manager itself runs git-config to
+                # load the configuration
+                backend = 'threads'
+            else:
+                backend = WitlessRunner._CFG_RUNNER_BACKEND = cfg.obtain(
+                    'datalad.runtime.runner-backend')
+        if backend == 'selector' and not on_windows:
+            return SelectorRunner
+        return ThreadedRunner
+
     def run(self,
             cmd,
             protocol=None,
@@ -112,7 +138,9 @@ class WitlessRunner(object):
           the sub-process, or if waiting for the subprocess exit
           took more than the specified time. See the protocol and
           `ThreadedRunner` descriptions for a more detailed discussion
-          on timeouts.
+          on timeouts. Which implementation executes the command
+          is determined by the configuration
+          `datalad.runtime.runner-backend`.
         exception_on_error : bool, optional
           This argument is only interpreted if the protocol is a subclass
           of `GeneratorMixIn`. If it is `True` (default), a
@@ -180,7 +208,7 @@ class WitlessRunner(object):
             cwd
         )
 
-        self.threaded_runner = ThreadedRunner(
+        self.threaded_runner = self._get_runner_class()(
             cmd=cmd,
             protocol_class=protocol,
             stdin=stdin,
@@ -198,22 +226,30 @@ class WitlessRunner(object):
         else:
             results = cast(dict, results_or_iterator)
 
-        # log before any exception is raised
-        lgr.debug("Finished %r with status %s", cmd, results['code'])
-
-        # make it such that we always blow if a protocol did not report
-        # a return code at all
-        if results.get('code', True) not in [0, None]:
-            # the runner has a better idea, doc string warns Protocol
-            # implementations not to return these
-            results.pop('cmd', None)
-            results.pop('cwd', None)
-            raise CommandError(
-                # whatever the results were, we carry them forward
-                cmd=cmd,
-                cwd=self.cwd,
-                **results,
-            )
-        # denoise, must be zero at this point
-        results.pop('code', None)
-        return results
+        return _check_results(cmd, self.cwd, results)
+
+
+def _check_results(cmd, cwd, results: dict) -> dict:
+    """Raise CommandError, if the results of a command report a failure
+
+    Otherwise return the results, without the return code.
+    """
+    # log before any exception is raised
+    lgr.debug("Finished %r with status %s", cmd, results['code'])
+
+    # make it such that we always blow if a protocol did not report
+    # a return code at all
+    if results.get('code', True) not in [0, None]:
+        # the runner has a better idea, doc string warns Protocol
+        # implementations not to return these
+        results.pop('cmd', None)
+        results.pop('cwd', None)
+        raise CommandError(
+            # whatever the results were, we carry them forward
+            cmd=cmd,
+            cwd=cwd,
+            **results,
+        )
+    # denoise, must be zero at this point
+    results.pop('code', None)
+    return results
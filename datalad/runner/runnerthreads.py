@@ -228,6 +228,7 @@ class WriteThread(TransportThread):
         super().__init__(identifier, signal_queues, user_info)
         self.source_queue = source_queue
         self.destination = destination
+        self.bytes_written = 0
 
     def read(self) -> Optional[bytes]:
         data = self.source_queue.get()
@@ -240,8 +241,8 @@ class WriteThread(TransportThread):
     def write(self,
               data: bytes,
               ) -> bool:
+        written = 0
         try:
-            written = 0
             while written < len(data):
                 written += os.write(
                     self.destination.fileno(),
@@ -253,4 +254,6 @@ class WriteThread(TransportThread):
             # try to close it and indicate EOF.
             _try_close(self.destination)
             return False
+        finally:
+            self.bytes_written += written
         return True
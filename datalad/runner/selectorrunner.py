@@ -0,0 +1,301 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""
+Single thread subprocess execution with stdout and stderr passed to protocol
+objects, using `selectors` to multiplex the pipes of the subprocess (POSIX only)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import selectors
+import subprocess
+import time
+from queue import Empty
+from typing import Optional
+
+from .nonasyncrunner import ThreadedRunner
+
+lgr = logging.getLogger("datalad.runner.selectorrunner")
+
+
+class SelectorRunner(ThreadedRunner):
+    """
+    A `ThreadedRunner` that does not use any threads.
+
+    All pipes of the subprocess are monitored from the thread that executes
+    `run()`, or iterates over the generator returned by it. Data is
+    read from stdout and stderr, and written to stdin, whenever the
+    respective pipe is ready. Protocol callbacks, timeouts, and generator
+    semantics are the same as with `ThreadedRunner`, see there for
+    a documentation of the parameters.
+
+    Because pipes cannot be used with `selectors` on Windows, this class
+    only works on POSIX systems.
+    """
+    # Number of bytes to read from stdout or stderr at once.
+    read_size = 65536
+
+    # Interval in seconds after which a stdin-queue is checked for new
+    # data, if it was empty before. A queue cannot be monitored by a
+    # selector. The interval is only relevant if data is put into the
+    # queue by other threads, while this runner waits for output.
+    stdin_poll_interval = 0.01
+
+    def __init__(self,
+                 *args,
+                 selector: Optional[selectors.BaseSelector] = None,
+                 **kwargs):
+        """
+        Parameters
+        ----------
+        selector : selectors.BaseSelector, optional
+            Selector to register the pipes of the subprocess in. If given,
+            the caller is responsible for waiting for events and for
+            passing them to `handle_event()`, see `MultiRunner`. Otherwise,
+            a selector is created by, and used only by this runner.
+
+        All other parameters are those of `ThreadedRunner`.
+        """
+        super().__init__(*args, **kwargs)
+        self.own_selector = selector is None
+        self.selector: Optional[selectors.BaseSelector] = selector
+        self.process_fileno: Optional[int] = None
+        self.stdin_buffer = bytearray()
+        self.stdin_eof = False
+        self.waiting_for_stdin = False
+
+    def _start_io(self):
+        if self.selector is None:
+            # poll() does not need a system call to register a file
+            # descriptor, which makes it cheaper than epoll for the few
+            # pipes of a single process
+            self.selector = (
+                selectors.PollSelector()
+                if hasattr(selectors, "PollSelector")
+                else selectors.DefaultSelector())
+
+        # A file descriptor that becomes readable when the process exits,
+        # where supported (Linux). Without it, the process is polled.
+        try:
+            self.process_fileno = os.pidfd_open(self.process.pid)
+        except (AttributeError, OSError):
+            self.process_fileno = None
+        else:
+            self.selector.register(
+                self.process_fileno, selectors.EVENT_READ, self)
+
+        current_time = time.time()
+        if self.timeout:
+            self.last_touched[None] = current_time
+
+        for catch, file_number in (
+                (self.catch_stderr, self.process_stderr_fileno),
+                (self.catch_stdout, self.process_stdout_fileno)):
+            if catch:
+                self.active_file_numbers.add(file_number)
+                if self.timeout:
+                    self.last_touched[file_number] = current_time
+                self.selector.register(file_number, selectors.EVENT_READ, self)
+
+        if self.write_stdin:
+            # No timeouts for stdin. The pipe is only registered in the
+            # selector while there is data to write, see `_fill_stdin_buffer`.
+            assert self.process_stdin_fileno is not None
+            self.active_file_numbers.add(self.process_stdin_fileno)
+            os.set_blocking(self.process_stdin_fileno, False)
+
+    def _register(self, file_number: int, events: int):
+        assert self.selector is not None
+        try:
+            self.selector.modify(file_number, events, self)
+        except KeyError:
+            self.selector.register(file_number, events, self)
+
+    def _unregister(self, file_number: Optional[int]):
+        if self.selector is None or file_number is None:
+            return
+        try:
+            key = self.selector.get_key(file_number)
+        except (KeyError, ValueError):
+            return
+        # The number of a closed file descriptor might have been reused
+        # by another runner that shares the selector.
+        if key.data is self:
+            self.selector.unregister(file_number)
+
+    def _fill_stdin_buffer(self) -> bool:
+        """Move data from the stdin-queue into the write buffer
+
+        Returns
+        -------
+        bool
+          True, if stdin still waits for data from the queue.
+        """
+        file_number = self.process_stdin_fileno
+        if not self.write_stdin or file_number not in self.active_file_numbers:
+            return False
+        assert self.stdin_queue is not None
+        while not self.stdin_eof:
+            try:
+                data = self.stdin_queue.get_nowait()
+            except Empty:
+                break
+            if data is None:
+                self.stdin_eof = True
+            elif isinstance(data, str):
+                self.stdin_buffer += data.encode()
+            else:
+                self.stdin_buffer += data
+
+        if self.stdin_buffer:
+            self._register(file_number, selectors.EVENT_WRITE)
+        elif self.stdin_eof:
+            # All data is written, close stdin
+            self.remove_file_number(file_number)
+        else:
+            self._unregister(file_number)
+            return True
+        return False
+
+    def prepare_select(self) -> float:
+        """Prepare waiting for events of this runner's subprocess
+
+        Returns
+        -------
+        float
+          The maximum time in seconds to wait for events, before this
+          runner has to be checked again.
+        """
+        self.waiting_for_stdin = self._fill_stdin_buffer()
+        if self.waiting_for_stdin:
+            return self.stdin_poll_interval
+        return ThreadedRunner.timeout_resolution
+
+    def process_queue(self):
+        """
+        Wait for the pipes of the subprocess to become ready, or for the
+        process to exit, and handle all pending events or a timeout. This
+        method might modify the set of active file numbers if a pipe is
+        closed, or if a timeout-callback returns True.
+        """
+        assert self.selector is not None
+        select_timeout = self.prepare_select()
+
+        if self.selector.get_map():
+            events = self.selector.select(select_timeout)
+        else:
+            # Nothing to monitor but the process itself
+            events = []
+            try:
+                if self.timeout is None and not self.waiting_for_stdin:
+                    self.process.wait()
+                else:
+                    self.process.wait(select_timeout)
+            except subprocess.TimeoutExpired:
+                pass
+
+        for key, mask in events:
+            self.handle_event(key.fd, mask)
+        self.check_process(timed_out=not events)
+
+    def handle_event(self, file_number: int, mask: int):
+        """Handle a selector event for one of this runner's file descriptors"""
+        if file_number == self.process_fileno:
+            self._close_process_fileno()
+        elif file_number not in self.active_file_numbers:
+            # Closed while handling an earlier event
+            return
+        elif mask & selectors.EVENT_READ:
+            self._read(file_number)
+        elif mask & selectors.EVENT_WRITE:
+            self._write(file_number)
+
+    def check_process(self, timed_out: bool):
+        """Check for the exit of the subprocess, and for timeouts
+
+        Parameters
+        ----------
+        timed_out : bool
+          Whether there were no events for this runner while waiting.
+        """
+        if None in self.active_file_numbers and self.process.poll() is not None:
+            self.remove_process()
+
+        if timed_out:
+            self.process_timeouts()
+
+    def _close_process_fileno(self):
+        if self.process_fileno is not None:
+            self._unregister(self.process_fileno)
+            os.close(self.process_fileno)
+            self.process_fileno = None
+
+    def _read(self, file_number: int):
+        try:
+            data = os.read(file_number, self.read_size)
+        except OSError:
+            data = b""
+        if data:
+            self.bytes_read += len(data)
+            if self.timeout:
+                self.last_touched[file_number] = time.time()
+            self.protocol.pipe_data_received(
+                self.fileno_mapping[file_number],
+                data)
+        else:
+            # Received an EOF for stdout or stderr.
+            self.remove_file_number(file_number)
+
+    def _write(self, file_number: int):
+        try:
+            written = os.write(file_number, self.stdin_buffer)
+        except BlockingIOError:
+            return
+        except (BrokenPipeError, OSError, ValueError):
+            # The process most likely closed its end of the pipe
+            self.stdin_buffer.clear()
+            self.remove_file_number(file_number)
+            return
+        self.bytes_written += written
+        del self.stdin_buffer[:written]
+
+    def remove_process(self):
+        if None not in self.active_file_numbers:
+            # Might already be removed due to a timeout callback returning
+            # True and subsequent removal of the process.
+            return
+        self.active_file_numbers.remove(None)
+        if self.timeout:
+            del self.last_touched[None]
+
+        # The process will no longer consume input from stdin.
+        if self.write_stdin and self.process_stdin_fileno in self.active_file_numbers:
+            self.stdin_buffer.clear()
+            self.remove_file_number(self.process_stdin_fileno)
+
+        self.return_code = self.process.poll()
+
+    def remove_file_number(self, file_number: int):
+        self._unregister(file_number)
+        super().remove_file_number(file_number)
+
+    def _ensure_closed(self, file_objects):
+        for file_object in file_objects:
+            if file_object is not None:
+                self._unregister(self.file_to_fileno.get(file_object, None))
+        super()._ensure_closed(file_objects)
+
+    def wait_for_threads(self):
+        # There are no threads, just release the selector.
+        self._close_process_fileno()
+        if self.own_selector and self.selector is not None:
+            self.selector.close()
+        self.selector = None
@@ -1,10 +1,19 @@
+import os
+import os.path as op
 from unittest.mock import patch
 
 from datalad.runner.coreprotocols import StdOutErrCapture
 from datalad.runner.protocol import GeneratorMixIn
-from datalad.tests.utils_pytest import assert_equal
+from datalad.tests.utils_pytest import (
+    assert_equal,
+    assert_false,
+    assert_true,
+)
 
-from ..gitrunner import GitWitlessRunner
+from ..gitrunner import (
+    GitWitlessRunner,
+    _supports_pathspec_from_file,
+)
 
 
 class TestGeneratorProtocol(GeneratorMixIn, StdOutErrCapture):
@@ -40,3 +49,92 @@ def test_gitrunner_list():
             ["f1.txt", "f2.txt"],
             protocol=StdOutErrCapture)
         assert_equal(result, {"a": 4, "b": 6})
+
+
+def test_supports_pathspec_from_file():
+    for cmd, expected in (
+            (["git", "add", "--", "f"], True),
+            (["git", "-c", "a.b=c", "-C", "add", "rm", "f"], True),
+            (["/usr/bin/git", "--git-dir=.git", "restore"], True),
+            (["git", "-c", "add=1", "ls-files"], False),
+            (["git", "annex", "add"], False),
+            (["add"], False)):
+        assert_equal(_supports_pathspec_from_file(cmd), expected)
+
+
+def test_gitrunner_chunked_results():
+    git_runner = GitWitlessRunner()
+    files = ["f%i.txt" % i for i in range(30)]
+    with patch("datalad.utils.CMD_MAX_ARG", 100), \
+            patch.object(GitWitlessRunner, "_CFG_PATHSPEC_FROM_FILE",
+                         "multi-chunk"), \
+            patch.object(git_runner, "run") as run_mock:
+        run_mock.side_effect = lambda cmd, **kwargs: cmd
+        # files are consumed lazily, and chunked if the command does not
+        # support --pathspec-from-file
+        cmd = ["git", "ls-files"]
+        results = git_runner._get_chunked_results(cmd, iter(files))
+        first = next(results)
+        assert_equal(first, cmd + ["--"] + files[:len(first) - 3])
+        assert_equal(
+            sum((chunk[3:] for chunk in results), first[3:]),
+            files)
+        assert_equal(cmd, ["git", "ls-files"])
+
+        # otherwise, a single command is run with a pathspec file
+        pathspec = []
+
+        def run(cmd, **kwargs):
+            with open(cmd[-1].split("=", 1)[1], "rb") as f:
+                pathspec.append(f.read())
+            return cmd
+
+        run_mock.side_effect = run
+        cmd = ["git", "add"]
+        results = list(git_runner._get_chunked_results(cmd, iter(files)))
+        assert_equal(len(results), 1)
+        assert_equal(results[0][:3], cmd + ["--pathspec-file-nul"])
+        assert_equal(pathspec, ["\0".join(files).encode()])
+        assert_equal(cmd, ["git", "add"])
+        # unless it is disabled explicitly
+        run_mock.side_effect = lambda cmd, **kwargs: cmd
+        results = list(git_runner._get_chunked_results(
+            cmd, files, pathspec_from_file=False))
+        assert_true(len(results) > 1)
+
+
+def test_gitrunner_env_cache():
+    git_runner = GitWitlessRunner()
+    with patch.dict(GitWitlessRunner._ENV_CACHE, clear=True), \
+            patch.dict(os.environ, {"GIT_DIR": "/abs/.git"}):
+        env = git_runner._get_adjusted_env(cwd="/some")
+        assert_equal(env["PWD"], "/some")
+        assert_equal(env["LC_MESSAGES"], "C")
+        assert_true(git_runner._get_adjusted_env(cwd="/some") is env)
+        assert_equal(git_runner._get_adjusted_env(cwd="/other")["PWD"],
+                     "/other")
+        # changes of the environment are picked up
+        os.environ["DATALAD_TEST_ENV_CACHE"] = "1"
+        changed_env = git_runner._get_adjusted_env(cwd="/some")
+        assert_equal(changed_env["DATALAD_TEST_ENV_CACHE"], "1")
+        assert_true(git_runner._get_adjusted_env(cwd="/some") is changed_env)
+        # an empty environment means the process environment, too
+        empty_env = git_runner._get_adjusted_env({}, cwd="/some")
+        assert_true(empty_env is changed_env)
+        os.environ["DATALAD_TEST_ENV_CACHE"] = "2"
+        assert_equal(
+            git_runner._get_adjusted_env({}, cwd="/some")[
+                "DATALAD_TEST_ENV_CACHE"],
+            "2")
+        # as well as changes of a given environment
+        given_env = {"PATH": "/bin"}
+        env = git_runner._get_adjusted_env(given_env, cwd="/some")
+        given_env["GIT_DIR"] = "/abs/.git"
+        assert_equal(
+            git_runner._get_adjusted_env(given_env, cwd="/some")["GIT_DIR"],
+            "/abs/.git")
+        # relative paths depend on the current directory, and are not cached
+        os.environ["GIT_DIR"] = ".git"
+        env = git_runner._get_adjusted_env(cwd="/some")
+        assert_equal(env["GIT_DIR"], op.abspath(".git"))
+        assert_false(git_runner._get_adjusted_env(cwd="/some") is env)
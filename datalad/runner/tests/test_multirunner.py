@@ -0,0 +1,136 @@
+# emacs: -*- mode: python-mode; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil; coding: utf-8 -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Test the runner for concurrent commands
+"""
+from __future__ import annotations
+
+import os
+import time
+
+from datalad.tests.utils_pytest import (
+    assert_false,
+    assert_in,
+    assert_is_instance,
+    assert_raises,
+    assert_true,
+    eq_,
+    skip_if_on_windows,
+    with_tempfile,
+)
+
+from .. import (
+    MultiRunner,
+    StdOutCapture,
+    StdOutErrCapture,
+)
+from ..exception import CommandError
+from ..protocol import GeneratorMixIn
+from .utils import py2cmd
+
+
+class _CountingProtocol(StdOutCapture):
+    # records the maximum number of concurrently running processes
+    running = 0
+    max_running = 0
+
+    def connection_made(self, process):
+        super().connection_made(process)
+        _CountingProtocol.running += 1
+        _CountingProtocol.max_running = max(
+            _CountingProtocol.running, _CountingProtocol.max_running)
+
+    def process_exited(self):
+        _CountingProtocol.running -= 1
+        super().process_exited()
+
+
+@skip_if_on_windows
+def test_multirunner_basic():
+    runner = MultiRunner(jobs=3)
+    jobs = [
+        runner.submit(
+            py2cmd(f"import time; time.sleep({(10 - i) / 100}); print({i})"),
+            protocol=_CountingProtocol)
+        for i in range(10)
+    ]
+    # only the first ones are running
+    eq_(sum(job.runner is not None for job in jobs), 3)
+    assert_raises(RuntimeError, jobs[0].result)
+
+    completed = list(runner.as_completed())
+    eq_(len(completed), 10)
+    eq_(set(map(id, completed)), set(map(id, jobs)))
+    for i, job in enumerate(jobs):
+        assert_true(job.done())
+        eq_(job.result()["stdout"], f"{i}\n")
+    eq_(_CountingProtocol.running, 0)
+    eq_(_CountingProtocol.max_running, 3)
+
+
+@skip_if_on_windows
+def test_multirunner_concurrency():
+    # commands run concurrently: ten times 0.5s in much less than 5s
+    start = time.time()
+    with MultiRunner(jobs=10) as runner:
+        for i in range(10):
+            runner.submit(["sleep", "0.5"])
+        eq_(len(list(runner.as_completed())), 10)
+    assert_true(time.time() - start < 3)
+
+
+@skip_if_on_windows
+def test_multirunner_errors():
+    runner = MultiRunner(jobs=2)
+    assert_raises(ValueError, runner.submit, ["true"],
+                  protocol=type("Gen", (GeneratorMixIn, StdOutCapture), {}))
+    failing = runner.submit(
+        py2cmd("import sys; print('out'); sys.exit(3)"),
+        protocol=StdOutErrCapture)
+    missing = runner.submit(["datalad-no-such-command"])
+    ok = runner.submit(["true"])
+    # the command that could not be started is reported right away
+    completed = list(runner.as_completed())
+    assert_true(completed[0] is missing)
+    assert_is_instance(missing.exception(), FileNotFoundError)
+    with assert_raises(CommandError) as cme:
+        failing.result()
+    eq_(cme.value.code, 3)
+    eq_(cme.value.stdout, "out\n")
+    assert_false("code" in ok.result())
+
+
+@skip_if_on_windows
+@with_tempfile(mkdir=True)
+def test_multirunner_submit_while_iterating(path=None):
+    # stdin, cwd, and commands submitted from the consumer loop
+    runner = MultiRunner(jobs=2, cwd=path)
+    runner.submit(["cat"], protocol=StdOutCapture, stdin=b"0")
+    results = []
+    for job in runner.as_completed():
+        results.append(job.result()["stdout"])
+        if len(results) < 5:
+            runner.submit(["cat"], protocol=StdOutCapture,
+                          stdin=str(len(results)).encode())
+    eq_(results, ["0", "1", "2", "3", "4"])
+    job = runner.submit(py2cmd("import os; print(os.getcwd())"),
+                        protocol=StdOutCapture)
+    eq_(list(runner.as_completed()), [job])
+    eq_(os.path.realpath(job.result()["stdout"].strip()),
+        os.path.realpath(path))
+
+
+@skip_if_on_windows
+def test_multirunner_close():
+    runner = MultiRunner(jobs=1)
+    running = runner.submit(["sleep", "10"])
+    pending = runner.submit(["sleep", "10"])
+    runner.close()
+    assert_true(running.done())
+    assert_in("terminated", str(running.exception()))
+    assert_false(pending.done())
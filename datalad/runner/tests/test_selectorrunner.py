@@ -0,0 +1,176 @@
+# emacs: -*- mode: python-mode; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil; coding: utf-8 -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Test the selector based runner
+"""
+from __future__ import annotations
+
+import queue
+import threading
+from typing import Optional
+from unittest.mock import patch
+
+import pytest
+
+from datalad.tests.utils_pytest import (
+    assert_in,
+    assert_raises,
+    assert_true,
+    eq_,
+    skip_if_on_windows,
+)
+
+from .. import (
+    NoCapture,
+    Runner,
+    StdOutErrCapture,
+)
+from ..exception import CommandError
+from ..nonasyncrunner import ThreadedRunner
+from ..protocol import GeneratorMixIn
+from ..runner import WitlessRunner
+from ..selectorrunner import SelectorRunner
+from .utils import py2cmd
+
+
+class GenStdoutStderr(GeneratorMixIn, StdOutErrCapture):
+    def __init__(self,
+                 done_future=None,
+                 encoding=None):
+
+        StdOutErrCapture.__init__(
+            self,
+            done_future=done_future,
+            encoding=encoding)
+        GeneratorMixIn.__init__(self)
+
+    def pipe_data_received(self, fd, data):
+        super().pipe_data_received(fd, data)
+        self.send_result((fd, data))
+
+
+def _run(cmd, protocol, stdin=None, **kwargs):
+    return SelectorRunner(
+        cmd=cmd,
+        protocol_class=protocol,
+        stdin=stdin,
+        **kwargs).run()
+
+
+@skip_if_on_windows
+def test_capture_large_output():
+    # both pipes are drained, while more than a pipe buffer of data is
+    # written to stdin
+    code = (
+        "import sys\n"
+        "data = sys.stdin.buffer.read()\n"
+        "sys.stderr.write('e' * len(data))\n"
+        "sys.stdout.write('o' * len(data))\n"
+    )
+    result = _run(py2cmd(code), StdOutErrCapture, stdin=b"x" * 1000000)
+    eq_(result["code"], 0)
+    eq_(result["stdout"], "o" * 1000000)
+    eq_(result["stderr"], "e" * 1000000)
+
+
+@skip_if_on_windows
+def test_str_stdin():
+    result = _run(py2cmd("import sys; sys.stdout.write(sys.stdin.read())"),
+                  StdOutErrCapture, stdin="äb\n")
+    eq_(result["code"], 0)
+    eq_(result["stdout"], "äb\n")
+
+
+@skip_if_on_windows
+def test_exit_code_and_no_capture():
+    result = _run(py2cmd("import sys; sys.exit(3)"), NoCapture)
+    eq_(result["code"], 3)
+
+
+@skip_if_on_windows
+def test_generator_request_response():
+    # request-response communication as done by BatchedCommand: data put
+    # into the queue is sent before waiting for output
+    stdin_queue = queue.Queue()
+    gen = _run(py2cmd("import sys\n"
+                      "for line in sys.stdin:\n"
+                      "    print(line.strip(), flush=True)\n"),
+               GenStdoutStderr,
+               stdin=stdin_queue)
+    for i in range(10):
+        stdin_queue.put(f"{i}\n".encode())
+        response = b""
+        while not response.endswith(b"\n"):
+            fd, data = next(gen)
+            eq_(fd, 1)
+            response += data
+        eq_(response, f"{i}\n".encode())
+    stdin_queue.put(None)
+    eq_(tuple(gen), ())
+    eq_(gen.return_code, 0)
+
+
+@skip_if_on_windows
+def test_generator_exception_on_error():
+    with assert_raises(CommandError) as cme:
+        tuple(_run(py2cmd("import sys; print('out'); sys.exit(2)"),
+                   GenStdoutStderr))
+    eq_(cme.value.code, 2)
+    eq_(cme.value.stdout, "out\n")
+
+
+@skip_if_on_windows
+def test_stdin_queue_from_thread():
+    # data put into the queue by another thread, while the runner waits
+    stdin_queue = queue.Queue()
+
+    def feed():
+        for i in range(5):
+            stdin_queue.put(f"{i}\n".encode())
+        stdin_queue.put(None)
+
+    timer = threading.Timer(.3, feed)
+    timer.start()
+    result = _run(py2cmd("import sys; print(len(sys.stdin.readlines()))"),
+                  StdOutErrCapture,
+                  stdin=stdin_queue)
+    timer.join()
+    eq_(result["stdout"], "5\n")
+
+
+@skip_if_on_windows
+def test_timeout():
+    class TestProtocol(StdOutErrCapture):
+        def __init__(self, timeouts: list):
+            StdOutErrCapture.__init__(self)
+            self.timeouts = timeouts
+
+        def timeout(self, fd: Optional[int]) -> bool:
+            self.timeouts.append(fd)
+            # terminate the process on the first process timeout
+            return fd is None
+
+    timeouts = []
+    result = _run(["sleep", "10"], TestProtocol, timeout=.3,
+                  protocol_kwargs=dict(timeouts=timeouts))
+    assert_in(None, timeouts)
+    assert_true(all(fd in (1, 2, None) for fd in timeouts))
+    assert_true(result["code"] != 0)
+
+
+@pytest.mark.parametrize("backend,runner_class", [
+    ("threads", ThreadedRunner),
+    ("selector", SelectorRunner),
+])
+@skip_if_on_windows
+def test_runner_backend(backend, runner_class):
+    runner = Runner()
+    with patch.object(WitlessRunner, "_CFG_RUNNER_BACKEND", backend):
+        eq_(runner.run(["echo", "a"], protocol=StdOutErrCapture)["stdout"],
+            "a\n")
+    eq_(type(runner.threaded_runner), runner_class)
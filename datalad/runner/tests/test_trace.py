@@ -0,0 +1,165 @@
+# emacs: -*- mode: python-mode; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil; coding: utf-8 -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Test the instrumentation of subprocess execution
+"""
+from __future__ import annotations
+
+import json
+import os
+from unittest.mock import patch
+
+import pytest
+
+from datalad.tests.utils_pytest import (
+    assert_equal,
+    assert_false,
+    assert_in,
+    assert_raises,
+    assert_true,
+    with_tempfile,
+)
+
+from .. import StdOutErrCapture
+from ..exception import CommandError
+from ..protocol import GeneratorMixIn
+from ..runner import WitlessRunner
+from ..trace import (
+    ChromeTraceWriter,
+    CommandTrace,
+    JSONLTraceWriter,
+    TraceAggregator,
+    consumers,
+    get_command_name,
+    read_trace_file,
+    summarize_traces,
+)
+from .utils import py2cmd
+
+
+class _GeneratorProtocol(GeneratorMixIn, StdOutErrCapture):
+    def pipe_data_received(self, fd, data):
+        self.send_result((fd, data))
+
+
+def _trace(cmd, duration, code=0, bytes_in=0, bytes_out=0):
+    return CommandTrace(cmd, None, 1, 0.0, duration, bytes_in, bytes_out, code)
+
+
+def test_get_command_name():
+    for cmd, expected in (
+            (["git", "add", "f"], "git add"),
+            (["/usr/bin/git", "-c", "a.b=c", "-C", "/x", "ls-files"],
+             "git ls-files"),
+            (["git", "--git-dir=.git", "annex", "find", "--json"],
+             "git annex find"),
+            (["git-annex", "version"], "git-annex version"),
+            ("cat -n", "cat"),
+            (["git"], "git"),
+            ([], "")):
+        assert_equal(get_command_name(cmd), expected)
+
+
+def test_summarize_traces():
+    traces = [
+        _trace(["git", "status"], 1.0, bytes_out=10),
+        _trace(["git", "status"], 3.0, code=1, bytes_out=5),
+        _trace(["cat"], 2.5, bytes_in=7),
+    ]
+    summary = summarize_traces(traces)
+    assert_equal([e["command"] for e in summary], ["git status", "cat"])
+    assert_equal(
+        summary[0],
+        dict(command="git status", count=2, total=4.0, max=3.0, mean=2.0,
+             bytes_in=0, bytes_out=15, failed=1))
+    assert_equal(summary[1]["bytes_in"], 7)
+    assert_equal(len(summarize_traces(traces, top=1)), 1)
+    # the dict representation is summarized the same way
+    assert_equal(summarize_traces(t.as_dict() for t in traces), summary)
+
+
+@pytest.mark.parametrize("backend", ["threads", "selector"])
+def test_trace_aggregator(backend):
+    if backend == "selector" and os.name == "nt":
+        pytest.skip("selector backend is POSIX only")
+    runner = WitlessRunner()
+    with patch.object(WitlessRunner, "_CFG_RUNNER_BACKEND", backend), \
+            TraceAggregator() as aggregator:
+        runner.run(
+            py2cmd("import sys; sys.stdout.write(sys.stdin.read() * 2)"),
+            stdin=b"abc",
+            protocol=StdOutErrCapture)
+        with assert_raises(CommandError):
+            runner.run(py2cmd("import sys; sys.exit(3)"),
+                       protocol=StdOutErrCapture)
+        # generators are traced when they are exhausted
+        list(runner.run(py2cmd("print('x')"), protocol=_GeneratorProtocol))
+    assert_false(aggregator in consumers)
+    assert_equal(len(aggregator.traces), 3)
+
+    trace = aggregator.traces[0]
+    assert_equal(trace.bytes_in, 3)
+    assert_equal(trace.bytes_out, 6)
+    assert_equal(trace.code, 0)
+    assert_true(trace.duration > 0)
+    assert_true(trace.pid > 0)
+    assert_equal(aggregator.traces[1].code, 3)
+    assert_equal(aggregator.traces[2].code, 0)
+    assert_true(aggregator.traces[2].bytes_out > 0)
+
+    summary = aggregator.summary()
+    assert_equal(len(summary), 1)
+    assert_equal(summary[0]["count"], 3)
+    assert_equal(summary[0]["failed"], 1)
+
+
+def test_trace_consumer_errors():
+    def failing_consumer(trace):
+        raise ValueError("this should not stop the runner")
+
+    consumers.append(failing_consumer)
+    try:
+        with TraceAggregator() as aggregator:
+            WitlessRunner().run(py2cmd("pass"))
+    finally:
+        consumers.remove(failing_consumer)
+    assert_equal(len(aggregator.traces), 1)
+
+
+@with_tempfile
+@with_tempfile
+def test_trace_writers(jsonl_path=None, chrome_path=None):
+    traces = [
+        _trace(["git", "status"], 1.5, bytes_out=10),
+        _trace(["cat"], 0.25, code=1, bytes_in=7),
+    ]
+    for writer_class, path in ((JSONLTraceWriter, jsonl_path),
+                               (ChromeTraceWriter, chrome_path)):
+        writer = writer_class(path)
+        for trace in traces:
+            writer(trace)
+        writer.close()
+        # traces after closing are ignored
+        writer(traces[0])
+
+    assert_equal(read_trace_file(jsonl_path), [t.as_dict() for t in traces])
+
+    # a second writer appends to an existing file
+    writer = ChromeTraceWriter(chrome_path)
+    writer(traces[0])
+    writer.close()
+    with open(chrome_path) as f:
+        content = f.read()
+    # the closing bracket is optional in the trace event format
+    events = json.loads(content.rstrip().rstrip(",") + "]")
+    assert_equal(len(events), 3)
+    assert_equal(events[0]["name"], "git status")
+    assert_equal(events[0]["ph"], "X")
+    assert_equal(events[0]["dur"], 1500000)
+    assert_equal(events[1]["args"]["code"], 1)
+    assert_in("bytes_in", events[1]["args"])
@@ -15,6 +15,7 @@ from datalad.tests.utils_pytest import (
 from ..utils import (
     AssemblingDecoderMixIn,
     LineSplitter,
+    RecordSplitter,
 )
 
 
@@ -115,6 +116,48 @@ def test_line_splitter_corner_cases():
     assert_equal(lines, ["  a   ", " "])
 
 
+def test_line_splitter_chunks():
+    # lines are assembled from any partition of the data
+    data = "a\nbc\x00\x00d\ne\x00f\x00" * 3 + "g"
+    for separator, keep_ends in ((None, True), (None, False),
+                                 ("\x00", True), ("\x00", False),
+                                 ("\nb", True), ("\x00\x00", False)):
+        line_splitter = LineSplitter(separator, keep_ends)
+        expected = line_splitter.process(data)
+        remaining = line_splitter.finish_processing()
+        for size in (1, 2, 3, 5):
+            line_splitter = LineSplitter(separator, keep_ends)
+            lines = []
+            for i in range(0, len(data), size):
+                lines.extend(line_splitter.process(data[i:i + size]))
+            assert_equal(lines, expected)
+            assert_equal(line_splitter.finish_processing(), remaining)
+
+
+def test_record_splitter():
+    record_splitter = RecordSplitter(b"\x00")
+    assert_equal(list(record_splitter.process(b"")), [])
+    assert_equal(list(record_splitter.process(b"a\x00bc")), [b"a"])
+    assert_equal(list(record_splitter.process(b"d\x00\x00e")), [b"bcd", b""])
+    assert_equal(record_splitter.finish_processing(), b"e")
+    assert_is_none(record_splitter.finish_processing())
+
+    record_splitter = RecordSplitter(b"\n", keep_ends=True)
+    assert_equal(list(record_splitter.process(b"a\nb\nc")), [b"a\n", b"b\n"])
+    assert_equal(list(record_splitter.process(b"\n")), [b"c\n"])
+    assert_is_none(record_splitter.finish_processing())
+
+    # multi-byte separators in any partition of the data
+    data = b"ab\r\n\r\r\ncd\r\n\n"
+    for size in (1, 2, 3):
+        record_splitter = RecordSplitter(b"\r\n")
+        records = []
+        for i in range(0, len(data), size):
+            records.extend(record_splitter.process(data[i:i + size]))
+        assert_equal(records, [b"ab", b"\r", b"cd"])
+        assert_equal(record_splitter.finish_processing(), b"\n")
+
+
 def test_assembling_decoder_mix_in_basic():
 
     encoding = "utf-8"
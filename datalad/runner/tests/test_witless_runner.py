@@ -45,6 +45,7 @@ from .. import (
     CommandError,
     KillOutput,
     Protocol,
+    RecordCapture,
     Runner,
     StdOutCapture,
     StdOutErrCapture,
@@ -302,6 +303,22 @@ def test_kill_output():
     eq_(res['stderr'], '')
 
 
+def test_record_capture():
+    runner = Runner()
+    res = runner.run(
+        py2cmd('import sys; sys.stdout.buffer.write(b"a\\0\\xc3\\xa4\\0\\0b"); '
+               'sys.stderr.write("c\\0")'),
+        protocol=RecordCapture,
+        encoding='utf-8',
+        separator='\0')
+    eq_(res['stdout_records'], ['a', '\u00e4', '', 'b'])
+    eq_(res['stdout'], '')
+    eq_(res['stderr'], 'c\0')
+    # a terminating separator does not create an empty record
+    res = runner.run(py2cmd('print("a"); print("b")'), protocol=RecordCapture)
+    eq_(res['stdout_records'], ['a', 'b'])
+
+
 @skip_if_on_windows  # no "hint" on windows since no ulimit command there
 def test_too_long():
     with swallow_logs(new_level=logging.ERROR) as cml:
@@ -0,0 +1,352 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Instrumentation of subprocess execution
+
+Every command that is executed by a runner is reported as a `CommandTrace`
+to all registered trace consumers. A consumer is any callable that accepts
+a `CommandTrace`, see `add_trace_consumer()`. Provided consumers are
+`TraceAggregator`, which keeps traces in memory, and `JSONLTraceWriter` and
+`ChromeTraceWriter`, which write traces to a file.
+
+A trace file is written for a whole DataLad process, if the configuration
+'datalad.runtime.trace' is set to a file name, e.g.:
+
+    DATALAD_RUNTIME_TRACE=/tmp/trace.jsonl datalad save
+
+The format is determined by 'datalad.runtime.trace-format'.
+"""
+
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import os
+import os.path as op
+import threading
+from collections.abc import (
+    Callable,
+    Iterable,
+)
+from typing import (
+    IO,
+    Optional,
+)
+
+lgr = logging.getLogger('datalad.runner.trace')
+
+# Registered trace consumers. The runners check this list before creating
+# a trace, i.e. without consumers, tracing costs nothing.
+consumers: list[Callable[[CommandTrace], None]] = []
+
+_configured = False
+
+
+class CommandTrace(object):
+    """Record of a single command execution"""
+
+    __slots__ = ['cmd', 'cwd', 'pid', 'start', 'duration', 'bytes_in',
+                 'bytes_out', 'code', 'thread']
+
+    def __init__(self, cmd, cwd, pid, start, duration, bytes_in, bytes_out,
+                 code, thread=None):
+        """
+        Parameters
+        ----------
+        cmd : list or str
+          The executed command.
+        cwd : str or None
+          Working directory of the command.
+        pid : int
+          Process ID of the command.
+        start : float
+          Start time in seconds since the epoch.
+        duration : float
+          Wall time in seconds from starting the command until all its
+          output was processed.
+        bytes_in : int
+          Number of bytes written to stdin of the command.
+        bytes_out : int
+          Number of bytes read from stdout and stderr of the command.
+        code : int or None
+          Exit code of the command.
+        thread : int, optional
+          Identifier of the thread that started the command.
+        """
+        self.cmd = cmd
+        self.cwd = cwd
+        self.pid = pid
+        self.start = start
+        self.duration = duration
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+        self.code = code
+        self.thread = thread
+
+    def __repr__(self):
+        return f"CommandTrace({self.name!r}, duration={self.duration:.3f})"
+
+    @property
+    def name(self) -> str:
+        """Short name of the command, for summaries
+
+        This is the executable, and for git and git-annex commands the
+        subcommand, e.g. 'git annex find'.
+        """
+        return get_command_name(self.cmd)
+
+    def as_dict(self) -> dict:
+        return {
+            'cmd': self.cmd,
+            'cwd': str(self.cwd) if self.cwd is not None else None,
+            'pid': self.pid,
+            'start': self.start,
+            'duration': self.duration,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'code': self.code,
+        }
+
+
+def get_command_name(cmd) -> str:
+    """Return a short name of a command, see `CommandTrace.name`"""
+    if isinstance(cmd, str):
+        cmd = cmd.split()
+    if not cmd:
+        return ''
+    args = iter(cmd)
+    name = [op.basename(str(next(args)))]
+    if name[0] not in ('git', 'git-annex'):
+        return name[0]
+    for arg in args:
+        arg = str(arg)
+        if arg in ('-c', '-C'):
+            # option with a value
+            next(args, None)
+        elif not arg.startswith('-'):
+            name.append(arg)
+            if arg != 'annex':
+                break
+    return ' '.join(name)
+
+
+def add_trace_consumer(consumer: Callable[[CommandTrace], None]):
+    """Register a callable that is called with every `CommandTrace`
+
+    Consumers are called from the thread that runs a command, after all
+    output of the command was processed. Exceptions raised by consumers
+    are logged and otherwise ignored.
+    """
+    consumers.append(consumer)
+
+
+def remove_trace_consumer(consumer: Callable[[CommandTrace], None]):
+    """Unregister a consumer that was added with `add_trace_consumer()`"""
+    consumers.remove(consumer)
+
+
+def emit_trace(trace: CommandTrace):
+    """Pass a trace to all registered consumers"""
+    for consumer in list(consumers):
+        try:
+            consumer(trace)
+        except Exception as e:
+            lgr.debug("Trace consumer %r failed: %s", consumer, e)
+
+
+def summarize_traces(traces: Iterable[CommandTrace | dict],
+                     top: Optional[int] = 10) -> list[dict]:
+    """Aggregate traces per command name
+
+    Parameters
+    ----------
+    traces : iterable
+      `CommandTrace` instances, or their `as_dict()` representation.
+    top : int, optional
+      Only report this many commands with the largest total duration.
+      All commands are reported if None.
+
+    Returns
+    -------
+    list of dict
+      One dict per command name with the keys 'command', 'count', 'total',
+      'mean', 'max', 'bytes_in', 'bytes_out', and 'failed', sorted by the
+      total duration in descending order.
+    """
+    summary = {}
+    for trace in traces:
+        if isinstance(trace, dict):
+            name = get_command_name(trace['cmd'])
+            duration = trace['duration']
+            bytes_in, bytes_out = trace['bytes_in'], trace['bytes_out']
+            code = trace['code']
+        else:
+            name = trace.name
+            duration = trace.duration
+            bytes_in, bytes_out = trace.bytes_in, trace.bytes_out
+            code = trace.code
+        entry = summary.get(name)
+        if entry is None:
+            entry = summary[name] = dict(
+                command=name, count=0, total=0.0, max=0.0,
+                bytes_in=0, bytes_out=0, failed=0)
+        entry['count'] += 1
+        entry['total'] += duration
+        entry['max'] = max(entry['max'], duration)
+        entry['bytes_in'] += bytes_in
+        entry['bytes_out'] += bytes_out
+        if code:
+            entry['failed'] += 1
+    result = sorted(summary.values(), key=lambda e: e['total'], reverse=True)
+    for entry in result:
+        entry['mean'] = entry['total'] / entry['count']
+    return result[:top] if top is not None else result
+
+
+def read_trace_file(path) -> list[dict]:
+    """Read traces from a file written by `JSONLTraceWriter`"""
+    traces = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                traces.append(json.loads(line))
+    return traces
+
+
+class TraceAggregator(object):
+    """Trace consumer that keeps all traces in memory
+
+    It can be used as a context manager, to register it for the duration
+    of a code block:
+
+        with TraceAggregator() as traces:
+            ds.save()
+        for entry in traces.summary():
+            print(entry['command'], entry['total'])
+    """
+
+    def __init__(self):
+        self.traces: list[CommandTrace] = []
+
+    def __call__(self, trace: CommandTrace):
+        self.traces.append(trace)
+
+    def __enter__(self):
+        add_trace_consumer(self)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        remove_trace_consumer(self)
+
+    def summary(self, top: Optional[int] = 10) -> list[dict]:
+        """Return the aggregated traces, see `summarize_traces()`"""
+        return summarize_traces(self.traces, top=top)
+
+
+class _TraceFileWriter(object):
+    """Base class of trace consumers that append traces to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file: Optional[IO] = open(path, 'a', encoding='utf-8')
+
+    def __call__(self, trace: CommandTrace):
+        record = self._format(trace)
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(record)
+            self._file.flush()
+
+    def _format(self, trace: CommandTrace) -> str:
+        raise NotImplementedError
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class JSONLTraceWriter(_TraceFileWriter):
+    """Trace consumer that appends one JSON record per command to a file
+
+    The records contain the keys of `CommandTrace.as_dict()`.
+    """
+
+    def _format(self, trace):
+        return json.dumps(trace.as_dict()) + '\n'
+
+
+class ChromeTraceWriter(_TraceFileWriter):
+    """Trace consumer that writes the Chrome trace event format
+
+    The file can be loaded into chrome://tracing or https://ui.perfetto.dev.
+    Every command is a complete event ("ph": "X") on the thread that ran it.
+    The closing bracket of the JSON array is optional in this format, and is
+    not written.
+    """
+
+    def __init__(self, path):
+        super().__init__(path)
+        if self._file.tell() == 0:
+            self._file.write('[\n')
+
+    def _format(self, trace):
+        return json.dumps({
+            'name': trace.name,
+            'cat': 'subprocess',
+            'ph': 'X',
+            'ts': int(trace.start * 1e6),
+            'dur': int(trace.duration * 1e6),
+            'pid': os.getpid(),
+            'tid': trace.thread or 0,
+            'args': trace.as_dict(),
+        }) + ',\n'
+
+
+_WRITERS = {
+    'jsonl': JSONLTraceWriter,
+    'chrome': ChromeTraceWriter,
+}
+
+
+def configure_tracing():
+    """Register a trace file writer, if configured
+
+    This is done once, as soon as the configuration is available.
+    """
+    global _configured
+    if _configured:
+        return
+    import datalad  # avoid circular import
+    cfg = getattr(datalad, 'cfg', None)
+    if cfg is None:
+        # the configuration manager itself runs git-config to
+        # load the configuration
+        return
+    _configured = True
+    path = cfg.get('datalad.runtime.trace', None)
+    if not path:
+        return
+    trace_format = cfg.get('datalad.runtime.trace-format', None) or 'jsonl'
+    try:
+        writer = _WRITERS[trace_format](op.expanduser(path))
+    except KeyError:
+        lgr.warning("Unknown subprocess trace format %r, choose from %s",
+                    trace_format, ', '.join(_WRITERS))
+        return
+    except OSError as e:
+        lgr.warning("Cannot write subprocess trace to %s: %s", path, e)
+        return
+    lgr.debug("Writing subprocess trace to %s (%s)", path, trace_format)
+    add_trace_consumer(writer)
+    atexit.register(writer.close)
@@ -15,6 +15,7 @@ from __future__ import annotations
 
 import logging
 from collections import defaultdict
+from collections.abc import Iterator
 from typing import Optional
 
 __docformat__ = "numpy"
@@ -26,6 +27,9 @@ class LineSplitter:
     """
     A line splitter that handles 'streamed content' and is based
     on python's built-in splitlines().
+
+    Only newly received data is split. An unterminated line is kept as a
+    list of pieces, which are only joined once the line is terminated.
     """
     def __init__(self,
                  separator: Optional[str] = None,
@@ -46,7 +50,20 @@ class LineSplitter:
         """
         self.separator = separator
         self.keep_ends = keep_ends
-        self.remaining_data: str | None = None
+        # pieces of the unterminated last line
+        self._pieces: list[str] = []
+
+    @property
+    def remaining_data(self) -> str | None:
+        if not self._pieces:
+            return None
+        if len(self._pieces) > 1:
+            self._pieces[:] = ["".join(self._pieces)]
+        return self._pieces[0]
+
+    @remaining_data.setter
+    def remaining_data(self, value: str | None):
+        self._pieces = [value] if value else []
 
     def process(self,
                 data: str
@@ -60,59 +77,139 @@ class LineSplitter:
         if data == "":
             return []
 
-        # Update remaining data before attempting to split lines.
-        if self.remaining_data is None:
-            self.remaining_data = ""
-        self.remaining_data += data
-
         if self.separator is None:
-            # If no separator was specified, use python's built in
-            # line split wisdom to split on any known line ending.
-            lines_with_ends = self.remaining_data.splitlines(keepends=True)
-            detected_lines = self.remaining_data.splitlines()
-
-            # If the last line is identical in lines with ends and
-            # lines without ends, it was unterminated, remove it
-            # from the list of detected lines and keep it for the
-            # next round
-            if lines_with_ends[-1] == detected_lines[-1]:
-                self.remaining_data = lines_with_ends[-1]
-                del lines_with_ends[-1]
-                del detected_lines[-1]
-            else:
-                self.remaining_data = None
-
-            if self.keep_ends:
-                return lines_with_ends
-            return detected_lines
-
-        else:
-            # Split lines on separator. This will create additional
-            # empty lines if `remaining_data` end with the separator.
-            detected_lines = self.remaining_data.split(self.separator)
-
-            # If replaced data did not end with the separator, it contains an
-            # unterminated line. We save that for the next round. Otherwise,
-            # we mark that we do not have remaining data.
-            if not data.endswith(self.separator):
-                self.remaining_data = detected_lines[-1]
-            else:
-                self.remaining_data = None
-
-            # If replaced data ended with the canonical line ending, we
-            # have an extra empty line in detected_lines. If it did not
-            # end with canonical line ending, we have to remove the
-            # unterminated line.
+            return self._process_line_ends(data)
+        return self._process_separator(data)
+
+    def _process_line_ends(self, data: str) -> list[str]:
+        # If no separator was specified, use python's built in
+        # line split wisdom to split on any known line ending.
+        lines_with_ends = data.splitlines(keepends=True)
+        detected_lines = data.splitlines()
+
+        # If the last line is identical in lines with ends and
+        # lines without ends, it was unterminated, remove it
+        # from the list of detected lines and keep it for the
+        # next round
+        unterminated = None
+        if lines_with_ends[-1] == detected_lines[-1]:
+            unterminated = lines_with_ends.pop()
             del detected_lines[-1]
 
-            if self.keep_ends:
-                return [line + self.separator for line in detected_lines]
-            return detected_lines
+        lines = lines_with_ends if self.keep_ends else detected_lines
+        if lines and self._pieces:
+            # remaining data does not contain a line end, it is the
+            # beginning of the first line
+            self._pieces.append(lines[0])
+            lines[0] = "".join(self._pieces)
+            self._pieces = []
+        if unterminated is not None:
+            self._pieces.append(unterminated)
+        return lines
+
+    def _process_separator(self, data: str) -> list[str]:
+        separator = self.separator
+        if self._pieces and len(separator) > 1:
+            # A separator might span the boundary between remaining data
+            # and new data. Prepend the part of the remaining data that
+            # could contain the beginning of such a separator.
+            last_piece = self._pieces[-1]
+            overlap = len(separator) - 1
+            if separator in last_piece[-overlap:] + data[:overlap]:
+                data = self.remaining_data + data
+                self._pieces = []
+
+        if separator not in data:
+            # Nothing is terminated, keep the data for the next round
+            self._pieces.append(data)
+            return []
+
+        # Split lines on separator. This will create an additional
+        # empty line if `data` ends with the separator, otherwise
+        # the last line is unterminated. We save that for the next round.
+        detected_lines = data.split(separator)
+        unterminated = detected_lines.pop()
+        if self._pieces:
+            self._pieces.append(detected_lines[0])
+            detected_lines[0] = "".join(self._pieces)
+        self._pieces = [unterminated] if unterminated else []
+
+        if self.keep_ends:
+            return [line + separator for line in detected_lines]
+        return detected_lines
 
     def finish_processing(self) -> Optional[str]:
         return self.remaining_data
 
 
+class RecordSplitter:
+    """
+    A splitter for streamed bytes, that splits records on a separator
+
+    In contrast to `LineSplitter`, this class operates on undecoded data.
+    Only newly received data is searched for the separator. An unterminated
+    record is accumulated in a bytearray, and is only copied once it is
+    terminated.
+
+    When splitting output that is to be decoded, the separator must not be
+    able to occur inside of the encoding of a character. This holds for
+    ASCII-separators like NUL or newline, and ASCII-compatible encodings like
+    UTF-8.
+    """
+    def __init__(self,
+                 separator: bytes = b"\n",
+                 keep_ends: bool = False
+                 ):
+        """
+        Parameters
+        ----------
+        separator: bytes
+            The separator to split records on.
+        keep_ends: bool
+            If True, the separator will be contained in the returned records.
+        """
+        assert separator, "separator must not be empty"
+        self.separator = separator
+        self.keep_ends = keep_ends
+        # the unterminated last record
+        self.buffer = bytearray()
+
+    def process(self,
+                data: bytes
+                ) -> Iterator[bytes]:
+        """Add data, and return an iterator over all terminated records"""
+        separator = self.separator
+        buffer = self.buffer
+        if buffer and len(separator) > 1:
+            # A separator might span the boundary between the buffer and
+            # the new data.
+            overlap = len(separator) - 1
+            if separator in buffer[-overlap:] + data[:overlap]:
+                data = bytes(buffer) + data
+                buffer.clear()
+
+        if separator not in data:
+            buffer += data
+            return iter(())
+
+        records = data.split(separator)
+        if buffer:
+            buffer += records[0]
+            records[0] = bytes(buffer)
+            buffer.clear()
+        buffer += records.pop()
+
+        if self.keep_ends:
+            return (record + separator for record in records)
+        return iter(records)
+
+    def finish_processing(self) -> Optional[bytes]:
+        """Return the remaining unterminated record, if any"""
+        remaining = bytes(self.buffer) or None
+        self.buffer.clear()
+        return remaining
+
+
 class AssemblingDecoderMixIn:
     """ Mix in to safely decode data that is delivered in parts
 
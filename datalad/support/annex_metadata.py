@@ -0,0 +1,298 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the DataLad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Bulk reader for git-annex metadata stored in the git-annex branch
+
+`git annex metadata` reports on one file (or key) at a time. For whole
+datasets it is much faster to read the metadata logs (`*.log.met`) straight
+from the git-annex branch: all log files are listed with a single
+`git ls-tree` call, and their content is obtained with a single
+`git cat-file --batch` process. Uncommitted changes in the git-annex journal
+are taken into account as well.
+"""
+
+import logging
+import re
+from base64 import b64decode
+from datetime import (
+    datetime,
+    timezone,
+)
+
+from datalad.runner.coreprotocols import StdOutCapture
+from datalad.runner.protocol import GeneratorMixIn
+from datalad.support.exceptions import CommandError
+
+lgr = logging.getLogger('datalad.support.annex_metadata')
+
+METADATA_LOG_SUFFIX = '.log.met'
+
+
+class _StdOutBytesGenerator(GeneratorMixIn, StdOutCapture):
+    """Generator-runner protocol that yields raw stdout chunks"""
+    def __init__(self):
+        GeneratorMixIn.__init__(self)
+        StdOutCapture.__init__(self)
+
+    def pipe_data_received(self, fd, data):
+        if fd == 1:
+            self.send_result(data)
+        else:
+            StdOutCapture.pipe_data_received(self, fd, data)
+
+
+def _decode_value(value):
+    # values with whitespace, or starting with '!' are stored
+    # base64-encoded with a '!' prefix
+    if value.startswith('!'):
+        return b64decode(value[1:]).decode('utf-8', errors='surrogateescape')
+    return value
+
+
+def _format_timestamp(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime(
+        '%Y-%m-%d@%H-%M-%S')
+
+
+def parse_metadata_log(content, timestamps=False):
+    """Evaluate the content of a git-annex metadata log
+
+    Parameters
+    ----------
+    content : str
+      Content of a `*.log.met` file. Each line has a timestamp, followed
+      by field names, and the values added (`+`) to or removed (`-`) from
+      the respective field at that time.
+    timestamps : bool, optional
+      If True, the output contains a '<field>-lastchanged' key for every
+      metadata field, as well as a 'lastchanged' key with the most recent
+      modification time of any metadata field, in the format used by
+      `git annex metadata`.
+
+    Returns
+    -------
+    dict
+      Mapping of field names to sorted lists of values. Fields without
+      any value are not reported.
+    """
+    changes = []
+    for line in content.splitlines():
+        items = line.split()
+        if not items or not items[0].endswith('s'):
+            continue
+        try:
+            ts = float(items[0][:-1])
+        except ValueError:
+            lgr.debug('Ignoring invalid metadata log line: %r', line)
+            continue
+        changes.append((ts, items[1:]))
+    # log lines are applied in chronological order
+    changes.sort(key=lambda c: c[0])
+
+    fields = {}
+    changed = {}
+    last_change = None
+    for ts, items in changes:
+        field = None
+        for item in items:
+            if item[0] in '+-':
+                if field is None:
+                    continue
+                values = fields.setdefault(field, set())
+                value = _decode_value(item[1:])
+                if item[0] == '+':
+                    values.add(value)
+                else:
+                    values.discard(value)
+                changed[field] = ts
+            else:
+                field = item
+        last_change = ts if last_change is None else max(last_change, ts)
+
+    meta = {k: sorted(v) for k, v in fields.items() if v}
+    if timestamps and meta:
+        for field in list(meta):
+            meta['{}-lastchanged'.format(field)] = [
+                _format_timestamp(changed[field])]
+        meta['lastchanged'] = [_format_timestamp(last_change)]
+    return meta
+
+
+def _iter_cat_file_batch(chunks):
+    """Split the output of `git cat-file --batch` into (sha, content) tuples
+
+    Content is None for objects reported as missing.
+    """
+    buf = bytearray()
+    for chunk in chunks:
+        buf.extend(chunk)
+        while True:
+            header_end = buf.find(b'\n')
+            if header_end < 0:
+                break
+            header = bytes(buf[:header_end]).split()
+            if header[-1] == b'missing':
+                yield header[0].decode(), None
+                del buf[:header_end + 1]
+                continue
+            size = int(header[2])
+            # header, content, and trailing newline must be complete
+            end = header_end + 1 + size
+            if len(buf) < end + 1:
+                break
+            yield header[0].decode(), bytes(buf[header_end + 1:end])
+            del buf[:end + 1]
+
+
+_KEYFILE_UNESCAPE = {'%': '/', '&c': ':', '&s': '%', '&a': '&'}
+
+
+def _key_from_keyfile(name):
+    # log file names in the git-annex branch are escaped keys:
+    # '&' -> '&a', '%' -> '&s', ':' -> '&c', '/' -> '%'
+    return re.sub(r'%|&[acs]', lambda m: _KEYFILE_UNESCAPE[m.group(0)], name)
+
+
+def _key_from_journal_filename(fname):
+    # the journal stores files with their branch path encoded in the file
+    # name: '/' -> '_', '_' -> '__'
+    path = re.sub(r'__|_', lambda m: '_' if m.group(0) == '__' else '/',
+                  fname)
+    return _key_from_keyfile(path.rsplit('/', maxsplit=1)[-1])
+
+
+class AnnexBranchMetadata(object):
+    """Key-based access to all git-annex metadata of a repository
+
+    The content of all metadata logs is read in bulk, and kept in memory
+    for subsequent queries. Queries after the git-annex branch was updated
+    only read the logs that changed since the last query (based on the
+    blob hashes reported by `git ls-tree`).
+    """
+    def __init__(self, repo):
+        """
+        Parameters
+        ----------
+        repo : AnnexRepo
+        """
+        self.repo = repo
+        # hexsha of the git-annex branch state that was read last
+        self._branch_sha = None
+        # branch path -> (blob sha, key)
+        self._blobs = {}
+        # key -> metadata log content
+        self._logs = {}
+        # timestamps flag -> key -> evaluated metadata
+        self._meta = {False: {}, True: {}}
+
+    def _get_branch_sha(self):
+        try:
+            return self.repo.get_hexsha('git-annex')
+        except (CommandError, ValueError):
+            return None
+
+    def _update(self):
+        sha = self._get_branch_sha()
+        if sha == self._branch_sha:
+            return
+        lgr.debug('Reading git-annex metadata logs from %s branch state %s',
+                  self.repo, sha)
+        blobs = {}
+        if sha:
+            for line in self.repo.call_git_items_(
+                    ['ls-tree', '-r', '-z', sha], sep='\0', read_only=True):
+                if not line.endswith(METADATA_LOG_SUFFIX):
+                    continue
+                props, path = line.split('\t', maxsplit=1)
+                blob = props.split()[2]
+                key = _key_from_keyfile(path.rsplit('/', maxsplit=1)[-1][
+                    :-len(METADATA_LOG_SUFFIX)])
+                blobs[path] = (blob, key)
+
+        # drop logs that are gone or changed
+        for path, (blob, key) in self._blobs.items():
+            if blobs.get(path, (None,))[0] != blob:
+                self._logs.pop(key, None)
+                for meta in self._meta.values():
+                    meta.pop(key, None)
+        # read all new or changed logs in one go
+        # identical logs (e.g. from a single metadata call on many files)
+        # share a blob
+        to_read = {}
+        for path, (blob, key) in blobs.items():
+            if blob != self._blobs.get(path, (None,))[0]:
+                to_read.setdefault(blob, []).append(key)
+        if to_read:
+            lgr.debug('Reading %i metadata logs', len(to_read))
+            out = self.repo._git_runner.run(
+                self.repo._git_cmd_prefix + ['cat-file', '--batch'],
+                protocol=_StdOutBytesGenerator,
+                stdin=''.join('{}\n'.format(b) for b in to_read).encode(),
+            )
+            for blob, content in _iter_cat_file_batch(out):
+                if content is None:
+                    continue
+                content = content.decode('utf-8', errors='surrogateescape')
+                for key in to_read[blob]:
+                    self._logs[key] = content
+        self._blobs = blobs
+        self._branch_sha = sha
+
+    def _get_journal_logs(self):
+        # uncommitted metadata changes, e.g. with annex.alwayscommit=false
+        journal_path = self.repo.dot_git / 'annex' / 'journal'
+        if not journal_path.is_dir():
+            return {}
+        return {
+            _key_from_journal_filename(p.name[:-len(METADATA_LOG_SUFFIX)]):
+            p.read_text(encoding='utf-8', errors='surrogateescape')
+            for p in journal_path.iterdir()
+            if p.name.endswith(METADATA_LOG_SUFFIX)
+        }
+
+    def get_metadata(self, keys=None, timestamps=False):
+        """Report metadata for annex keys
+
+        Parameters
+        ----------
+        keys : iterable(str), optional
+          Limit the report to these keys. By default, all keys with
+          metadata are reported.
+        timestamps : bool, optional
+          If True, include modification timestamps (see
+          `parse_metadata_log()`).
+
+        Returns
+        -------
+        dict
+          Mapping of annex keys to field-name/value-list mappings. Keys
+          without metadata are not included.
+        """
+        self._update()
+        journal = self._get_journal_logs()
+        keys = set(self._logs).union(journal) if keys is None else keys
+        evaluated = self._meta[bool(timestamps)]
+        meta = {}
+        for key in keys:
+            if key in journal:
+                # the journal has the complete new state, but the union
+                # of both is evaluated identically
+                fields = parse_metadata_log(
+                    '\n'.join((self._logs.get(key, ''), journal[key])),
+                    timestamps=timestamps)
+            elif key in evaluated:
+                fields = evaluated[key]
+            elif key in self._logs:
+                fields = parse_metadata_log(
+                    self._logs[key], timestamps=timestamps)
+                evaluated[key] = fields
+            else:
+                continue
+            if fields:
+                meta[key] = fields
+        return meta
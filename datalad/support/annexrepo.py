@@ -55,6 +55,7 @@ from datalad.runner.utils import (
     LineSplitter,
 )
 from datalad.support.exceptions import CapturedException
+from datalad.support.annex_metadata import AnnexBranchMetadata
 from datalad.support.annex_utils import (
     _fake_json_for_non_existing,
     _get_non_existing_from_annex_output,
@@ -298,6 +299,8 @@ class AnnexRepo(GitRepo, RepoInterface):
 
         # will be evaluated lazily
         self._n_auto_jobs = None
+        # bulk reader for metadata in the git-annex branch, created on demand
+        self._branch_metadata = None
 
         # Finally, register a finalizer (instead of having a __del__ method).
         # This will be called by garbage collection as well as "atexit". By
@@ -3125,6 +3128,36 @@ class AnnexRepo(GitRepo, RepoInterface):
                 res = batched.proc1(json.dumps({'file': f}))
                 yield _format_response(res)
 
+    def get_metadata_by_key(self, keys=None, timestamps=False):
+        """Query git-annex metadata for annex keys in bulk
+
+        Unlike `get_metadata()`, this does not call `git annex metadata`,
+        but reads all metadata logs from the git-annex branch at once.
+        The result is kept for the lifetime of the repository instance, and
+        later calls only read metadata logs that changed since.
+
+        Parameters
+        ----------
+        keys : iterable(str), optional
+          Annex keys to report on. By default, all keys with metadata are
+          reported.
+        timestamps: bool, optional
+          If True, the output contains a '<metadatakey>-lastchanged'
+          key for every metadata item, reflecting the modification
+          time, as well as a 'lastchanged' key with the most recent
+          modification time of any metadata item.
+
+        Returns
+        -------
+        dict
+          Mapping of annex keys to dictionaries with metadata key/value-list
+          pairs. Keys without any metadata are not included.
+        """
+        if self._branch_metadata is None:
+            self._branch_metadata = AnnexBranchMetadata(self)
+        return self._branch_metadata.get_metadata(
+            keys=keys, timestamps=timestamps)
+
     def set_metadata(
             self, files, reset=None, add=None, init=None,
             remove=None, purge=None, recursive=False):
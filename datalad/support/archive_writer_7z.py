@@ -0,0 +1,420 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+"""Writer for 7z archives without the 7z binary
+
+Only what is needed to create archives for ORA special remotes is supported:
+each file is a separate stream (block), that is either stored as is, or
+compressed with the Deflate method. Alongside an archive, an index with the
+table of contents is written (see `get_index_path()`). It reports where
+the content of each member is located within the archive file, and enables
+appending to the archive without rewriting the existing content.
+"""
+
+import json
+import logging
+import os
+import struct
+import zlib
+
+lgr = logging.getLogger('datalad.support.archive_writer_7z')
+
+_SIGNATURE = b'7z\xbc\xaf\x27\x1c'
+_FORMAT_VERSION = b'\x00\x04'
+SIGNATURE_HEADER_SIZE = 32
+
+# method names as reported by `7z l -slt`, and their codec IDs
+_CODECS = {
+    'Copy': b'\x00',
+    'Deflate': b'\x04\x01\x08',
+}
+
+# property IDs of the 7z header
+_kEnd = b'\x00'
+_kHeader = b'\x01'
+_kMainStreamsInfo = b'\x04'
+_kFilesInfo = b'\x05'
+_kPackInfo = b'\x06'
+_kUnPackInfo = b'\x07'
+_kSubStreamsInfo = b'\x08'
+_kSize = b'\x09'
+_kCRC = b'\x0a'
+_kFolder = b'\x0b'
+_kCodersUnPackSize = b'\x0c'
+_kEmptyStream = b'\x0e'
+_kEmptyFile = b'\x0f'
+_kName = b'\x11'
+
+INDEX_VERSION = 1
+
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
+def get_index_path(archive):
+    """Return the path of the index file of an archive"""
+    return archive.parent / (archive.name + '.toc')
+
+
+def _encode_number(value):
+    # 7z's variable length integers: the number of leading 1-bits in the
+    # first byte is the number of bytes that follow (little endian), the
+    # remaining bits of the first byte are the most significant ones
+    for nbytes in range(8):
+        if value < (1 << (7 * (nbytes + 1))):
+            first = (0xff00 >> nbytes) & 0xff
+            return bytes([first | (value >> (8 * nbytes))]) \
+                + (value & ((1 << (8 * nbytes)) - 1)).to_bytes(nbytes, 'little')
+    return b'\xff' + value.to_bytes(8, 'little')
+
+
+def _encode_bits(bits):
+    # most significant bit first
+    out = bytearray((len(bits) + 7) // 8)
+    for i, bit in enumerate(bits):
+        if bit:
+            out[i // 8] |= 0x80 >> (i % 8)
+    return bytes(out)
+
+
+def _build_header(members):
+    # members: list of (name, size, offset, crc, packed_size, method), with
+    # all non-empty members in the order of their content in the archive
+    streams = [m for m in members if m[1]]
+    header = bytearray(_kHeader)
+    if streams:
+        header += _kMainStreamsInfo
+        # all packed streams directly follow the signature header
+        header += _kPackInfo + _encode_number(0) \
+            + _encode_number(len(streams)) + _kSize
+        for m in streams:
+            header += _encode_number(m[4])
+        header += _kEnd
+        # one folder with a single coder per stream
+        header += _kUnPackInfo + _kFolder + _encode_number(len(streams)) \
+            + b'\x00'
+        for m in streams:
+            codec = _CODECS[m[5]]
+            header += _encode_number(1) + bytes([len(codec)]) + codec
+        header += _kCodersUnPackSize
+        for m in streams:
+            header += _encode_number(m[1])
+        header += _kEnd
+        header += _kSubStreamsInfo + _kCRC + b'\x01'
+        for m in streams:
+            header += struct.pack('<I', int(m[3], 16))
+        header += _kEnd
+        header += _kEnd
+
+    header += _kFilesInfo + _encode_number(len(members))
+    empty = [not m[1] for m in members]
+    if any(empty):
+        bits = _encode_bits(empty)
+        header += _kEmptyStream + _encode_number(len(bits)) + bits
+        # all empty streams are empty files, not directories
+        bits = _encode_bits([True] * sum(empty))
+        header += _kEmptyFile + _encode_number(len(bits)) + bits
+    names = bytearray(b'\x00')
+    for m in members:
+        names += m[0].encode('utf-16-le') + b'\x00\x00'
+    header += _kName + _encode_number(len(names)) + names
+    header += _kEnd
+    header += _kEnd
+    return bytes(header)
+
+
+def _build_signature_header(header_offset, header):
+    start_header = struct.pack(
+        '<QQI',
+        header_offset - SIGNATURE_HEADER_SIZE,
+        len(header),
+        zlib.crc32(header))
+    return _SIGNATURE + _FORMAT_VERSION \
+        + struct.pack('<I', zlib.crc32(start_header)) + start_header
+
+
+def _format_crc(crc):
+    return '{:08X}'.format(crc)
+
+
+def deflate_file(src, dst, level=6):
+    """Compress a file with the Deflate method for `SevenZipWriter`
+
+    Parameters
+    ----------
+    src : Path or str
+      File to compress.
+    dst : Path or str
+      Target file for the compressed content.
+    level : int, optional
+      Compression level (1-9).
+
+    Returns
+    -------
+    tuple
+      Size and CRC (as reported by `7z l -slt`) of the content of `src`.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    size = 0
+    crc = 0
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        while True:
+            chunk = fin.read(COPY_BUFFER_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+            fout.write(compressor.compress(chunk))
+        fout.write(compressor.flush())
+    return size, _format_crc(crc)
+
+
+class SevenZipWriter(object):
+    """Create a new, or append to an existing 7z archive
+
+    The archive is only valid once `close()` was called, which writes the
+    header of the archive and its index. Appending is only possible to
+    archives with a matching index, i.e. such that were created by this
+    class.
+
+    An existing archive remains valid with its previous content until the
+    append is complete: new content is first written after the end of the
+    file. On `close()`, a copy of the previous header is placed after it,
+    the new content is moved to directly follow the existing content, and
+    only then the signature header at the start of the file is updated to
+    point to the new header. If an append fails with an exception before,
+    the appended data is removed again.
+    """
+    def __init__(self, path):
+        """
+        Parameters
+        ----------
+        path : Path
+          Location of the archive. An existing archive is appended to.
+        """
+        self.path = path
+        # name -> [size, offset, crc, packed size, method]
+        self.members = {}
+        self._appending = path.exists()
+        if self._appending:
+            index = read_index(path)
+            if index is None:
+                raise ValueError(
+                    "Cannot append to {}, it has no valid index".format(path))
+            self.members = index
+            self._file = open(path, 'r+b')
+            self._file.seek(0, os.SEEK_END)
+        else:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = open(path, 'w+b')
+            # placeholder, written on close()
+            self._file.write(b'\x00' * SIGNATURE_HEADER_SIZE)
+        # where new content is written to, and where it must end up
+        self._eof = self._file.tell()
+        self._end = max([m[1] + m[3] for m in self.members.values() if m[0]]
+                        + [SIGNATURE_HEADER_SIZE])
+        self._existing = dict(self.members)
+
+    def __contains__(self, name):
+        return name in self.members
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._file.closed:
+            # close() was called already
+            return
+        if exc_type is not None:
+            # drop everything that was added
+            self._file.seek(self._eof)
+            self._file.truncate()
+            self.members = self._existing
+            if self._appending:
+                # the previous header is still in place
+                self._file.close()
+                return
+        self.close()
+
+    def add(self, name, src):
+        """Add the content of file `src` uncompressed as member `name`"""
+        offset = self._file.tell()
+        size = 0
+        crc = 0
+        with open(src, 'rb') as f:
+            while True:
+                chunk = f.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                crc = zlib.crc32(chunk, crc)
+                self._file.write(chunk)
+        self._add_member(name, size, offset, _format_crc(crc), size, 'Copy')
+
+    def add_packed(self, name, packed, size, crc, method):
+        """Add a member with content that was compressed already
+
+        Parameters
+        ----------
+        name : str
+        packed : Path or str
+          File with the compressed content, e.g. from `deflate_file()`.
+        size : int
+          Size of the uncompressed content.
+        crc : str
+          CRC of the uncompressed content (hex).
+        method : str
+          Compression method, e.g. 'Deflate'.
+        """
+        if method not in _CODECS:
+            raise ValueError("Unsupported method: {}".format(method))
+        offset = self._file.tell()
+        with open(packed, 'rb') as f:
+            while True:
+                chunk = f.read(COPY_BUFFER_SIZE)
+                if not chunk:
+                    break
+                self._file.write(chunk)
+        self._add_member(name, size, offset, crc,
+                         self._file.tell() - offset, method)
+
+    def _add_member(self, name, size, offset, crc, packed_size, method):
+        if name in self.members:
+            raise ValueError("{} is already in {}".format(name, self.path))
+        if not size:
+            # no content, no stream
+            offset = crc = packed_size = None
+            method = 'Copy'
+        self.members[name] = [size, offset, crc, packed_size, method]
+
+    def close(self):
+        if self._appending and self.members == self._existing:
+            self._file.close()
+            return
+        try:
+            self._write_header()
+        finally:
+            self._file.close()
+
+    def _write_header(self):
+        eof = self._file.tell()
+        size = eof - self._eof
+        if self._appending:
+            # keep the previous header valid while the new content is moved
+            # to directly follow the existing content
+            previous = self._read_header()
+            self._file.write(previous)
+            self._commit(eof, previous)
+            self._move(self._eof, self._end, size)
+            for name, m in self.members.items():
+                if name not in self._existing and m[0]:
+                    m[1] -= self._eof - self._end
+        # the order of the streams in the header must match the order of
+        # their content
+        members = sorted(
+            ((n, m[0], m[1], m[2], m[3], m[4])
+             for n, m in self.members.items()),
+            key=lambda m: m[2] or 0)
+        header = _build_header(members)
+        header_offset = self._end + size
+        if self._appending and header_offset + len(header) > eof:
+            # must not overwrite the copy of the previous header, anything
+            # in between is ignored by readers
+            header_offset = eof + len(previous)
+        self._file.seek(header_offset)
+        self._file.write(header)
+        self._commit(header_offset, header)
+        self._file.truncate(header_offset + len(header))
+        write_index(self.path, self.members, header_offset + len(header))
+
+    def _read_header(self):
+        self._file.seek(12)
+        offset, size, _ = struct.unpack(
+            '<QQI', self._file.read(SIGNATURE_HEADER_SIZE - 12))
+        self._file.seek(SIGNATURE_HEADER_SIZE + offset)
+        header = self._file.read(size)
+        self._file.seek(0, os.SEEK_END)
+        return header
+
+    def _commit(self, header_offset, header):
+        # make the signature header point to the header, once that one is
+        # on disk
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.seek(0)
+        self._file.write(_build_signature_header(header_offset, header))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _move(self, src, dst, size):
+        # dst < src, copying from the start never overwrites what is yet
+        # to be copied
+        for pos in range(0, size, COPY_BUFFER_SIZE):
+            self._file.seek(src + pos)
+            chunk = self._file.read(min(COPY_BUFFER_SIZE, size - pos))
+            self._file.seek(dst + pos)
+            self._file.write(chunk)
+
+
+def read_index(archive):
+    """Read the index of an archive
+
+    Parameters
+    ----------
+    archive : Path
+
+    Returns
+    -------
+    dict or None
+      Mapping of member names to lists of size, offset (in the archive
+      file), CRC (as hex string), packed size, and compression method.
+      Offset, CRC, and packed size are None for empty members.
+      None, if there is no index, or it does not match the archive.
+    """
+    try:
+        with open(get_index_path(archive)) as f:
+            return parse_index(f.read(), archive.stat().st_size)
+    except OSError as e:
+        lgr.debug("Cannot read index of %s: %s", archive, e)
+        return None
+
+
+def parse_index(content, archive_size):
+    """Evaluate the content of an archive index
+
+    Parameters
+    ----------
+    content : str
+      JSON content of the index file.
+    archive_size : int
+      Size of the archive file. The index is only valid for an archive
+      of the size it records.
+
+    Returns
+    -------
+    dict or None
+      See `read_index()`.
+    """
+    try:
+        index = json.loads(content)
+        if index['version'] != INDEX_VERSION \
+                or index['archive_size'] != archive_size:
+            return None
+        return index['members']
+    except (ValueError, KeyError, TypeError) as e:
+        lgr.debug("Invalid archive index: %s", e)
+        return None
+
+
+def write_index(archive, members, archive_size):
+    index_path = get_index_path(archive)
+    tmp_path = index_path.parent / (index_path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(version=INDEX_VERSION,
+                       archive_size=archive_size,
+                       members=members), f)
+    os.replace(tmp_path, index_path)
@@ -11,11 +11,19 @@
 """
 
 import hashlib
+import json
 import os
+import posixpath
+import shutil
+import subprocess
+import tarfile
 import tempfile
 import string
 import random
 import logging
+import zipfile
+import zlib
+from contextlib import contextmanager
 
 from datalad.support.path import (
     join as opj,
@@ -29,7 +37,10 @@ from datalad.support.path import (
     sep as opsep,
 )
 
-from datalad.support.locking import lock_if_check_fails
+from datalad.support.locking import (
+    InterProcessLock,
+    lock_if_check_fails,
+)
 from datalad.support.external_versions import external_versions
 from datalad.consts import ARCHIVES_TEMP_DIR
 from datalad.utils import (
@@ -111,6 +122,35 @@ def _get_cached_filename(archive):
     return archive_cached
 
 
+def _get_archive_type(archive):
+    """Determine how members can be read from an archive without extraction
+
+    Returns
+    -------
+    {'zip', 'tar', 'tar-stream', '7z'} or None
+      'tar' is an uncompressed tarball, whose members can be read at their
+      offset in the file, 'tar-stream' is a compressed one, which needs to
+      be decompressed up to the member. None for anything else.
+    """
+    with open(archive, 'rb') as f:
+        head = f.read(512)
+    if head.startswith(b'7z\xbc\xaf\x27\x1c'):
+        return '7z'
+    if head.startswith(b'PK') and zipfile.is_zipfile(archive):
+        return 'zip'
+    if not tarfile.is_tarfile(archive):
+        return None
+    try:
+        with tarfile.open(archive, 'r:'):
+            return 'tar'
+    except tarfile.ReadError:
+        return 'tar-stream'
+
+
+def _normalize_member_name(name):
+    return posixpath.normpath(name.replace(os.sep, '/'))
+
+
 def _get_random_id(size=6, chars=string.ascii_uppercase + string.digits):
     """Return a random ID composed from digits and uppercase letters
 
@@ -122,6 +162,10 @@ def _get_random_id(size=6, chars=string.ascii_uppercase + string.digits):
 class ArchivesCache(object):
     """Cache to maintain extracted archives
 
+    The total size of all extracted archives in the cache is bounded. Once
+    it exceeds the limit, least recently used archives are removed from the
+    cache, unless they are in use (see `ExtractedArchive.in_use()`).
+
     Parameters
     ----------
     toppath : str
@@ -129,12 +173,17 @@ class ArchivesCache(object):
       If not provided -- random tempdir is used
     persistent : bool, optional
       Passed over into generated ExtractedArchives
+    max_size : int, optional
+      Maximum total size of extracted archives in bytes, 0 for no limit. By
+      default, the 'datalad.archives.cachesize' configuration is used.
     """
-    # TODO: make caching persistent across sessions/runs, with cleanup
     # IDEA: extract under .git/annex/tmp so later on annex unused could clean it
     #       all up
-    def __init__(self, toppath=None, persistent=False):
+    def __init__(self, toppath=None, persistent=False, max_size=None):
         self._toppath = toppath
+        if max_size is None:
+            max_size = cfg.obtain('datalad.archives.cachesize') * 1024 ** 2
+        self.max_size = max_size
         if toppath:
             path = opj(toppath, ARCHIVES_TEMP_DIR)
             if not persistent:
@@ -228,13 +277,56 @@ class ArchivesCache(object):
             self._archives[archive] = \
                 ExtractedArchive(archive,
                                  opj(self.path, _get_cached_filename(archive)),
-                                 persistent=self.persistent)
+                                 persistent=self.persistent,
+                                 on_extract=self.evict)
 
         return self._archives[archive]
 
     def __getitem__(self, archive):
         return self.get_archive(archive)
 
+    def evict(self):
+        """Remove least recently used extracted archives exceeding the size limit
+
+        Extracted archives that are in use are kept.
+
+        Returns
+        -------
+        list
+          Paths of the removed extractions.
+        """
+        if not self.max_size:
+            return []
+        extracted = []
+        for fname in os.listdir(self.path):
+            if not fname.endswith(ExtractedArchive.STAMP_SUFFIX):
+                continue
+            earchive = ExtractedArchive(
+                None,
+                opj(self.path, fname[:-len(ExtractedArchive.STAMP_SUFFIX)]),
+                persistent=True)
+            try:
+                extracted.append(
+                    (os.stat(earchive.stamp_path).st_mtime,
+                     earchive.extracted_size,
+                     earchive))
+            except OSError as e:
+                # removed in the meantime
+                lgr.debug("Ignoring %s: %s", earchive.path, e)
+        total = sum(size for _, size, _ in extracted)
+        evicted = []
+        # least recently used first
+        for _, size, earchive in sorted(extracted, key=lambda x: x[0]):
+            if total <= self.max_size:
+                break
+            if earchive.remove_unused():
+                total -= size
+                evicted.append(earchive.path)
+        if evicted:
+            lgr.debug("Removed %i extracted archives from %s to stay within "
+                      "%i bytes", len(evicted), self.path, self.max_size)
+        return evicted
+
     def __delitem__(self, archive):
         archive = self._get_normalized_archive_path(archive)
         self._archives[archive].clean()
@@ -255,9 +347,17 @@ class ExtractedArchive(object):
 
     # suffix to use for a stamp so we could guarantee that extracted archive is
     STAMP_SUFFIX = '.stamp'
+    # suffix of the index with the locations of members within the archive
+    INDEX_SUFFIX = '.index'
+    # suffix of the directory with a lock file per user of the extraction
+    USERS_SUFFIX = '.users'
 
-    def __init__(self, archive, path=None, persistent=False):
+    # user lock files held by this process
+    _own_users = set()
+
+    def __init__(self, archive, path=None, persistent=False, on_extract=None):
         self._archive = archive
+        self._on_extract = on_extract
         # TODO: bad location for extracted archive -- use tempfile
         if not path:
             path = tempfile.mktemp(**get_tempfile_kwargs(prefix=_get_cached_filename(archive)))
@@ -267,6 +367,8 @@ class ExtractedArchive(object):
                                "persist" % path)
         self._persistent = persistent
         self._path = path
+        # member name -> [offset, size], see _get_member_index()
+        self._index = None
 
     def __repr__(self):
         return "%s(%r, path=%r)" % (self.__class__.__name__, self._archive, self.path)
@@ -280,7 +382,8 @@ class ExtractedArchive(object):
 
         for path, name in [
             (self._path, 'cache'),
-            (self.stamp_path, 'stamp file')
+            (self.stamp_path, 'stamp file'),
+            (self.index_path, 'member index'),
         ]:
             if exists(path):
                 if (not self._persistent) or force:
@@ -299,6 +402,132 @@ class ExtractedArchive(object):
     def stamp_path(self):
         return self._path + self.STAMP_SUFFIX
 
+    @property
+    def index_path(self):
+        return self._path + self.INDEX_SUFFIX
+
+    @property
+    def users_path(self):
+        return self._path + self.USERS_SUFFIX
+
+    @property
+    def extracted_size(self):
+        """Size of the extracted content in bytes, as recorded after extraction
+        """
+        with open(self.stamp_path) as f:
+            lines = f.read().splitlines()
+        if len(lines) > 1:
+            return int(lines[1])
+        # extracted by an older version
+        return self._get_tree_size()
+
+    def _get_tree_size(self):
+        return sum(
+            os.lstat(opj(root, name)).st_size
+            for root, dirs, files in os.walk(self.path)
+            for name in files)
+
+    @property
+    def _lock_path(self):
+        return self._path + '.lck'
+
+    @property
+    def _extract_lock_path(self):
+        # as created by lock_if_check_fails() in assure_extracted()
+        return self._path + '.extract-lck'
+
+    @contextmanager
+    def _lock(self):
+        # lock for any operation changing the state of the extraction.
+        # The lock file is removed along with the extraction (see
+        # remove_unused()), a lock on a file that was removed while waiting
+        # for it is no lock.
+        while True:
+            lock = InterProcessLock(self._lock_path)
+            lock.acquire()
+            try:
+                if os.fstat(lock.lockfile.fileno()).st_ino \
+                        == os.stat(self._lock_path).st_ino:
+                    break
+            except OSError:
+                pass
+            lock.release()
+        try:
+            yield
+        finally:
+            lock.release()
+
+    @contextmanager
+    def in_use(self):
+        """Protect the extracted archive from removal while in use
+
+        Any number of users, in any number of processes, can use the same
+        extraction at the same time. Users are tracked with a lock file
+        each, such that users that ended without deregistering are detected.
+        """
+        with self._lock():
+            os.makedirs(self.users_path, exist_ok=True)
+            lock_path = opj(
+                self.users_path,
+                '{}-{}'.format(os.getpid(), _get_random_id()))
+            lock = InterProcessLock(lock_path)
+            lock.acquire()
+        # locks of the same process do not block each other
+        self._own_users.add(lock_path)
+        try:
+            yield self
+        finally:
+            self._own_users.discard(lock_path)
+            lock.release()
+            unlink(lock_path)
+
+    def _has_users(self):
+        if not exists(self.users_path):
+            return False
+        in_use = False
+        for fname in os.listdir(self.users_path):
+            path = opj(self.users_path, fname)
+            if path in self._own_users:
+                in_use = True
+                continue
+            lock = InterProcessLock(path)
+            if lock.acquire(blocking=False):
+                # its process is gone
+                lock.release()
+                unlink(path)
+            else:
+                in_use = True
+        return in_use
+
+    def remove_unused(self):
+        """Remove the extracted archive, unless it is in use
+
+        Returns
+        -------
+        bool
+          Whether it was removed.
+        """
+        with self._lock():
+            if self._has_users():
+                return False
+            extract_lock = InterProcessLock(self._extract_lock_path)
+            if not extract_lock.acquire(blocking=False):
+                # being extracted right now
+                return False
+            try:
+                lgr.debug("Removing extracted %s under %s",
+                          self._archive or 'archive', self.path)
+                # the stamp first, so no one considers it extracted anymore,
+                # the lock files last
+                for path in (self.stamp_path, self.path, self.index_path,
+                             self.users_path, self._extract_lock_path,
+                             self._lock_path):
+                    if exists(path):
+                        (rmtree if isdir(path) else unlink)(path)
+            finally:
+                extract_lock.release()
+        return True
+
     @property
     def is_extracted(self):
         return exists(self.path) and exists(self.stamp_path) \
@@ -316,7 +545,21 @@ class ExtractedArchive(object):
         ) as (check, lock):
             if lock:
                 assert not check
-                self._extract_archive(path)
+                # the extraction lock file might have been removed (see
+                # remove_unused()) while waiting for it
+                with self._lock():
+                    extracted = not self.is_extracted
+                    if extracted:
+                        self._extract_archive(path)
+            else:
+                extracted = False
+                # record the access for the LRU eviction
+                try:
+                    os.utime(self.stamp_path)
+                except OSError as e:
+                    lgr.debug("Could not record access to %s: %s", path, e)
+        if extracted and self._on_extract:
+            self._on_extract()
         return path
 
     def _extract_archive(self, path):
@@ -341,9 +584,10 @@ class ExtractedArchive(object):
         # lgr.debug("Adjusting permissions to R/O for the extracted content")
         # rotree(path)
         assert (exists(path))
-        # create a stamp
+        # create a stamp, with the size of the extracted content
         with open(self.stamp_path, 'wb') as f:
-            f.write(ensure_bytes(self._archive))
+            f.write(ensure_bytes(
+                '{}\n{}'.format(self._archive, self._get_tree_size())))
         # assert that stamp mtime is not older than archive's directory
         assert (self.is_extracted)
 
@@ -415,6 +659,153 @@ class ExtractedArchive(object):
                 return None
         return leading if leading is None else opj(*leading)
 
+    def copy_member(self, afile, dst):
+        """Copy the content of `afile` into `dst` without extracting the archive
+
+        Only the requested member is read from the archive, if the archive
+        supports random access to it: members of uncompressed tarballs and
+        uncompressed members of 7z archives at their location in the archive
+        file (see `_get_member_index()`), members of zip archives with
+        Python's `zipfile`. The content of 7z members is verified with the
+        CRC recorded in the archive. Members of compressed tarballs and compressed
+        members of 7z archives can only be found by decompressing anything
+        before them. Reading several of them one by one would decompress the
+        archive over and over again, so the archive is to be extracted once
+        instead.
+
+        Parameters
+        ----------
+        afile : str
+          Path of the file within the archive.
+        dst : str
+          Target file.
+
+        Returns
+        -------
+        bool
+          False if the member cannot be read directly, because of the type
+          of the archive, or the type of the member, or if its content does
+          not match its CRC. Extraction of the entire archive is needed then.
+        """
+        name = _normalize_member_name(afile)
+        atype = _get_archive_type(self._archive)
+        lgr.debug("Reading %s from %s archive %s",
+                  name, atype, self._archive)
+        if atype == 'zip':
+            with zipfile.ZipFile(self._archive) as archive:
+                try:
+                    src = archive.open(name)
+                except KeyError:
+                    return False
+                with src, open(dst, 'wb') as f:
+                    shutil.copyfileobj(src, f)
+            return True
+        elif atype in ('tar', '7z'):
+            member = (self._get_member_index(atype) or {}).get(name)
+            if member is None:
+                return False
+            offset, size, crc = member
+            if offset is None:
+                # compressed member of a 7z archive
+                return False
+            checksum = 0
+            with open(self._archive, 'rb') as src, open(dst, 'wb') as f:
+                src.seek(offset)
+                while size:
+                    chunk = src.read(min(size, 1024 ** 2))
+                    if not chunk:
+                        raise IOError(
+                            "Unexpected end of archive {}".format(
+                                self._archive))
+                    if crc is not None:
+                        checksum = zlib.crc32(chunk, checksum)
+                    f.write(chunk)
+                    size -= len(chunk)
+            if crc is not None and int(crc, 16) != checksum:
+                lgr.debug("CRC mismatch of %s in %s, not using its content",
+                          name, self._archive)
+                os.unlink(dst)
+                return False
+            return True
+        return False
+
+    def _get_member_index(self, atype):
+        """Return the locations of the members of an uncompressed archive
+
+        The index is built once per archive, and kept next to the
+        extraction cache for as long as the archive is not modified.
+
+        Returns
+        -------
+        dict or None
+          Mapping of member names to [offset, size, crc] lists. The offset is
+          None for members that have to be extracted with 7z. The CRC (hex)
+          is only known for members of 7z archives. None, if there is no
+          index for the archive.
+        """
+        stat = os.stat(self._archive)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        if self._index and self._index[0] == signature:
+            return self._index[1]
+        index = None
+        try:
+            with open(self.index_path) as f:
+                cached = json.load(f)
+            # indexes of earlier versions lack CRCs
+            if cached['signature'] == signature and all(
+                    len(m) == 3 for m in cached['members'].values()):
+                index = cached['members']
+        except (OSError, ValueError, KeyError) as e:
+            lgr.debug("No member index for %s: %s", self._archive, e)
+        if index is None:
+            index = self._build_tar_index() if atype == 'tar' \
+                else self._build_7z_index()
+            if index is None:
+                return None
+            try:
+                tmp_path = '{}.tmp{}'.format(self.index_path, os.getpid())
+                with open(tmp_path, 'w') as f:
+                    json.dump(dict(signature=signature, members=index), f)
+                os.replace(tmp_path, self.index_path)
+            except OSError as e:
+                lgr.debug("Could not store member index of %s: %s",
+                          self._archive, e)
+        self._index = (signature, index)
+        return index
+
+    def _build_tar_index(self):
+        index = {}
+        links = {}
+        with tarfile.open(self._archive, 'r:') as archive:
+            # only headers are read, content is skipped
+            for member in archive:
+                name = _normalize_member_name(member.name)
+                if member.isreg() and not member.issparse():
+                    index[name] = [member.offset_data, member.size, None]
+                elif member.islnk():
+                    links[name] = _normalize_member_name(member.linkname)
+        for name, target in links.items():
+            if target in index:
+                index[name] = index[target]
+        return index
+
+    def _build_7z_index(self):
+        if not external_versions['cmd:7z']:
+            return None
+        # the listing format is shared with the ORA special remote, which
+        # reads from 7z archives in the same way
+        from datalad.distributed.ora_remote import _parse_7z_listing
+        listing = subprocess.run(
+            ['7z', 'l', '-slt', self._archive],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        ).stdout.decode()
+        return {
+            _normalize_member_name(name): [offset, size, crc]
+            for name, (size, offset, crc) in _parse_7z_listing(listing).items()
+        }
+
     def get_extracted_file(self, afile):
         lgr.debug(u"Requested file {afile} from archive {self._archive}".format(**locals()))
         # TODO: That could be a good place to provide "compatibility" layer if
@@ -9,6 +9,7 @@
 """Simple constructs to be used as caches
 """
 
+import threading
 from collections import OrderedDict
 
 from functools import lru_cache
@@ -31,3 +32,69 @@ class DictCache(OrderedDict):
         if self.size_limit is not None:
             while len(self) > self.size_limit:
                 self.popitem(last=False)
+
+
+class SizedLRUCache(object):
+    """A least-recently-used cache bounded by the total size of its values
+
+    Each value is stored together with its (estimated) size in bytes.
+    Whenever the sum of all sizes exceeds `size_limit`, the least recently
+    accessed entries are expunged. A value that is larger than the limit
+    by itself is never stored.
+
+    All methods are thread-safe.
+    """
+    def __init__(self, size_limit):
+        self.size_limit = size_limit
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        """Return the value for `key`, and mark it as most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value, size):
+        """Store `value` under `key` with a given `size` in bytes
+
+        Returns
+        -------
+        bool
+          Whether the value was stored.
+        """
+        with self._lock:
+            self._discard(key)
+            if size > self.size_limit:
+                return False
+            self._entries[key] = (value, size)
+            self.size += size
+            while self.size > self.size_limit:
+                _, (_, dropped_size) = self._entries.popitem(last=False)
+                self.size -= dropped_size
+            return True
+
+    def discard(self, key):
+        """Remove `key` from the cache, if present"""
+        with self._lock:
+            self._discard(key)
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
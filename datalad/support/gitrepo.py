@@ -36,6 +36,7 @@ from os.path import (
 )
 
 import datalad.utils as ut
+from datalad import cfg as dlcfg
 from datalad import ssh_manager
 from datalad.cmd import (
     BatchedCommand,
@@ -93,7 +94,10 @@ from .network import (
     PathRI,
     is_ssh,
 )
-from .path import get_parent_paths
+from .path import (
+    get_entry_types,
+    get_parent_paths,
+)
 
 # shortcuts
 _curdirsep = curdir + sep
@@ -901,6 +905,7 @@ class GitRepo(CoreGitRepo):
                 sanity_checks=create_sanity_checks,
                 init_options=from_cmdline + to_options(**git_opts),
             )
+            self.configure_fsmonitor()
 
         # with DryRunProtocol path might still not exist
         if exists(self.path):
@@ -1037,6 +1042,7 @@ class GitRepo(CoreGitRepo):
 
         # get ourselves a repository instance
         gr = cls(path, *args, **kwargs)
+        gr.configure_fsmonitor()
         if fix_annex:
             # cheap check whether we deal with an AnnexRepo - we can't check the class of `gr` itself, since we then
             # would need to import our own subclass
@@ -1336,6 +1342,31 @@ class GitRepo(CoreGitRepo):
         lgr.debug("Enabling fake dates")
         self.config.set("datalad.fake-dates", "true")
 
+    def configure_fsmonitor(self):
+        """Configure a file system monitor, if requested by configuration
+
+        The value of 'datalad.repo.fsmonitor' is assigned to Git's
+        'core.fsmonitor', and Git's untracked cache is enabled. This is done
+        for any repository that is created or cloned.
+        """
+        # a new repository has no configuration of its own yet, no need
+        # to load it
+        fsmonitor = dlcfg.get('datalad.repo.fsmonitor', None)
+        if not fsmonitor:
+            return
+        lgr.debug("Enabling file system monitor %r", fsmonitor)
+        self.config.set('core.fsmonitor', fsmonitor, scope='local',
+                        reload=False)
+        self.config.set('core.untrackedCache', 'true', scope='local')
+
+    @property
+    def fsmonitor_enabled(self):
+        """Is the repository configured to use a file system monitor?
+        """
+        fsmonitor = self.config.get('core.fsmonitor', None)
+        return bool(fsmonitor) and \
+            fsmonitor.lower() not in ('false', 'no', 'off', '0')
+
     @property
     def fake_dates_enabled(self):
         """Is the repository configured to use fake dates?
@@ -2651,7 +2682,8 @@ class GitRepo(CoreGitRepo):
                         attrline += ' {}={}'.format(a, val)
                 f.write('{}\n'.format(attrline))
 
-    def get_content_info(self, paths=None, ref=None, untracked='all'):
+    def get_content_info(self, paths=None, ref=None, untracked='all',
+                         _untracked_paths=None):
         """Get identifier and type information from repository content.
 
         This is simplified front-end for `git ls-files/tree`.
@@ -2679,6 +2711,10 @@ class GitRepo(CoreGitRepo):
           'no': no untracked files are reported; 'normal': untracked files
           and entire untracked directories are reported as such; 'all': report
           individual files even in fully untracked directories.
+        _untracked_paths : list, optional
+          Untracked paths relative to the repository root, as reported by
+          `git ls-files -o` for the `untracked` mode. If given, they are not
+          queried again (internal use by `diffstatus()`).
 
         Returns
         -------
@@ -2742,7 +2778,10 @@ class GitRepo(CoreGitRepo):
             # crap from contaminating untracked file reports
             cmd = ['ls-files', '--stage', '-z']
             # untracked report mode, using labels from `git diff` option style
-            if untracked == 'all':
+            if _untracked_paths is not None:
+                # untracked content is already known
+                pass
+            elif untracked == 'all':
                 cmd += ['--exclude-standard', '-o']
             elif untracked == 'normal':
                 cmd += ['--exclude-standard', '-o', '--directory', '--no-empty-directory']
@@ -2759,24 +2798,24 @@ class GitRepo(CoreGitRepo):
                 r'(?P<type>[0-9]+) ([a-z]*) (?P<sha>[^ ]*) [\s]*(?P<size>[0-9-]+)\t(?P<fname>.*)$')
 
         lgr.debug('Query repo: %s', cmd)
+        lines = self.call_git_items_(
+            cmd,
+            files=posix_paths,
+            expect_fail=True,
+            read_only=True,
+            sep='\0')
+        if _untracked_paths:
+            # like `ls-files`, report untracked content first
+            lines = chain(_untracked_paths, lines)
         try:
-            stdout = self.call_git(
-                cmd,
-                files=posix_paths,
-                expect_fail=True,
-                read_only=True)
+            # records are processed as they arrive
+            self._get_content_info_line_helper(ref, info, lines, props_re)
         except CommandError as exc:
             if "fatal: Not a valid object name" in exc.stderr:
                 raise InvalidGitReferenceError(ref)
             raise
         lgr.debug('Done query repo: %s', cmd)
 
-        self._get_content_info_line_helper(
-            ref,
-            info,
-            stdout.split('\0'),
-            props_re)
-
         lgr.debug('Done %s.get_content_info(...)', self)
         return info
 
@@ -2788,6 +2827,8 @@ class GitRepo(CoreGitRepo):
             '120000': 'symlink',
             '160000': 'dataset',
         }
+        # untracked paths, whose type is determined after all output is read
+        untracked = {}
         for line in lines:
             if not line:
                 continue
@@ -2803,11 +2844,17 @@ class GitRepo(CoreGitRepo):
                     lgr.debug("Filtering out .git/ file: %s", line)
                     continue
                 # not known to Git, but Git always reports POSIX
-                path = ut.PurePosixPath(line)
+                path = line
                 inf['gitshasum'] = None
+                if line.endswith('/'):
+                    # Git reports untracked directories (with --directory)
+                    # and nested repositories with a trailing slash
+                    inf['type'] = 'directory'
+                else:
+                    untracked[line] = inf
             else:
                 # again Git reports always in POSIX
-                path = ut.PurePosixPath(props.group('fname'))
+                path = props.group('fname')
 
             # revisit the file props after this path has not been rejected
             if props:
@@ -2821,12 +2868,14 @@ class GitRepo(CoreGitRepo):
             # join item path with repo path to get a universally useful
             # path representation with auto-conversion and tons of other
             # stuff
-            path = self.pathobj.joinpath(path)
-            if 'type' not in inf:
-                # be nice and assign types for untracked content
-                inf['type'] = 'symlink' if path.is_symlink() \
-                    else 'directory' if path.is_dir() else 'file'
-            info[path] = inf
+            info[self.pathobj.joinpath(path)] = inf
+
+        if untracked:
+            # be nice and assign types for untracked content, listing
+            # directories rather than querying each path
+            for path, path_type in get_entry_types(
+                    self.path, untracked).items():
+                untracked[path]['type'] = path_type
 
     def status(self, paths=None, untracked='all', eval_submodule_state='full'):
         """Simplified `git status` equivalent.
@@ -2949,6 +2998,16 @@ class GitRepo(CoreGitRepo):
         # value, those are cheap and possibly useful to a consumer
         # we need (at most) three calls to git
         if to is None:
+            worktree_changes = None
+            if paths is None and self.fsmonitor_enabled:
+                # a file system monitor is only used by `git status`, ask it
+                # for all modifications at once
+                key = _get_cache_key('wt', paths, None, untracked)
+                if key in _cache:
+                    worktree_changes = _cache[key]
+                else:
+                    worktree_changes = self._get_worktree_changes(untracked)
+                    _cache[key] = worktree_changes
             # everything we know about the worktree, including os.stat
             # for each file
             key = _get_cache_key('ci', paths, None, untracked)
@@ -2956,13 +3015,18 @@ class GitRepo(CoreGitRepo):
                 to_state = _cache[key]
             else:
                 to_state = self.get_content_info(
-                    paths=paths, ref=None, untracked=untracked)
+                    paths=paths, ref=None, untracked=untracked,
+                    _untracked_paths=worktree_changes[1]
+                    if worktree_changes else None)
                 _cache[key] = to_state
             # we want Git to tell us what it considers modified and avoid
             # reimplementing logic ourselves
             key = _get_cache_key('mod', paths, None)
             if key in _cache:
                 modified = _cache[key]
+            elif worktree_changes:
+                modified = worktree_changes[0]
+                _cache[key] = modified
             else:
                 # from Git 2.31.0 onwards ls-files has --deduplicate
                 # by for backward compatibility keep doing deduplication here
@@ -3094,6 +3158,50 @@ class GitRepo(CoreGitRepo):
         else:
             return status
 
+    def _get_worktree_changes(self, untracked):
+        """Query modified and untracked worktree content via `git status`
+
+        In contrast to `git ls-files`, `git status` uses a configured file
+        system monitor and the untracked cache, and only inspects content
+        that changed since its last run. To achieve this, it updates the
+        index, hence it is not a read-only operation.
+
+        Parameters
+        ----------
+        untracked : {'no', 'normal', 'all'}
+          See `get_content_info()`.
+
+        Returns
+        -------
+        (set, list)
+          Paths of content that is modified or deleted in the worktree,
+          matching the report of `git ls-files -m -d`, and untracked
+          paths relative to the repository root, matching the report of
+          `git ls-files -o` in the given `untracked` mode.
+        """
+        if untracked not in ('no', 'normal', 'all'):
+            raise ValueError(
+                'unknown value for `untracked`: {}'.format(untracked))
+        modified = set()
+        untracked_paths = []
+        for item in self.call_git_items_(
+                ['status', '--porcelain', '-z', '--no-renames',
+                 # submodule worktrees are inspected by diffstatus()
+                 '--ignore-submodules=dirty',
+                 '--untracked-files={}'.format(untracked)],
+                sep='\0',
+                # writes the refreshed index and the untracked cache
+                read_only=False):
+            if not item:
+                continue
+            # 'XY PATH', with Y being the worktree state
+            state, path = item[:2], item[3:]
+            if state == '??':
+                untracked_paths.append(path)
+            elif state[1] != ' ':
+                modified.add(self.pathobj.joinpath(path))
+        return modified, untracked_paths
+
     def _diffstatus_get_state_props(self, f, from_state, to_state,
                                     against_commit,
                                     modified_in_worktree,
@@ -3606,6 +3714,7 @@ class GitRepo(CoreGitRepo):
         # first gather info from all datasets in read-only fashion, and then
         # update index, .gitmodules and .git/config at once
         info = []
+        new_submodules = []
         for path in paths:
             rpath = str(path.relative_to(self.pathobj).as_posix())
             subm = repo_from_path(path)
@@ -3622,56 +3731,67 @@ class GitRepo(CoreGitRepo):
                     message=('cannot add subdataset %s with no commits', subm),
                     logger=lgr)
                 continue
-            # make an attempt to configure a submodule source URL based on the
-            # discovered remote configuration
-            remote, branch = subm.get_tracking_branch()
-            url = subm.get_remote_url(remote) if remote else None
-            if url is None:
-                url = './{}'.format(rpath)
-            subm_id = subm.config.get('datalad.dataset.id', None)
-            info.append(
-                dict(
-                     # if we have additional information on this path, pass it on.
-                     # if not, treat it as an untracked directory
-                     paths[path] if isinstance(paths, dict)
-                     else dict(type='directory', state='untracked'),
-                     path=path, rpath=rpath, commit=subm_commit, id=subm_id,
-                     url=url))
+            i = dict(
+                # if we have additional information on this path, pass it on.
+                # if not, treat it as an untracked directory
+                paths[path] if isinstance(paths, dict)
+                else dict(type='directory', state='untracked'),
+                path=path, rpath=rpath, commit=subm_commit)
+            # only write the .gitmodules/.config changes when this is not yet
+            # a subdataset
+            # TODO: we could update the URL, and branch info at this point,
+            # even for previously registered subdatasets
+            if i['type'] != 'dataset' or i['state'] == 'untracked':
+                # make an attempt to configure a submodule source URL based on
+                # the discovered remote configuration
+                remote, branch = subm.get_tracking_branch()
+                url = subm.get_remote_url(remote) if remote else None
+                if url is None:
+                    url = './{}'.format(rpath)
+                new_submodules.append(dict(
+                    rpath=rpath, url=url,
+                    id=subm.config.get('datalad.dataset.id', None)))
+            info.append(i)
+
+        if not info:
+            return
 
         # bypass any convenience or safe-manipulator for speed reasons
         # use case: saving many new subdatasets in a single run
-        with (self.pathobj / '.gitmodules').open('a') as gmf, \
-             (self.pathobj / '.git' / 'config').open('a') as gcf:
-            for i in info:
-                # we update the subproject commit unconditionally
-                self.call_git([
-                    'update-index', '--add', '--replace', '--cacheinfo', '160000',
-                    i['commit'], i['rpath']
-                ])
-                # only write the .gitmodules/.config changes when this is not yet
-                # a subdataset
-                # TODO: we could update the URL, and branch info at this point,
-                # even for previously registered subdatasets
-                if i['type'] != 'dataset' or (
-                        i['type'] == 'dataset' and i['state'] == 'untracked'):
+        if new_submodules:
+            with (self.pathobj / '.gitmodules').open('a') as gmf, \
+                 (self.pathobj / '.git' / 'config').open('a') as gcf:
+                for i in new_submodules:
                     gmprops = dict(path=i['rpath'], url=i['url'])
                     if i['id']:
                         gmprops['datalad-id'] = i['id']
                     write_config_section(
                         gmf, 'submodule', i['rpath'], gmprops)
                     write_config_section(
-                        gcf, 'submodule', i['rpath'], dict(active='true', url=i['url']))
-
-                # This mirrors the result structure yielded for
-                # to_stage_submodules below.
-                yield get_status_dict(
-                    action='add',
-                    refds=self.pathobj,
-                    type='dataset',
-                    key=None,
-                    path=i['path'],
-                    status='ok',
-                    logger=lgr)
+                        gcf, 'submodule', i['rpath'],
+                        dict(active='true', url=i['url']))
+
+        # we update the subproject commits unconditionally, all with a single
+        # git call. Like `update-index --add --replace --cacheinfo`, this
+        # replaces any tracked content underneath a submodule path.
+        self._call_git(
+            ['update-index', '-z', '--index-info'],
+            stdin=b''.join(
+                b'160000 %s\t%s\0' % (i['commit'].encode(),
+                                       os.fsencode(i['rpath']))
+                for i in info))
+
+        for i in info:
+            # This mirrors the result structure yielded for
+            # to_stage_submodules below.
+            yield get_status_dict(
+                action='add',
+                refds=self.pathobj,
+                type='dataset',
+                key=None,
+                path=i['path'],
+                status='ok',
+                logger=lgr)
 
 
 def _get_save_status_state(status):
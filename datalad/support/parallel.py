@@ -20,7 +20,10 @@ import uuid
 
 from collections import defaultdict
 from queue import Queue, Empty
-from threading import Thread
+from threading import (
+    Event,
+    Thread,
+)
 
 from . import ansi_colors as colors
 from ..log import log_progress
@@ -146,7 +149,13 @@ class ProducerConsumer:
         safe_to_consume: callable, optional
           A callable which gets a dict of all known futures and current item from producer.
           It should return `True` if executor can proceed with current value from producer.
-          If not (unsafe to consume) - we will wait.
+          If not (unsafe to consume), the value is deferred and other values from
+          producer are considered meanwhile.  A deferred value is considered again
+          whenever some futures are done. In addition to the futures, it is called with a
+          dict with the keys of all values deferred before the current one, and the
+          value is deferred as well unless it is safe to consume with respect to both.
+          Hence values are consumed in the order of the producer among those which
+          depend on each other, while independent values can be consumed in parallel.
           WARNING: outside code should make sure about provider and `safe_to_consume` to
           play nicely or a very suboptimal behavior or possibly even a deadlock can happen.
         producer_future_key: callable, optional
@@ -174,12 +183,16 @@ class ProducerConsumer:
         # Relevant only for _iter_threads
         self._producer_finished = None
         self._producer_queue = None
+        # set whenever there might be something to do for the main thread
+        self._wakeup = Event()
         self._producer_exception = None
         self._producer_interrupt = None
         # so we could interrupt more or less gracefully
         self._producer_thread = None
         self._executor = None
         self._futures = {}
+        # values from producer which were not yet safe to consume
+        self._deferred = {}
         self._interrupted = False
 
     @property
@@ -201,6 +214,7 @@ class ProducerConsumer:
         if self._producer_queue:
             while not self._producer_queue.empty():
                 self._producer_queue.get()
+        self._deferred.clear()
 
         lgr.debug("Shutting down %s with %d futures. Reason: %s",
                   self._executor, len(self._futures), exception)
@@ -330,19 +344,47 @@ class ProducerConsumer:
                     didgood = True
                     lgr.debug("Adding %s to queue", r)
                     consumer_queue.put(r)
+                    self._wakeup.set()
                 if not didgood:
                     lgr.error("Nothing was obtained from %s :-(", res)
             else:
                 lgr.debug("Got straight result %s, not a generator", res)
                 consumer_queue.put(res)
+                self._wakeup.set()
 
         self._producer_thread = Thread(target=producer_worker)
         self._producer_thread.start()
         self._futures = futures = {}
+        self._deferred = deferred = {}
+
+        def is_safe_to_consume(job_key, deferred_before):
+            return self.safe_to_consume is None or (
+                self.safe_to_consume(futures, job_key) and
+                (not deferred_before or
+                 self.safe_to_consume(deferred_before, job_key)))
+
+        def submit(job_key, job_args):
+            lgr.debug("Submitting worker future for %s", job_args)
+            future = futures[job_key] = executor.submit(consumer_worker, self.consumer, job_args)
+            # so deferred values are submitted as soon as possible
+            future.add_done_callback(lambda f: self._wakeup.set())
+
+        def submit_deferred():
+            # Go through deferred values in the order they were produced, any
+            # value still deferred must be consumed before the following ones
+            # which depend on it
+            still_deferred = {}
+            for job_key, job_args in list(deferred.items()):
+                if is_safe_to_consume(job_key, still_deferred):
+                    del deferred[job_key]
+                    submit(job_key, job_args)
+                else:
+                    still_deferred[job_key] = job_args
 
         lgr.debug("Initiating ThreadPoolExecutor with %d jobs", jobs)
-        # we will increase sleep_time when doing nothing useful
-        sleeper = Sleeper()
+        # we will increase sleep_time when doing nothing useful, unless
+        # woken up by producer or consumers
+        sleeper = Sleeper(event=self._wakeup)
         interrupted_by_exception = None
         with concurrent.futures.ThreadPoolExecutor(jobs) as executor:
             self._executor = executor
@@ -358,6 +400,7 @@ class ProducerConsumer:
                         raise self._producer_exception
                     if (self._producer_finished and
                             not futures and
+                            not deferred and
                             consumer_queue.empty() and
                             producer_queue.empty()):
                         # This will let us not "escape" the while loop and reraise any possible exception
@@ -375,17 +418,16 @@ class ProducerConsumer:
                         try:
                             job_args = producer_queue.get() # timeout=0.001)
                             job_key = self.producer_future_key(job_args) if self.producer_future_key else job_args
-                            if self.safe_to_consume:
-                                # Sleep a little if we are not yet ready
-                                # TODO: add some .debug level reporting based on elapsed time
-                                # IIRC I did smth like growing exponentially delays somewhere (dandi?)
-                                while not self.safe_to_consume(futures, job_key):
-                                    self._pop_done_futures(lgr) or sleeper()
                             # Current implementation, to provide depchecking, relies on unique
                             # args for the job
-                            assert job_key not in futures
-                            lgr.debug("Submitting worker future for %s", job_args)
-                            futures[job_key] = executor.submit(consumer_worker, self.consumer, job_args)
+                            assert job_key not in futures and job_key not in deferred
+                            if is_safe_to_consume(job_key, deferred):
+                                submit(job_key, job_args)
+                            else:
+                                # do not block independent values which follow,
+                                # this one is submitted once its dependencies are done
+                                lgr.debug("Deferring %s until it is safe to consume", job_args)
+                                deferred[job_key] = job_args
                         except Empty:
                             pass
 
@@ -398,16 +440,21 @@ class ProducerConsumer:
                         lgr.debug("Got %s from consumer_queue", res)
                         yield res
 
-                    done_useful |= self._pop_done_futures(lgr)
+                    if self._pop_done_futures(lgr):
+                        done_useful = True
+                        if deferred and not interrupted_by_exception:
+                            submit_deferred()
 
                     if not done_useful:  # you need some rest
                         # TODO: same here -- progressive logging
                         lgr.log(5,
                                 "Did nothing useful, sleeping. Have "
-                                "producer_finished=%s producer_queue.empty=%s futures=%s consumer_queue.empty=%s",
+                                "producer_finished=%s producer_queue.empty=%s futures=%s deferred=%s "
+                                "consumer_queue.empty=%s",
                                 self._producer_finished,
                                 producer_queue.empty(),
                                 futures,
+                                list(deferred),
                                 consumer_queue.empty(),
                                 )
                         sleeper()
@@ -442,6 +489,7 @@ class ProducerConsumer:
     def add_to_producer_queue(self, value):
         self._producer_queue.put(value)
         self._update_total(value)
+        self._wakeup.set()
 
     def _pop_done_futures(self, lgr):
         """Removes .done from provided futures.
@@ -466,14 +514,20 @@ class ProducerConsumer:
 
 
 class Sleeper():
-    def __init__(self):
+    def __init__(self, event=None):
         self.min_sleep_time = 0.001
         # but no more than to this max
         self.max_sleep_time = 0.1
         self.sleep_time = self.min_sleep_time
+        # optional threading.Event to end sleeping early
+        self.event = event
 
     def __call__(self):
-        time.sleep(self.sleep_time)
+        if self.event is None:
+            time.sleep(self.sleep_time)
+        else:
+            self.event.wait(self.sleep_time)
+            self.event.clear()
         self.sleep_time = min(self.max_sleep_time, self.sleep_time * 2)
 
     def reset(self):
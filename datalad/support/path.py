@@ -14,9 +14,11 @@ One of the reasons is also to robustify operation with unicode filenames
 # TODO: RF and move all paths related functions from datalad.utils in here
 import os
 import os.path as op
+import stat
 
 # to not pollute API importing as _
 from collections import defaultdict as _defaultdict
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
 
 from functools import wraps
 from itertools import dropwhile
@@ -215,3 +217,76 @@ def _get_parent_paths_check(path, sep, asep):
         raise ValueError(f"Expected normalized paths, got {path} containing '{sep+sep}'")
     if asep in path:
         raise ValueError(f"Expected paths with {sep} as separator, got {path} containing '{asep}'")
+
+
+# Directories with fewer entries of interest are not listed with scandir(),
+# but each entry is lstat()'ed, to avoid reading large directories for a few
+# entries
+_SCANDIR_MIN_ENTRIES = 8
+
+
+def get_entry_types(topdir, paths, jobs=None):
+    """Determine the types of directory entries with few system calls
+
+    Paths are grouped by their parent directory, and each parent directory
+    is listed with `os.scandir()`. On most file systems this reports whether
+    an entry is a symlink, directory, or file without a `stat()` call per
+    entry. Directories are listed in parallel threads, which helps in
+    particular on network file systems with high latency.
+
+    Parameters
+    ----------
+    topdir: str
+      Directory the paths are relative to.
+    paths: iterable of str
+      Relative POSIX paths, as reported by Git.
+    jobs: int, optional
+      Maximum number of threads. By default, the default of
+      `concurrent.futures.ThreadPoolExecutor` is used.
+
+    Returns
+    -------
+    dict
+      Mapping of each path, without a trailing '/', to 'symlink',
+      'directory', or 'file'. A path that does not exist (anymore) is
+      reported as 'file'.
+    """
+    by_parent = _defaultdict(set)
+    for path in paths:
+        parent, _, name = path.rstrip('/').rpartition('/')
+        by_parent[parent].add(name)
+
+    def _scan(parent_names):
+        parent, names = parent_names
+        parent_path = op.join(topdir, parent) if parent else topdir
+        types = {}
+        if len(names) >= _SCANDIR_MIN_ENTRIES:
+            try:
+                with os.scandir(parent_path) as entries:
+                    for entry in entries:
+                        if entry.name not in names:
+                            continue
+                        types[entry.name] = 'symlink' if entry.is_symlink() \
+                            else 'directory' \
+                            if entry.is_dir(follow_symlinks=False) else 'file'
+                        if len(types) == len(names):
+                            break
+            except OSError:
+                pass
+        for name in names.difference(types):
+            try:
+                mode = os.lstat(op.join(parent_path, name)).st_mode
+            except OSError:
+                types[name] = 'file'
+                continue
+            types[name] = 'symlink' if stat.S_ISLNK(mode) \
+                else 'directory' if stat.S_ISDIR(mode) else 'file'
+        return [('/'.join((parent, name)) if parent else name, t)
+                for name, t in types.items()]
+
+    if len(by_parent) > 1 and jobs != 1:
+        with _ThreadPoolExecutor(max_workers=jobs) as executor:
+            results = list(executor.map(_scan, by_parent.items()))
+    else:
+        results = [_scan(i) for i in by_parent.items()]
+    return {path: t for result in results for path, t in result}
@@ -0,0 +1,133 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+from os.path import join as opj
+from unittest.mock import patch
+
+from datalad.support.annex_metadata import (
+    _iter_cat_file_batch,
+    _key_from_journal_filename,
+    parse_metadata_log,
+)
+from datalad.support.annexrepo import AnnexRepo
+from datalad.tests.utils_pytest import (
+    assert_in,
+    assert_not_in,
+    eq_,
+    get_most_obscure_supported_name,
+    with_tree,
+)
+from datalad.utils import Path
+
+
+def test_parse_metadata_log():
+    eq_(parse_metadata_log(''), {})
+    # base64 encoded values, several values per field, lines out of order
+    log = '1600000010s tag +y desc -!aGFzIHNwYWNl\n' \
+          '1600000000s desc +!aGFzIHNwYWNl tag +x u +üni +v\n'
+    eq_(parse_metadata_log(log),
+        {'tag': ['x', 'y'], 'u': ['v', 'üni']})
+    meta_ts = parse_metadata_log(log, timestamps=True)
+    eq_(meta_ts['tag-lastchanged'], ['2020-09-13@12-26-50'])
+    eq_(meta_ts['u-lastchanged'], ['2020-09-13@12-26-40'])
+    eq_(meta_ts['lastchanged'], ['2020-09-13@12-26-50'])
+    # removed fields are gone, also their timestamps
+    assert_not_in('desc', meta_ts)
+    assert_not_in('desc-lastchanged', meta_ts)
+
+
+def test_iter_cat_file_batch():
+    out = b'aaa blob 3\nfoo\nbbb missing\nccc blob 0\n\n'
+    expected = [('aaa', b'foo'), ('bbb', None), ('ccc', b'')]
+    eq_(list(_iter_cat_file_batch([out])), expected)
+    # chunk boundaries do not matter
+    eq_(list(_iter_cat_file_batch(out[i:i + 1] for i in range(len(out)))),
+        expected)
+
+
+def test_key_from_journal_filename():
+    eq_(_key_from_journal_filename('a79_c31_MD5E-s2--abc.txt'),
+        'MD5E-s2--abc.txt')
+    # journal and key file escaping are both undone
+    eq_(_key_from_journal_filename('a79_c31_URL--http&c%%x__y&s&az'),
+        'URL--http://x_y%&z')
+
+
+@with_tree(tree={
+    'up.dat': 'content',
+    'other.dat': 'other',
+    'nometa.dat': 'nometa',
+})
+def test_get_metadata_by_key(path=None):
+    ar = AnnexRepo(path, create=True)
+    obscure = get_most_obscure_supported_name()
+    with open(opj(path, obscure), 'w') as f:
+        f.write('obscure')
+    ar.add('.', git=False)
+    ar.commit('content')
+    eq_(ar.get_metadata_by_key(), {})
+    ar.set_metadata(
+        ['up.dat', obscure],
+        reset={'tag': 'one and= ', 'mike': 'awesome'})
+    ar.set_metadata('other.dat', add={'tag': ' two'})
+
+    keys = {f: ar.get_file_annexinfo(f)['key']
+            for f in ('up.dat', 'other.dat', 'nometa.dat', obscure)}
+    bykey = ar.get_metadata_by_key()
+    assert_not_in(keys['nometa.dat'], bykey)
+    # identical to what git-annex reports
+    for timestamps in (False, True):
+        bykey = ar.get_metadata_by_key(timestamps=timestamps)
+        for f, meta in ar.get_metadata(
+                ['up.dat', 'other.dat', obscure], timestamps=timestamps):
+            eq_(bykey[keys[f]], meta)
+    eq_(ar.get_metadata_by_key(keys=[keys['other.dat'], 'unknown']),
+        {keys['other.dat']: {'tag': [' two']}})
+
+    def _get_git_calls(run, cmd):
+        return [c for c in run.call_args_list if cmd in c.args[0]]
+
+    # an unchanged branch is not read again
+    with patch.object(ar._git_runner, 'run', wraps=ar._git_runner.run) as run:
+        ar.get_metadata_by_key()
+    eq_(_get_git_calls(run, 'ls-tree'), [])
+
+    # updates are picked up, and only changed logs are read
+    ar.set_metadata('other.dat', remove={'tag': ' two'}, add={'new': 'val'})
+    with patch.object(ar._git_runner, 'run', wraps=ar._git_runner.run) as run:
+        bykey = ar.get_metadata_by_key()
+    catfile_calls = _get_git_calls(run, 'cat-file')
+    eq_(len(catfile_calls), 1)
+    eq_(catfile_calls[0].kwargs['stdin'].count(b'\n'), 1)
+    eq_(bykey[keys['other.dat']], {'new': ['val']})
+    eq_(bykey[keys['up.dat']], {'mike': ['awesome'], 'tag': ['one and= ']})
+
+    # uncommitted changes in the journal are considered
+    ar.call_annex(['metadata', '-c', 'annex.alwayscommit=false',
+                   '-s', 'j=1', 'nometa.dat'])
+    eq_(ar.get_metadata_by_key()[keys['nometa.dat']], {'j': ['1']})
+    assert_in(keys['up.dat'], ar.get_metadata_by_key())
+
+
+@with_tree(tree={'src': {'u.txt': 'url content'}})
+def test_get_metadata_by_url_key(path=None):
+    ar = AnnexRepo(opj(path, 'ds'), create=True)
+    url = Path(path, 'src', 'u.txt').as_uri()
+    ar.add_url_to_file('u.txt', url, options=['--relaxed'])
+    ar.commit('url')
+    key = ar.get_file_annexinfo('u.txt')['key']
+    # the key contains characters that are escaped in log file names
+    assert_in(':', key)
+    assert_in('/', key)
+    ar.set_metadata('u.txt', init={'tag': 'x'})
+    eq_(ar.get_metadata_by_key(), {key: {'tag': ['x']}})
+    # same for uncommitted changes in the journal
+    ar.call_annex(['metadata', '-c', 'annex.alwayscommit=false',
+                   '-s', 'j=1', 'u.txt'])
+    eq_(ar.get_metadata_by_key(), {key: {'tag': ['x'], 'j': ['1']}})
@@ -0,0 +1,192 @@
+# emacs: -*- mode: python; py-indent-offset: 4; tab-width: 4; indent-tabs-mode: nil -*-
+# ex: set sts=4 ts=4 sw=4 et:
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+#
+#   See COPYING file distributed along with the datalad package for the
+#   copyright and license terms.
+#
+# ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
+
+import subprocess
+import zlib
+from pathlib import Path
+from unittest.mock import patch
+
+from ...tests.utils_pytest import (
+    assert_equal,
+    assert_in,
+    assert_is_none,
+    assert_not_in,
+    assert_raises,
+    skip_if,
+    with_tempfile,
+)
+from ..external_versions import external_versions
+from ..archive_writer_7z import (
+    SIGNATURE_HEADER_SIZE,
+    SevenZipWriter,
+    _encode_number,
+    deflate_file,
+    get_index_path,
+    read_index,
+)
+
+
+def test_encode_number():
+    for value, expected in (
+            (0, b'\x00'),
+            (0x7f, b'\x7f'),
+            (0x80, b'\x80\x80'),
+            (0x3fff, b'\xbf\xff'),
+            (0x4000, b'\xc0\x00\x40'),
+            (1 << 56, b'\xff' + (1 << 56).to_bytes(8, 'little'))):
+        assert_equal(_encode_number(value), expected)
+
+
+def _read_member(archive, member):
+    size, offset, crc, packed_size, method = member
+    with open(archive, 'rb') as f:
+        f.seek(offset)
+        content = f.read(packed_size)
+    if method == 'Deflate':
+        content = zlib.decompress(content, -15)
+    assert_equal(len(content), size)
+    assert_equal('{:08X}'.format(zlib.crc32(content)), crc)
+    return content
+
+
+@with_tempfile(mkdir=True)
+def test_write_append(path=None):
+    path = Path(path)
+    archive = path / 'archive.7z'
+    content = {
+        'a/b/K1/K1': b'one',
+        'a/c/K2/K2': b'two' * 1000,
+        'a/c/K3/K3': b'',
+    }
+    for name, c in content.items():
+        (path / name.replace('/', '_')).write_bytes(c)
+
+    with SevenZipWriter(archive) as writer:
+        writer.add('a/b/K1/K1', path / 'a_b_K1_K1')
+        size, crc = deflate_file(path / 'a_c_K2_K2', path / 'packed')
+        writer.add_packed('a/c/K2/K2', path / 'packed', size, crc, 'Deflate')
+    assert_equal(archive.read_bytes()[:6], b'7z\xbc\xaf\x27\x1c')
+    index = read_index(archive)
+    assert_equal(set(index), {'a/b/K1/K1', 'a/c/K2/K2'})
+    assert_equal(index['a/b/K1/K1'][1], SIGNATURE_HEADER_SIZE)
+    assert_equal(index['a/c/K2/K2'][4], 'Deflate')
+    for name, member in index.items():
+        assert_equal(_read_member(archive, member), content[name])
+
+    # append keeps the content of existing members in place
+    with SevenZipWriter(archive) as writer:
+        assert_in('a/b/K1/K1', writer)
+        assert_raises(ValueError, writer.add, 'a/b/K1/K1',
+                      path / 'a_b_K1_K1')
+        writer.add('a/c/K3/K3', path / 'a_c_K3_K3')
+        writer.add('a/d/K4/K4', path / 'a_b_K1_K1')
+    appended = read_index(archive)
+    for name in index:
+        assert_equal(appended[name], index[name])
+    assert_equal(appended['a/c/K3/K3'], [0, None, None, None, 'Copy'])
+    assert_equal(_read_member(archive, appended['a/d/K4/K4']), b'one')
+
+    # a failed append leaves the archive as it was
+    before = archive.read_bytes()
+    with assert_raises(RuntimeError):
+        with SevenZipWriter(archive) as writer:
+            writer.add('a/e/K5/K5', path / 'a_c_K2_K2')
+            raise RuntimeError('interrupted')
+    assert_equal(archive.read_bytes(), before)
+    assert_not_in('a/e/K5/K5', read_index(archive))
+
+    # no appending to an archive that does not match its index
+    with open(archive, 'ab') as f:
+        f.write(b'modified')
+    assert_is_none(read_index(archive))
+    assert_raises(ValueError, SevenZipWriter, archive)
+    get_index_path(archive).unlink()
+    assert_raises(ValueError, SevenZipWriter, archive)
+
+
+def _check_with_7z(archive, outdir, content):
+    # test and extract the archive with 7z (or py7zr), which reads the
+    # header independently of the index
+    if external_versions['cmd:7z']:
+        subprocess.run(['7z', 't', str(archive)], check=True,
+                       stdout=subprocess.DEVNULL)
+        subprocess.run(['7z', 'x', '-o{}'.format(outdir), str(archive)],
+                       check=True, stdout=subprocess.DEVNULL)
+    else:
+        import py7zr
+        with py7zr.SevenZipFile(archive) as a:
+            assert_is_none(a.testzip())
+        with py7zr.SevenZipFile(archive) as a:
+            a.extractall(outdir)
+    extracted = {
+        str(p.relative_to(outdir)): p.read_bytes()
+        for p in Path(outdir).rglob('*') if p.is_file()}
+    assert_equal(extracted, content)
+
+
+@skip_if(not (external_versions['cmd:7z'] or external_versions['py7zr']),
+         msg="7z or py7zr is needed as an independent reader")
+@with_tempfile(mkdir=True)
+def test_append_7z(path=None):
+    path = Path(path)
+    archive = path / 'archive.7z'
+    content = {
+        'a/b/K1/K1': b'one',
+        'a/c/K2/K2': b'two' * 1000,
+        'a/c/K3/K3': b'',
+        'a/d/K4/K4': b'four',
+        'a/e/K5/K5': b'five' * 100,
+    }
+    for name, c in content.items():
+        (path / name.replace('/', '_')).write_bytes(c)
+
+    with SevenZipWriter(archive) as writer:
+        writer.add('a/b/K1/K1', path / 'a_b_K1_K1')
+        size, crc = deflate_file(path / 'a_c_K2_K2', path / 'packed')
+        writer.add_packed('a/c/K2/K2', path / 'packed', size, crc, 'Deflate')
+    expected = {n: content[n] for n in ('a/b/K1/K1', 'a/c/K2/K2')}
+    _check_with_7z(archive, path / 'x1', expected)
+
+    # while appending, the archive is valid and unchanged up to its end
+    before = archive.read_bytes()
+    writer = SevenZipWriter(archive)
+    writer.add('a/c/K3/K3', path / 'a_c_K3_K3')
+    writer.add('a/d/K4/K4', path / 'a_d_K4_K4')
+    writer._file.flush()
+    assert_equal(archive.read_bytes()[:len(before)], before)
+    _check_with_7z(archive, path / 'x2', expected)
+    writer.close()
+    expected.update({n: content[n] for n in ('a/c/K3/K3', 'a/d/K4/K4')})
+    _check_with_7z(archive, path / 'x3', expected)
+    # the content of the existing members was not touched
+    end = read_index(archive)['a/c/K2/K2'][1] + \
+        read_index(archive)['a/c/K2/K2'][3]
+    assert_equal(archive.read_bytes()[SIGNATURE_HEADER_SIZE:end],
+                 before[SIGNATURE_HEADER_SIZE:end])
+
+    # an append interrupted while moving the new content into place leaves
+    # a valid archive with the previous content
+    before = archive.read_bytes()
+    with patch.object(SevenZipWriter, '_move', side_effect=OSError), \
+            assert_raises(OSError):
+        with SevenZipWriter(archive) as writer:
+            writer.add('a/e/K5/K5', path / 'a_e_K5_K5')
+            writer.close()
+    _check_with_7z(archive, path / 'x4', expected)
+    archive.write_bytes(before)
+
+    # another append, with another previous header to skip
+    with SevenZipWriter(archive) as writer:
+        size, crc = deflate_file(path / 'a_e_K5_K5', path / 'packed')
+        writer.add_packed('a/e/K5/K5', path / 'packed', size, crc, 'Deflate')
+    _check_with_7z(archive, path / 'x5', content)
+    index = read_index(archive)
+    for name, member in index.items():
+        if member[0]:
+            assert_equal(_read_member(archive, member), content[name])
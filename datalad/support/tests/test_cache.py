@@ -7,8 +7,19 @@
 #
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
-from ...tests.utils_pytest import assert_equal
-from ..cache import DictCache
+import threading
+
+from ...tests.utils_pytest import (
+    assert_equal,
+    assert_false,
+    assert_in,
+    assert_not_in,
+    assert_true,
+)
+from ..cache import (
+    DictCache,
+    SizedLRUCache,
+)
 
 
 def test_DictCache():
@@ -21,3 +32,54 @@ def test_DictCache():
 
     d['c'] = 2
     assert_equal(d, {'c': 2, 'b': 1})
+
+
+def test_SizedLRUCache():
+    c = SizedLRUCache(size_limit=10)
+    assert_equal(len(c), 0)
+    assert_equal(c.get('a'), None)
+    assert_true(c.set('a', 1, 4))
+    assert_true(c.set('b', 2, 4))
+    assert_equal(c.size, 8)
+    # access makes 'a' the most recently used entry
+    assert_equal(c.get('a'), 1)
+    assert_true(c.set('c', 3, 4))
+    # 'b' got evicted
+    assert_not_in('b', c)
+    assert_in('a', c)
+    assert_in('c', c)
+    assert_equal(c.size, 8)
+    # replacing an entry does not double-count its size
+    assert_true(c.set('c', 4, 2))
+    assert_equal(c.size, 6)
+    assert_equal(c.get('c'), 4)
+    # values exceeding the limit are not stored
+    assert_false(c.set('big', 5, 11))
+    assert_not_in('big', c)
+    assert_equal(c.size, 6)
+    c.discard('a')
+    c.discard('notthere')
+    assert_equal(c.size, 2)
+    c.clear()
+    assert_equal(len(c), 0)
+    assert_equal(c.size, 0)
+
+
+def test_SizedLRUCache_threads():
+    c = SizedLRUCache(size_limit=50)
+
+    def hammer(offset):
+        for i in range(2000):
+            key = (i + offset) % 30
+            c.set(key, i, key % 7 + 1)
+            c.get((key + 1) % 30)
+            c.discard((key + 2) % 30)
+
+    threads = [threading.Thread(target=hammer, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # the size accounting matches the stored entries
+    assert_equal(c.size, sum(size for _, size in c._entries.values()))
+    assert_true(c.size <= c.size_limit)
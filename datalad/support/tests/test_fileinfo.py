@@ -8,8 +8,10 @@
 """Test file info getters"""
 
 
+import os
 import os.path as op
 from pathlib import Path
+from unittest.mock import patch
 
 import datalad.utils as ut
 from datalad.distribution.dataset import Dataset
@@ -23,9 +25,13 @@ from datalad.tests.utils_pytest import (
     assert_not_in,
     assert_raises,
     assert_repo_status,
+    assert_true,
+    create_tree,
     get_annexstatus,
     get_convoluted_situation,
     known_failure_githubci_win,
+    patch_config,
+    skip_if_on_windows,
     slow,
     with_tempfile,
     with_tree,
@@ -386,3 +392,56 @@ def test_get_file_annexinfo(path=None):
         ds.pathobj / 'dir1' / 'dropped', eval_availability=True)
     assert_equal(props['has_content'], False)
     assert_not_in('objloc', props)
+
+
+@skip_if_on_windows
+@with_tempfile
+@with_tempfile(mkdir=True)
+def test_diffstatus_fsmonitor(path=None, hookdir=None):
+    # a file system monitor hook that reports all content as changed
+    hook = op.join(hookdir, 'fsmonitor')
+    calls = op.join(hookdir, 'calls')
+    with open(hook, 'w') as f:
+        f.write("#!/bin/sh\necho \"$@\" >> '{}'\n"
+                "printf 'token\\0/\\0'\n".format(calls))
+    os.chmod(hook, 0o755)
+    with patch_config({'datalad.repo.fsmonitor': hook}):
+        repo = GitRepo(path)
+        sub = GitRepo(op.join(path, 'sub'))
+    assert_true(repo.fsmonitor_enabled)
+    assert_true(sub.fsmonitor_enabled)
+    assert_equal(repo.config.get('core.untrackedcache'), 'true')
+    assert_false(GitRepo(op.join(hookdir, 'other')).fsmonitor_enabled)
+
+    create_tree(path, {
+        'clean': 'c', 'modified': 'm', 'deleted': 'd',
+        'sub': {'file': 'f'}})
+    sub.save()
+    repo.save()
+    create_tree(path, {
+        'modified': 'modified', 'staged': 's',
+        'untracked': {'dir': {'file': 'u'}},
+        'sub': {'file': 'modified'}})
+    os.unlink(op.join(path, 'deleted'))
+    repo.add('staged')
+    GitRepo(op.join(path, 'untracked', 'nested'))
+
+    for untracked in ('no', 'normal', 'all'):
+        status = repo.diffstatus('HEAD', None, untracked=untracked)
+        with patch.object(GitRepo, 'fsmonitor_enabled', False):
+            assert_equal(
+                status,
+                repo.diffstatus('HEAD', None, untracked=untracked))
+    assert_equal(status[repo.pathobj / 'modified']['state'], 'modified')
+    assert_equal(status[repo.pathobj / 'deleted']['state'], 'deleted')
+    assert_equal(status[repo.pathobj / 'sub']['state'], 'modified')
+    assert_equal(status[repo.pathobj / 'untracked' / 'nested']['type'],
+                 'directory')
+    # Git used the monitor
+    assert_true(op.exists(calls))
+    # `git status` updates the index, and must hold the write lock
+    with patch.object(repo, 'call_git_items_',
+                      wraps=repo.call_git_items_) as call:
+        repo.diffstatus('HEAD', None)
+    assert_true(any(c.args[0][0] == 'status' and not c.kwargs['read_only']
+                    for c in call.call_args_list))
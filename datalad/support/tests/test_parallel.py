@@ -9,6 +9,7 @@
 
 import logging
 from functools import partial
+from threading import Event
 from time import (
     sleep,
     time,
@@ -24,6 +25,7 @@ from datalad.support.parallel import (
     ProducerConsumer,
     ProducerConsumerProgressLog,
     no_parentds_in_futures,
+    no_subds_in_futures,
 )
 from datalad.tests.utils_pytest import (
     assert_equal,
@@ -292,6 +294,33 @@ def test_parallel_flyweights(topd=None):
         assert len(instances) == 1
 
 
+def test_deferred_consumption():
+    # A value which is not yet safe to consume must not hold back independent
+    # values which follow it
+    paths = ['/x/a/s', '/x/a', '/x/b', '/x']
+    b_started = Event()
+    log = []
+
+    def consumer(path):
+        log.append(('start', path))
+        if path == '/x/b':
+            b_started.set()
+        elif path == '/x/a/s':
+            # only finishes once the independent /x/b was started
+            assert b_started.wait(10)
+        log.append(('done', path))
+        return path
+
+    res = list(ProducerConsumer(
+        paths, consumer, safe_to_consume=no_subds_in_futures, jobs=2))
+    assert_equal(sorted(res), sorted(paths))
+    assert log.index(('start', '/x/b')) < log.index(('done', '/x/a/s'))
+    # superdatasets are consumed after all their subdatasets
+    assert log.index(('done', '/x/a/s')) < log.index(('start', '/x/a'))
+    for path in ('/x/a/s', '/x/a', '/x/b'):
+        assert log.index(('done', path)) < log.index(('start', '/x'))
+
+
 if __name__ == '__main__':
     test_ProducerConsumer()
     # test_creatsubdatasets()
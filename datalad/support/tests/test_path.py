@@ -13,6 +13,7 @@ from ...tests.utils_pytest import (
     SkipTest,
     assert_raises,
     eq_,
+    has_symlink_capability,
     with_tempfile,
 )
 from ...utils import (
@@ -23,6 +24,7 @@ from ...utils import (
 from ..path import (
     abspath,
     curdir,
+    get_entry_types,
     get_parent_paths,
     robust_abspath,
     split_ext,
@@ -114,3 +116,29 @@ def test_get_parent_paths(sep):
 
     # and we get the deepest parent
     eq_(gpp(_pp(['a/b/file', 'a/b/file2']), _pp(['a', 'a/b'])), _pp(['a/b']))
+
+
+@pytest.mark.parametrize("jobs", [None, 1])
+@with_tempfile(mkdir=True)
+def test_get_entry_types(tdir=None, *, jobs):
+    # enough entries in 'many' to list the directory, and few in 'sub'
+    many = ['many/f%d' % i for i in range(10)]
+    os.makedirs(os.path.join(tdir, 'many', 'sub', 'deep'))
+    for path in many + ['top', 'many/sub/f']:
+        with open(os.path.join(tdir, path), 'w') as f:
+            f.write(path)
+    expected = dict({p: 'file' for p in many},
+                    top='file',
+                    **{'many/sub/f': 'file',
+                       'many/sub/deep': 'directory',
+                       'many/gone': 'file'})
+    if has_symlink_capability():
+        os.symlink('f0', os.path.join(tdir, 'many', 'link'))
+        os.symlink('deep', os.path.join(tdir, 'many', 'sub', 'link'))
+        expected['many/link'] = 'symlink'
+        expected['many/sub/link'] = 'symlink'
+    eq_(get_entry_types(tdir, list(expected), jobs=jobs), expected)
+    # a trailing slash is stripped from the reported path
+    eq_(get_entry_types(tdir, ['many/sub/'], jobs=jobs),
+        {'many/sub': 'directory'})
+    eq_(get_entry_types(tdir, [], jobs=jobs), {})
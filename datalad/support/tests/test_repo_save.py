@@ -180,3 +180,38 @@ def test_save_subds_change(path=None):
         res, type='dataset', path=subds2.path, action='add')
     assert_in_results(
         res, type='file', path=str(ds.pathobj / '.gitmodules'), action='add')
+
+
+@with_tempfile
+def test_save_many_subds(path=None):
+    ckwa = dict(result_renderer='disabled')
+    ds = Dataset(path).create(**ckwa)
+    subpaths = ['sub1', 'sub 2', 'deep/sub3']
+    subdss = [create(ds.pathobj / p, **ckwa) for p in subpaths]
+    # all new subdatasets are registered at once
+    res = ds.save(**ckwa)
+    assert_repo_status(ds.repo)
+    for subds in subdss:
+        assert_in_results(
+            res, type='dataset', path=subds.path, action='add', status='ok')
+    subds_info = {
+        r['path']: r for r in ds.subdatasets(**ckwa)}
+    eq_(sorted(subds_info), sorted(subds.path for subds in subdss))
+    for subds in subdss:
+        eq_(subds_info[subds.path]['gitshasum'], subds.repo.get_hexsha())
+        eq_(subds_info[subds.path]['gitmodule_datalad-id'], subds.id)
+    # modified subdatasets are updated at once, without touching .gitmodules
+    gitmodules = (ds.pathobj / '.gitmodules').read_text()
+    for subds in subdss[:2]:
+        (subds.pathobj / 'file').write_text('content')
+        subds.save(**ckwa)
+    res = ds.save(**ckwa)
+    assert_repo_status(ds.repo)
+    for subds in subdss[:2]:
+        assert_in_results(
+            res, type='dataset', path=subds.path, action='add', status='ok')
+    eq_((ds.pathobj / '.gitmodules').read_text(), gitmodules)
+    subds_info = {
+        r['path']: r for r in ds.subdatasets(**ckwa)}
+    for subds in subdss:
+        eq_(subds_info[subds.path]['gitshasum'], subds.repo.get_hexsha())
@@ -8,6 +8,7 @@
 # ## ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ### ##
 
 import itertools
+import json
 import os
 from unittest.mock import patch
 
@@ -16,6 +17,10 @@ import pytest
 from datalad import cfg as dl_cfg
 from datalad.support import path as op
 from datalad.support.archive_utils_patool import unixify_path
+from datalad.support.archive_writer_7z import (
+    SevenZipWriter,
+    read_index,
+)
 from datalad.support.archives import (
     ArchivesCache,
     ExtractedArchive,
@@ -39,6 +44,7 @@ from datalad.tests.utils_pytest import (
     with_tempfile,
     with_tree,
 )
+from datalad.utils import Path
 
 fn_in_archive_obscure = OBSCURE_FILENAME
 fn_archive_obscure = fn_in_archive_obscure.replace('a', 'b')
@@ -229,6 +235,87 @@ def test_ExtractedArchive(path=None):
         assert_false(op.exists(earchive.path))
 
 
+@with_tempfile(mkdir=True)
+def check_ExtractedArchive_copy_member(ext, path=None):
+    import tarfile
+    import zipfile
+    archive = op.join(path, 'archive' + ext)
+    load = {'d/1.txt': b'1 load', 'd/sub/2.dat': b'2 load' * 1000}
+    if ext == '.zip':
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as z:
+            for name, content in load.items():
+                z.writestr(name, content)
+    else:
+        for name, content in load.items():
+            os.makedirs(op.dirname(op.join(path, name)), exist_ok=True)
+            with open(op.join(path, name), 'wb') as f:
+                f.write(content)
+        with tarfile.open(archive, 'w' if ext == '.tar' else 'w:gz') as tar:
+            tar.add(op.join(path, 'd'), arcname='d')
+            # a hardlink to a member
+            info = tarfile.TarInfo('d/link')
+            info.type = tarfile.LNKTYPE
+            info.linkname = 'd/sub/2.dat'
+            tar.addfile(info)
+        load['d/link'] = load['d/sub/2.dat']
+
+    earchive = ExtractedArchive(archive)
+    dst = op.join(path, 'dst')
+    # members of compressed tarballs are not read one by one
+    direct = ext != '.tar.gz'
+    for name, content in load.items():
+        eq_(earchive.copy_member(name, dst), direct)
+        if direct:
+            with open(dst, 'rb') as f:
+                eq_(f.read(), content)
+    assert_false(earchive.copy_member('d/missing', dst))
+    # nothing was extracted
+    assert_false(op.exists(earchive.path))
+    # the locations of members in an uncompressed tarball are kept
+    eq_(op.exists(earchive.index_path), ext == '.tar')
+    earchive.clean()
+    assert_false(op.exists(earchive.index_path))
+
+
+@pytest.mark.parametrize("ext", ['.tar', '.tar.gz', '.zip'])
+def test_ExtractedArchive_copy_member(ext):
+    check_ExtractedArchive_copy_member(ext)
+
+
+@with_tempfile(mkdir=True)
+def test_ExtractedArchive_copy_member_7z_crc(path=None):
+    path = Path(path)
+    src = path / 'src'
+    src.write_bytes(b'content')
+    archive = path / 'a.7z'
+    with SevenZipWriter(archive) as writer:
+        writer.add('d/file.dat', src)
+    size, offset, crc = read_index(archive)['d/file.dat'][:3]
+    earchive = ExtractedArchive(str(archive))
+    dst = path / 'dst'
+
+    def _set_member_index():
+        # as built from the listing of `7z l -slt`
+        stat = os.stat(archive)
+        with open(earchive.index_path, 'w') as f:
+            json.dump(dict(signature=[stat.st_size, stat.st_mtime_ns],
+                           members={'d/file.dat': [offset, size, crc]}), f)
+        earchive._index = None
+
+    _set_member_index()
+    assert_true(earchive.copy_member('d/file.dat', str(dst)))
+    eq_(dst.read_bytes(), b'content')
+    # content that does not match its CRC is not used, the archive is
+    # to be extracted instead
+    with open(archive, 'r+b') as f:
+        f.seek(offset)
+        f.write(b'C')
+    _set_member_index()
+    assert_false(earchive.copy_member('d/file.dat', str(dst)))
+    assert_false(dst.exists())
+    earchive.clean()
+
+
 def test_ArchivesCache():
     # we don't actually need to test archives handling itself
     path1 = "/zuba/duba"
@@ -254,6 +341,56 @@ def test_ArchivesCache():
     assert_false(op.exists(cache_path))
 
 
+@with_tempfile(mkdir=True)
+def test_ArchivesCache_evict(path=None):
+    def _decompress(archive, dir_, leading_directories=None):
+        with open(op.join(dir_, 'content'), 'wb') as f:
+            f.write(b'x' * 100)
+
+    def _set_access(earchive, t):
+        # content must not be newer than the stamp
+        os.utime(earchive.path, (t, t))
+        os.utime(earchive.stamp_path, (t, t))
+
+    cache = ArchivesCache(path, persistent=True, max_size=250)
+    with patch('datalad.support.archives.decompress_file', _decompress):
+        a1, a2, a3 = [cache[op.join(path, 'a{}.tar'.format(i))]
+                      for i in range(1, 4)]
+        a1.assure_extracted()
+        a2.assure_extracted()
+        eq_(a1.extracted_size, 100)
+        _set_access(a1, 2000)
+        _set_access(a2, 1000)
+        # exceeding the limit removes the least recently used
+        a3.assure_extracted()
+        assert_true(a1.is_extracted)
+        assert_false(a2.is_extracted)
+        assert_true(a3.is_extracted)
+
+        # an extraction in use is kept
+        _set_access(a1, 1000)
+        _set_access(a3, 2000)
+        with a1.in_use():
+            a2.assure_extracted()
+            assert_true(a1.is_extracted)
+            assert_false(a3.is_extracted)
+            assert_false(a1.remove_unused())
+        # users that are gone do not count
+        open(op.join(a1.users_path, '0-STALE'), 'w').close()
+        with open(a1.index_path, 'w') as f:
+            f.write('{}')
+        assert_true(a1.remove_unused())
+        assert_false(a1.is_extracted)
+        # nothing is left behind, neither index, nor users, nor lock files
+        eq_([f for f in os.listdir(cache.path)
+             if f.startswith(op.basename(a1.path))], [])
+        # and it can be extracted again
+        a1.assure_extracted()
+        assert_true(a1.is_extracted)
+        # nothing to remove
+        eq_(cache.evict(), [])
+
+
 @pytest.mark.parametrize(
     "return_value,target_value,kwargs",
     [
@@ -59,6 +59,7 @@ from datalad.utils import (
     file_basename,
     find_files,
     generate_chunks,
+    generate_file_chunks,
     get_dataset_root,
     get_open_files,
     get_path_prefix,
@@ -575,6 +576,31 @@ def test_generate_chunks():
     assert_raises(AssertionError, list, generate_chunks([1], 0))
 
 
+def test_generate_file_chunks():
+    ok_generator(generate_file_chunks([]))
+    eq_(list(generate_file_chunks([])), [])
+    eq_(list(generate_file_chunks('a')), [['a']])
+    eq_(list(generate_file_chunks(['a', 'b'], ['git', 'add'])), [['a', 'b']])
+    # an iterator is consumed lazily
+    files = iter(['a'] * 10)
+    eq_(next(generate_file_chunks(files)), ['a'] * 10)
+
+    # files are packed greedily, regardless of the longest file
+    with patch('datalad.utils.CMD_MAX_ARG', 100):
+        long_file = 'l' * 40
+        chunks = list(generate_file_chunks(
+            (f for f in [long_file] + ['s'] * 40), 'cmd'))
+        # 89 bytes remain after 'cmd' and '--', 43 are taken by the long
+        # file, and 4 by each short one
+        eq_(chunks, [[long_file] + ['s'] * 11, ['s'] * 22, ['s'] * 7])
+        # the size of the encoded paths is considered
+        eq_(list(generate_file_chunks(['ü' * 30, 'ü' * 30])),
+            [['ü' * 30], ['ü' * 30]])
+        # a file that does not fit on its own still gets a chunk
+        eq_(list(generate_file_chunks(['a', 'x' * 200, 'b'])),
+            [['a'], ['x' * 200], ['b']])
+
+
 def test_any_re_search():
     assert_true(any_re_search('a', 'a'))
     assert_true(any_re_search('a', 'bab'))
@@ -1006,41 +1006,60 @@ def partition(items, predicate=bool):
 def generate_chunks(container, size):
     """Given a container, generate chunks from it with size up to `size`
     """
-    # There could be a "smarter" solution but I think this would suffice
     assert size > 0,  "Size should be non-0 positive"
-    while container:
-        yield container[:size]
-        container = container[size:]
+    for start in range(0, len(container), size):
+        yield container[start:start + size]
+
+
+def _get_cmdline_arg_size(arg):
+    # size of the encoded argument, +3 for possible quotes and a space
+    return len(os.fsencode(arg)) + 3
 
 
 def generate_file_chunks(files, cmd=None):
     """Given a list of files, generate chunks of them to avoid exceeding cmdline length
 
+    Files are packed into a chunk in the given order, as long as the size of
+    their encoded form, together with the command (and a '--'), does not
+    exceed `CMD_MAX_ARG`. A file that is too long for the command line on
+    its own still gets a chunk.
+
     Parameters
     ----------
-    files: list of str
+    files: iterable of str
+      Can be an iterator, which is consumed as chunks are requested.
     cmd: str or list of str, optional
       Command to account for as well
+
+    Yields
+    ------
+    list of str
     """
-    files = ensure_list(files)
+    if files is None or isinstance(files, str):
+        files = ensure_list(files)
     cmd = ensure_list(cmd)
 
-    maxl = max(map(len, files)) if files else 0
-    chunk_size = max(
-        1,  # should at least be 1. If blows then - not our fault
-        (CMD_MAX_ARG
-         - sum((len(x) + 3) for x in cmd)
-         - 4  # for '--' below
-         ) // (maxl + 3)  # +3 for possible quotes and a space
+    max_size = (
+        CMD_MAX_ARG
+        - sum(map(_get_cmdline_arg_size, cmd))
+        - _get_cmdline_arg_size('--')
     )
     # TODO: additional treatment for "too many arguments"? although
     # as https://github.com/datalad/datalad/issues/1883#issuecomment
     # -436272758
-    # shows there seems to be no hardcoded limit on # of arguments,
-    # but may be we decide to go for smth like follow to be on safe side
-    # chunk_size = min(10240 - len(cmd), chunk_size)
-    file_chunks = generate_chunks(files, chunk_size)
-    return file_chunks
+    # shows there seems to be no hardcoded limit on # of arguments
+    chunk = []
+    chunk_size = 0
+    for f in files:
+        size = _get_cmdline_arg_size(f)
+        if chunk and chunk_size + size > max_size:
+            yield chunk
+            chunk = []
+            chunk_size = 0
+        chunk.append(f)
+        chunk_size += size
+    if chunk:
+        yield chunk
 
 
 #
@@ -61,6 +61,7 @@ requires = {
         'BeautifulSoup4',  # VERY weak requirement, still used in one of the tests
         'httpretty>=0.9.4',  # Introduced py 3.6 support
         'mypy~=0.900',
+        'py7zr',  # independent reader for archives written by datalad
         'pytest~=7.0',
         'pytest-cov~=3.0',
         'pytest-fail-slow~=0.2',